@@ -0,0 +1,304 @@
+"""
+Module for looking at a flight after recovery: converting its log to Parquet or Arrow IPC, and the
+questions we always ask about a flight, as lazy Polars queries.
+
+Any log the Logger writes can be read: CSV or binary, compressed or not, and segmented (which is
+salvaged first, see payload.data_handling.log_segments). Every column gets the dtype of its field in
+the data packets, and the state is categorical, so the exported file is small and fast to query.
+
+Usage:
+    uv run payload-analysis logs/log_3.csv
+    uv run payload-analysis logs/log_3.csv --export parquet
+"""
+
+import argparse
+import io
+from pathlib import Path
+from typing import Literal
+
+import polars as pl
+
+from payload.constants import (
+    LANDING_ACCELERATION_BAND_GS,
+    LOG_COMPRESSION_SUFFIXES,
+    LOG_FILE_SUFFIXES,
+)
+from payload.data_handling.binary_log import POLARS_TYPES, read_binary_log
+from payload.data_handling.durability import ends_in_reserved_space, strip_reserved_space
+from payload.data_handling.log_schema import LOG_COLUMNS
+from payload.data_handling.log_segments import salvage_segmented_log
+from payload.data_handling.logger import decompress_log
+from payload.detectors import ACCELERATION_GS
+
+ExportFormat = Literal["parquet", "arrow"]
+"""The columnar formats a log can be exported to."""
+
+EXPORT_SUFFIXES: dict[ExportFormat, str] = {"parquet": ".parquet", "arrow": ".arrow"}
+"""The suffix of the exported file of each export format."""
+
+CSV_BOOLEANS = {"True": True, "False": False, "1": True, "0": False}
+"""
+How booleans are written in a CSV log. The Grave fills the Zombie packet with zeros, so its
+booleans are written as numbers.
+"""
+
+DRILLING_STATE = "ZombieDrillingState"
+LANDED_STATE = "LandedState"
+
+
+def _log_dtypes(column_names: list[str]) -> dict[str, pl.DataType]:
+    """
+    Returns the dtype of every column of a log that is known, from the fields of the data packets.
+
+    :param column_names: The columns of the log.
+    :return: The dtypes, by column.
+    """
+    dtypes = {
+        name: POLARS_TYPES[LOG_COLUMNS[name].type_name]
+        for name in column_names
+        if name in LOG_COLUMNS and LOG_COLUMNS[name].type_name in POLARS_TYPES
+    }
+    dtypes["state_letter"] = pl.Categorical()
+    return dtypes
+
+
+def _read_csv_log(data: Path | bytes) -> pl.LazyFrame:
+    """
+    Reads a CSV log with the dtypes of its columns.
+
+    :param data: The path of the log, or its (decompressed) contents.
+    :return: The log.
+    """
+    # A log that wasn't closed can end in the space reserved for it, which is only read into
+    # memory to cut it off when it's there
+    if isinstance(data, Path) and ends_in_reserved_space(data):
+        data = data.read_bytes()
+    source = io.BytesIO(strip_reserved_space(data)) if isinstance(data, bytes) else data
+    column_names = pl.scan_csv(source).collect_schema().names()
+    dtypes = _log_dtypes(column_names)
+    # Booleans are read as strings first, since Polars can't parse the ones written as numbers
+    booleans = [name for name, dtype in dtypes.items() if dtype == pl.Boolean()]
+    log = pl.scan_csv(source, schema_overrides=dtypes | dict.fromkeys(booleans, pl.String()))
+    return log.with_columns(
+        pl.col(name).replace_strict(CSV_BOOLEANS, default=None, return_dtype=pl.Boolean())
+        for name in booleans
+    )
+
+
+def scan_log(log_path: Path) -> pl.LazyFrame:
+    """
+    Reads a log, or a log exported by export_log, with the dtypes of its columns.
+
+    :param log_path: The log file, or the directory of a segmented log.
+    :return: The log, with the state as a categorical column.
+    """
+    if log_path.is_dir():
+        salvaged_path = next(log_path.glob(f"{log_path.name}.*"), None)
+        if salvaged_path is None:
+            salvage_segmented_log(log_path)
+            salvaged_path = next(log_path.glob(f"{log_path.name}.*"))
+        return scan_log(salvaged_path)
+
+    suffixes = log_path.suffixes
+    if suffixes[-1:] == [EXPORT_SUFFIXES["parquet"]]:
+        return pl.scan_parquet(log_path)
+    if suffixes[-1:] == [EXPORT_SUFFIXES["arrow"]]:
+        return pl.scan_ipc(log_path)
+    if LOG_FILE_SUFFIXES["binary"] in suffixes:
+        log = read_binary_log(log_path)
+        return log.lazy().with_columns(
+            pl.col(name).cast(dtype, strict=False)
+            for name, dtype in _log_dtypes(log.columns).items()
+        )
+
+    compression = next(
+        (name for name, suffix in LOG_COMPRESSION_SUFFIXES.items() if log_path.suffix == suffix),
+        None,
+    )
+    if compression is not None:
+        return _read_csv_log(decompress_log(log_path.read_bytes(), compression))
+    return _read_csv_log(log_path)
+
+
+def export_log(
+    log_path: Path, export_format: ExportFormat = "parquet", output_path: Path | None = None
+) -> Path:
+    """
+    Converts a log to a columnar file.
+
+    :param log_path: The log file, or the directory of a segmented log.
+    :param export_format: Whether to write Parquet or Arrow IPC.
+    :param output_path: Where to write the file. Defaults to next to the log, with the name of the
+        log and the suffix of the format.
+    :return: The path of the exported file.
+    """
+    if output_path is None:
+        log_name = log_path.name.split(".")[0]
+        output_path = log_path.with_name(log_name + EXPORT_SUFFIXES[export_format])
+    log = scan_log(log_path)
+    if export_format == "parquet":
+        log.sink_parquet(output_path)
+    else:
+        log.sink_ipc(output_path)
+    return output_path
+
+
+def time_in_states(log: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    How long the payload was in each state, from the first row of the state to the first row of
+    the next one (or the last row of the log).
+
+    :param log: The log.
+    :return: The state, when it started and how long it lasted, in FIRM seconds, in flight order.
+    """
+    return (
+        log.group_by("state_letter")
+        .agg(
+            start_seconds=pl.col("timestamp_seconds").min(),
+            last_seconds=pl.col("timestamp_seconds").max(),
+        )
+        .sort("start_seconds")
+        .select(
+            "state_letter",
+            "start_seconds",
+            duration_seconds=pl.col("start_seconds").shift(-1).fill_null(pl.col("last_seconds"))
+            - pl.col("start_seconds"),
+        )
+    )
+
+
+def max_acceleration(log: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    The largest acceleration of the flight.
+
+    :param log: The log.
+    :return: One row with the acceleration, and when and in which state it happened.
+    """
+    return log.select(
+        acceleration_gs=ACCELERATION_GS.max(),
+        timestamp_seconds=pl.col("timestamp_seconds").get(ACCELERATION_GS.arg_max()),
+        state_letter=pl.col("state_letter").get(ACCELERATION_GS.arg_max()),
+    )
+
+
+def landing_detection_delay(log: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    How long after touchdown the state machine went to LandedState. Touchdown is taken as the last
+    row before LandedState whose acceleration is outside LANDING_ACCELERATION_BAND_GS of 1 G, after
+    which the payload was lying still.
+
+    :param log: The log.
+    :return: One row with the time of touchdown, of LandedState, and the delay, in FIRM seconds.
+    """
+    landed_seconds = (
+        pl.col("timestamp_seconds").filter(pl.col("state_letter") == LANDED_STATE).min()
+    )
+    is_moving = (ACCELERATION_GS - 1).abs() > LANDING_ACCELERATION_BAND_GS
+    return log.select(
+        touchdown_seconds=pl.col("timestamp_seconds")
+        .filter(is_moving & (pl.col("timestamp_seconds") < landed_seconds))
+        .max(),
+        landed_seconds=landed_seconds,
+    ).with_columns(delay_seconds=pl.col("landed_seconds") - pl.col("touchdown_seconds"))
+
+
+def loop_backlog_percentiles(log: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    How many FIRM packets the main loop handled per iteration. Every row of an iteration has the
+    same update timestamp, so each iteration is only counted once.
+
+    :param log: The log, which needs the "full" log profile.
+    :return: One row with the median, 90th and 99th percentiles, and the largest backlog.
+    """
+    backlog = pl.col("retrieved_firm_packets")
+    return log.unique("update_timestamp_ns").select(
+        p50=backlog.quantile(0.5),
+        p90=backlog.quantile(0.9),
+        p99=backlog.quantile(0.99),
+        max=backlog.max(),
+    )
+
+
+def drilling_current_profile(log: pl.LazyFrame, interval_seconds: float = 1.0) -> pl.LazyFrame:
+    """
+    The current of the drill motor while drilling.
+
+    :param log: The log, which needs the "full" log profile.
+    :param interval_seconds: How much FIRM time each row of the profile covers.
+    :return: The start of each interval since drilling started, and the mean and largest current
+        in it.
+    """
+    drilling = log.filter(pl.col("state_letter") == DRILLING_STATE)
+    since_start = pl.col("timestamp_seconds") - pl.col("timestamp_seconds").min()
+    return (
+        drilling.with_columns(seconds=(since_start / interval_seconds).floor() * interval_seconds)
+        .group_by("seconds")
+        .agg(
+            mean_current_a=pl.col("motor_current_a").mean(),
+            max_current_a=pl.col("motor_current_a").max(),
+        )
+        .sort("seconds")
+    )
+
+
+ACCELERATION_COLUMNS = {
+    "timestamp_seconds",
+    "state_letter",
+    "raw_acceleration_x_gs",
+    "raw_acceleration_y_gs",
+    "raw_acceleration_z_gs",
+}
+
+QUERIES = {
+    "Time in each state": (time_in_states, {"state_letter", "timestamp_seconds"}),
+    "Max acceleration": (max_acceleration, ACCELERATION_COLUMNS),
+    "Landing detection delay": (landing_detection_delay, ACCELERATION_COLUMNS),
+    "Loop backlog (FIRM packets per iteration)": (
+        loop_backlog_percentiles,
+        {"retrieved_firm_packets", "update_timestamp_ns"},
+    ),
+    "Drilling current": (
+        drilling_current_profile,
+        {"state_letter", "timestamp_seconds", "motor_current_a"},
+    ),
+}
+"""The questions the CLI answers, with the columns each of them needs."""
+
+
+def main() -> None:
+    """Exports a log and prints the answers to the standard questions about the flight."""
+    parser = argparse.ArgumentParser(description="Export and summarize a payload log.")
+    parser.add_argument("log", type=Path, help="The log (or segmented log directory).")
+    parser.add_argument(
+        "-e", "--export", choices=EXPORT_SUFFIXES, help="Also convert the log to this format."
+    )
+    parser.add_argument("-o", "--output", type=Path, help="Where to write the exported log.")
+    args = parser.parse_args()
+
+    log_path = args.log
+    if args.export is not None:
+        log_path = export_log(log_path, args.export, args.output)
+        print(f"Exported {args.log} to {log_path}")  # noqa: T201
+
+    # Everything after this point reads the exported file, if there is one
+    log = scan_log(log_path).cache()
+    column_names = set(log.collect_schema().names())
+    queries = {
+        title: query(log)
+        for title, (query, needed_columns) in QUERIES.items()
+        if needed_columns <= column_names
+    }
+    results = dict(zip(queries, pl.collect_all(queries.values()), strict=True))
+
+    with pl.Config(tbl_rows=50, tbl_hide_dataframe_shape=True, float_precision=3):
+        for title, (_, needed_columns) in QUERIES.items():
+            print(f"\n{title}")  # noqa: T201
+            if title in results:
+                print(results[title])  # noqa: T201
+            else:
+                missing = ", ".join(sorted(needed_columns - column_names))
+                print(f"  Not in this log (missing {missing}), log with a larger profile.")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
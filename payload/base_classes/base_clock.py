@@ -0,0 +1,43 @@
+"""Base class for the clock the state machine reads the time from."""
+
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from firm_client import FIRMDataPacket
+
+
+class BaseClock(ABC):
+    """
+    A base class for the clocks the states use for their timers.
+
+    Keeping the time source pluggable lets a replay run the state machine on the time of the data
+    it replays instead of the wall clock.
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    def now(self) -> float:
+        """
+        Returns the current mission time.
+
+        :return: The current time in seconds. Only differences between two values are meaningful.
+        """
+
+    @abstractmethod
+    def from_firm_timestamp(self, timestamp_seconds: float) -> float:
+        """
+        Converts the timestamp_seconds of a FIRM data packet to the time on this clock, so a timer
+        can start at the packet where something happened instead of at the end of its batch.
+
+        :param timestamp_seconds: The timestamp_seconds of a FIRM data packet.
+        :return: The time on this clock at which FIRM read the packet.
+        """
+
+    def update(self, firm_data_packets: list[FIRMDataPacket]) -> None:  # noqa: B027
+        """
+        Called by the Context with every batch of FIRM data packets, before the state is updated.
+
+        :param firm_data_packets: The FIRM data packets received this loop.
+        """
@@ -22,6 +22,15 @@ class BaseGrave(ABC):
     def deploy_zombie(self):
         """Deploys zombie from grave."""
 
+    @property
+    @abstractmethod
+    def deploy_progress(self) -> float:
+        """
+        Returns how far along the Zombie deployment is.
+
+        :return: A value from 0.0 (not started) to 1.0 (Zombie is out of Grave).
+        """
+
     @abstractmethod
     def get_data_packet(self):
         pass
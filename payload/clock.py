@@ -0,0 +1,63 @@
+"""Module for the clocks the state machine can run on."""
+
+import time
+from typing import TYPE_CHECKING
+
+from payload.base_classes.base_clock import BaseClock
+
+if TYPE_CHECKING:
+    from firm_client import FIRMDataPacket
+
+
+class MonotonicClock(BaseClock):
+    """
+    A clock that reads the wall clock of the computer. This is what a real flight runs on.
+
+    FIRM timestamps are converted by taking the newest packet as having been read when its batch
+    was received.
+    """
+
+    __slots__ = ("_newest_timestamp_seconds", "_received_time")
+
+    def __init__(self) -> None:
+        self._newest_timestamp_seconds: float | None = None
+        self._received_time = 0.0
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def from_firm_timestamp(self, timestamp_seconds: float) -> float:
+        if self._newest_timestamp_seconds is None:
+            raise RuntimeError("FIRM timestamps can't be converted before any packet was received.")
+        return self._received_time - (self._newest_timestamp_seconds - timestamp_seconds)
+
+    def update(self, firm_data_packets: list[FIRMDataPacket]) -> None:
+        if firm_data_packets:
+            self._newest_timestamp_seconds = firm_data_packets[-1].timestamp_seconds
+            self._received_time = time.monotonic()
+
+
+class FIRMClock(BaseClock):
+    """
+    A clock driven by the timestamp_seconds of the FIRM data packets.
+
+    In a replay the packets can arrive much faster than they were recorded, so every timer in the
+    state machine (e.g. the time before we check for landing, or the time Zombie waits for Grave)
+    runs on the time of the data instead. A fast replay then goes through the whole mission in
+    seconds, while a real time replay behaves exactly like the wall clock.
+    """
+
+    __slots__ = ("_now",)
+
+    def __init__(self) -> None:
+        self._now = 0.0
+
+    def now(self) -> float:
+        return self._now
+
+    def from_firm_timestamp(self, timestamp_seconds: float) -> float:
+        return timestamp_seconds
+
+    def update(self, firm_data_packets: list[FIRMDataPacket]) -> None:
+        if firm_data_packets:
+            self._now = firm_data_packets[-1].timestamp_seconds
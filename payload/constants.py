@@ -9,18 +9,114 @@ PORT_WINDOWS = "COM5"
 BAUD_RATE = 2_000_000
 SERIAL_TIMEOUT_SECONDS = 1.0
 
+MOCK_HOLD_PACKET_PERIOD_SECONDS = 0.1
+"""
+How often MockFIRM sends a copy of the last packet of a replay file while it holds it, in FIRM time.
+"""
+
+MOCK_FAST_REPLAY_HOLD_SPEEDUP = 100
+"""
+How much faster than real time the held packets are sent in a fast replay. They are still paced so
+background jobs that take wall clock time (like MockGrave's deployment) can finish before the
+replay runs out of data.
+"""
+
+MOCK_READ_BATCH_ROWS = 5000
+"""
+How many rows of a replay file MockFIRM parses at a time. The file is streamed in batches of this
+size, so a replay starts right away and its memory doesn't grow with the length of the file.
+"""
+
+MOCK_READ_PREFETCH_BATCHES = 2
+"""How many parsed batches can wait for MockFIRM to send their packets."""
+
+MOCK_READ_POLL_SECONDS = 0.1
+"""
+How often MockFIRM checks whether it was stopped while it waits for the next parsed batch. It is
+well under SERIAL_TIMEOUT_SECONDS, which is how long stopping the Mock FIRM waits for its thread.
+"""
+
+MOCK_FAST_REPLAY_CHUNK_PACKETS = 100
+"""
+How many packets a fast replay puts in the queue at a time. Each chunk is handed over with one lock,
+and it is small enough that the first packets don't wait for the whole batch to be built.
+"""
+
+MOCK_QUEUE_MAX_PACKETS = 5000
+"""
+How many packets MockFIRM can queue before it waits for the main loop to take them, so a fast replay
+can't read the file faster than the main loop handles it and fill the memory with packets.
+"""
+
+MOCK_REPLAY_CACHE_SUFFIX = ".replay.arrow"
+"""
+The suffix of the Arrow IPC cache MockFIRM keeps next to a replay file, after the name of the file
+and the key of the cache. See payload.mock.replay_cache.
+"""
+
+SYNTHETIC_FIRM_CHUNK_PACKETS = 1000
+"""
+How many packets SyntheticFIRM generates at a time. Each chunk is worked out with NumPy in one go,
+so larger chunks are faster, but the first packets of a real time flight wait for the whole chunk.
+"""
+
+SYNTHETIC_FIRM_QUEUE_MAX_PACKETS = 5 * SYNTHETIC_FIRM_CHUNK_PACKETS
+"""
+How many packets SyntheticFIRM can queue before it waits for the main loop to take them. A fast
+flight at a high sample rate is generated far quicker than the main loop handles it, and would
+otherwise pile up in memory.
+"""
+
+MOCK_SEEK_LEAD_SECONDS = 5.0
+"""
+How long before a flight phase (see FlightPhase) a replay that is started at the phase starts, in
+FIRM time, so the state machine sees the data leading up to it.
+"""
+
+
+class FlightPhase(StrEnum):
+    """The points in a flight that a replay can be started at."""
+
+    LAUNCH = "launch"
+    """The first packet of the acceleration spike that launch is detected by."""
+    LANDING = "landing"
+    """Touchdown, the last packet after launch whose acceleration is outside the landing band."""
+
 # ------------------------ State machine constants ------------------------
 LAUNCH_ALTITUDE_METERS = 200
 LAUNCH_ACCELERATION_GS = 5
+LAUNCH_CONSECUTIVE_SAMPLES = 1
+"""
+How many packets in a row must be above LAUNCH_ACCELERATION_GS to detect launch. 1 means any single
+packet above the threshold counts, raise it to debounce against bumps on the pad.
+"""
 LAUNCH_STATE_MAX_LENGTH_SECONDS = 345  # Lauren said main at crapogee would result in this time
 LAUNCH_STATE_CHECK_LENGTH_SECONDS = 90
 GRAVE_DEPLOY_LENGTH_SECONDS = 210
 TOTAL_OPERATION_TIME = 900
 DRILL_ATTEMPTS = 5
 
+LANDING_WINDOW_SIZE = 500
+"""The number of most recent FIRM packets that must be quiet before we say we've landed."""
+
+LANDING_ACCELERATION_BAND_GS = 0.03
+"""Every acceleration magnitude in the landing window must be within this of 1 G."""
+
+LANDING_ACCELERATION_MAX_STD_GS = 0.005
+"""The standard deviation of |acceleration - 1 G| over the landing window must be below this."""
+
+LANDING_MAX_ALTITUDE_METERS = 5
+"""The estimated altitude must be below this for the landing check to run."""
+
 # ------------------------ Logger constants------------------------
 LOGS_PATH = Path("logs")
 
+LOG_INDEX_NAME = "log_index.jsonl"
+"""
+The name of the index in the log directory, which keeps the number of the next log and what is
+known about every log, so the Logger doesn't have to list the directory on startup.
+"""
+
 LOG_BUFFER_SIZE = 5000
 """
 Buffer size if CAPACITY is reached.
@@ -28,16 +124,186 @@ Buffer size if CAPACITY is reached.
 Once the state changes, this buffer will be logged to make sure we don't lose data.
 """
 
+IDLE_LOG_STATES = frozenset({"StandbyState", "LandedState"})
+"""
+The states in which nothing is happening, so the logger only keeps the most recent rows in its
+buffer instead of writing all of them.
+"""
+
+IDLE_LOG_CAPACITY = 5000  # 5 seconds of data
+"""
+The number of rows logged in full after entering an idle state, before the logger starts buffering
+them. This keeps the startup on the pad and the touchdown complete in the log.
+"""
+
+LOG_BUFFER_SNAPSHOT_INTERVAL = 100
+"""
+While buffering, one in every this many rows that fall out of the buffer is still written to the
+log, so long waits on the pad are recorded at a lower rate instead of not at all.
+"""
+
+LOG_PROFILE_COLUMNS = {
+    "minimal": (
+        "timestamp_epoch",
+        "state_letter",
+        "est_position_z_meters",
+        "est_velocity_z_meters_per_s",
+        "timestamp_seconds",
+        "raw_acceleration_x_gs",
+        "raw_acceleration_y_gs",
+        "raw_acceleration_z_gs",
+    ),
+    "standard": (
+        "timestamp_epoch",
+        "state_letter",
+        "nitrogen",
+        "pH",
+        "electrical_conductivity",
+        "activating_legs",
+        "checking_orientation",
+        "ejecting_zombie",
+        "latch",
+        "est_position_z_meters",
+        "est_velocity_z_meters_per_s",
+        "temperature_celsius",
+        "timestamp_seconds",
+        "raw_acceleration_x_gs",
+        "raw_acceleration_y_gs",
+        "raw_acceleration_z_gs",
+    ),
+}
+"""
+The columns of the logs of each log profile, in order. The "full" profile isn't listed, since it
+logs every field of the Context, Zombie, Grave and FIRM data packets.
+"""
+
+CONTEXT_LOG_COLUMN_NAMES = {"epoch_time": "timestamp_epoch", "state": "state_letter"}
+"""The fields of the ContextDataPacket that have a different name in the logs."""
+
+LOG_FILE_SUFFIXES = {"csv": ".csv", "binary": ".bin"}
+"""The suffix of the log files of each log format."""
+
+LOG_COMPRESSION_SUFFIXES = {"gzip": ".gz", "xz": ".xz"}
+"""The suffix added after the suffix of the log format when the log is compressed."""
+
+LOG_COMPRESSION_LEVELS = {"gzip": 3, "xz": 0}
+"""
+The compression level of each codec. Low levels, since the logger has to keep up with 1 kHz data
+on the Pi, and FIRM data already compresses well with them.
+"""
+
+BINARY_LOG_MAGIC = b"PAYLOADLOG1\n"
+"""The bytes every binary log starts with, followed by the schema frame and then the data frames."""
+
+BINARY_LOG_FRAME_HEADER_FORMAT = "<I"
+"""
+The struct format of the length prefix before every frame of a binary log (little-endian uint32).
+"""
+
+LOG_SEGMENT_SIZE_BYTES = 64 * 1024 * 1024
+"""
+The size at which a segmented log starts a new segment file. Each segment is checked on its own,
+so a corrupted segment can't take the rest of the log with it.
+"""
+
+LOG_SEGMENT_MAGIC = b"PAYLOADSEG1\n"
+"""The bytes every segment of a segmented log starts with."""
+
+LOG_SEGMENT_HEADER_FORMAT = "<IBII"
+"""
+The struct format of the header after LOG_SEGMENT_MAGIC: the index of the segment, the format of
+the rows (see LOG_SEGMENT_FORMAT_CODES), and the length and CRC32 of the log header that follows.
+"""
+
+LOG_SEGMENT_BLOCK_HEADER_FORMAT = "<II"
+"""The struct format before every block of a segment: the length and CRC32 of the block."""
+
+LOG_SEGMENT_FORMAT_CODES = {"csv": 0, "binary": 1}
+"""How the format of the rows in the blocks is stored in the segment header."""
+
+LOG_OFFSET_INDEX_SUFFIX = ".idx"
+"""
+The suffix added to the name of a log for its offset index, which says where every state starts in
+the log, and where every LOG_OFFSET_INDEX_INTERVAL_SECONDS of FIRM time starts.
+"""
+
+LOG_OFFSET_INDEX_INTERVAL_SECONDS = 1.0
+"""How often, in FIRM time, the offset index records where the log is."""
+
+LOG_OFFSET_INDEX_MAGIC = b"PAYLOADOFFSETS1\n"
+"""The bytes every offset index starts with, followed by the entries."""
+
+LOG_OFFSET_INDEX_ENTRY_FORMAT = "<QQd32s"
+"""
+The struct format of an entry of the offset index: the byte offset and number of the row in the
+log, the FIRM timestamp of the row, and the state of the row.
+"""
+
+LOG_RING_CAPACITY = 65536  # About a minute of data
+"""
+The number of rows the shared memory ring of the process logger can hold. If the logger process
+falls this far behind, new rows are dropped (and counted) instead of blocking the main loop.
+"""
+
+LOG_RING_POLL_SECONDS = 0.005
+"""How long the logger process sleeps when the shared memory ring is empty."""
+
+LOG_QUEUE_CAPACITY_ROWS = 60000  # About a minute of data
+"""
+The most rows that should wait to be written at a time. If the SD card stalls, the logger sheds
+rows instead of letting the queue grow until the Pi runs out of memory.
+"""
+
+LOG_QUEUE_HIGH_WATER_MARKS = (0.25, 0.5, 1.0)
+"""
+The fractions of LOG_QUEUE_CAPACITY_ROWS at which the logger sheds more and more rows, see
+LOG_SHEDDING_KEEP_EVERY.
+"""
+
+LOG_SHEDDING_KEEP_EVERY = ((10, 1), (0, 2), (0, 0))
+"""
+For each of LOG_QUEUE_HIGH_WATER_MARKS, keep one in how many rows of the idle states, and one in how
+many rows of the other states. 0 means no rows are kept. Standby and Landed rows are shed first.
+"""
+
+LOG_TRANSITION_GUARD_ROWS = 2000  # 2 seconds of data
+"""
+The number of rows before and after every state change that are never shed, however far behind
+the logger is.
+"""
+
 NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING = 1000  # 1 second of data
 """
 The number of lines we log before manually flushing the buffer and forcing the OS to write to the
 file.
 """
 
-STOP_SIGNAL = "STOP"
+SYNC_INTERVAL_SECONDS = 1.0
+"""
+How long the logger waits after writing a row before syncing the log file, with the "interval"
+durability strategy. The "state" strategy uses it for the states not in
+STATE_SYNC_INTERVALS_SECONDS.
+"""
+
+STATE_SYNC_INTERVALS_SECONDS = {
+    "StandbyState": 5.0,
+    "Launched": 0.1,
+    "LandedState": 0.25,
+}
+"""
+How long the logger may keep rows unsynced in each state, with the "state" durability strategy.
+Launched is the most aggressive since it ends with the impact on landing, which can cut the power.
+"""
+
+LOG_PREALLOCATION_CHUNK_BYTES = 16 * 1024 * 1024
+"""
+How much space is reserved for the log file at a time when preallocation is on. A preallocated file
+doesn't change size on every write, so fdatasync doesn't have to write any metadata.
+"""
+
+FSYNC_LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
 """
-The signal to stop the IMU, Logger, and ApogeePredictor thread, this will be put in the queue to
-stop the threads.
+The upper bounds of the buckets of the fsync latency histogram. Slower syncs go in a last bucket.
 """
 
 # ------------------------ Display Configuration ------------------------
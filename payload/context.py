@@ -6,14 +6,16 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 from zoneinfo import ZoneInfo
 
+from payload.clock import MonotonicClock
 from payload.data_handling.packets.context_data_packet import ContextDataPacket
 from payload.data_handling.packets.grave_data_packet import GraveDataPacket
 from payload.data_handling.packets.zombie_data_packet import ZombieDataPacket
-from payload.state import StandbyState
+from payload.state import DeployZombieState, StandbyState, ZombieSampleCollectedState
 
 if TYPE_CHECKING:
     from firm_client import FIRMDataPacket
 
+    from payload.base_classes.base_clock import BaseClock
     from payload.base_classes.base_firm import BaseFIRM
     from payload.data_handling.logger import Logger
     from payload.hardware.grave import Grave
@@ -38,6 +40,7 @@ class Context:
         "_drilling_thread",
         "_legs_retract_thread",
         "_legs_thread",
+        "clock",
         "context_data_packet",
         "firm",
         "firm_data_packets",
@@ -45,11 +48,13 @@ class Context:
         "grave_data_packet",
         "landing_time_seconds",
         "launch_time_seconds",
+        "launch_timestamp_seconds",
         "logger",
         "max_acceleration",
         "most_recent_firm_data_packet",
         "oriented",
         "state",
+        "thread_errors",
         "total_acceleration",
         "xy_orientation",
         "zombie",
@@ -57,8 +62,23 @@ class Context:
     )
 
     def __init__(
-        self, grave: Grave | None, zombie: Zombie | None, firm: BaseFIRM, logger: Logger
+        self,
+        grave: Grave | None,
+        zombie: Zombie | None,
+        firm: BaseFIRM,
+        logger: Logger,
+        clock: BaseClock | None = None,
     ) -> None:
+        """
+        Initializes the context.
+
+        :param grave: The Grave hardware, if this is Grave.
+        :param zombie: The Zombie hardware, if this is Zombie.
+        :param firm: Where the FIRM data packets come from.
+        :param logger: The logger to log every loop to.
+        :param clock: The clock the states read the time from. Defaults to the wall clock, replays
+            pass a FIRMClock so the timers run on the time of the replayed data.
+        """
         self.grave = grave
         self.zombie = zombie
         # This either has to be for Grave or for Zombie
@@ -67,6 +87,7 @@ class Context:
 
         self.logger = logger
         self.firm = firm
+        self.clock = clock if clock is not None else MonotonicClock()
         self.state = StandbyState(self)
         self.firm_data_packets: list[FIRMDataPacket] = []
         self.most_recent_firm_data_packet: FIRMDataPacket | None = None
@@ -74,12 +95,15 @@ class Context:
         self.grave_data_packet: GraveDataPacket | None = None
         self.zombie_data_packet: ZombieDataPacket | None = None
         self.launch_time_seconds: int = 0
+        self.launch_timestamp_seconds: float = 0.0
+        """The FIRM timestamp_seconds of the packet at which launch was detected."""
         self.total_acceleration: float = 0
         self.max_acceleration: float = 0
         self._deploy_thread: threading.Thread | None = None
         self._legs_thread: threading.Thread | None = None
         self._legs_retract_thread: threading.Thread | None = None,
         self._drilling_thread: threading.Thread | None = None
+        self.thread_errors: dict[str, Exception] = {}
         self.landing_time_seconds: int = 0
         self.xy_orientation: float = 0
         self.oriented: bool = False
@@ -102,6 +126,8 @@ class Context:
 
         self.most_recent_firm_data_packet = self.firm_data_packets[-1]
 
+        # Advance the clock before the state reads it
+        self.clock.update(self.firm_data_packets)
         self.state.update()
 
         self.total_acceleration = ((self.most_recent_firm_data_packet.raw_acceleration_z_gs**2)
@@ -122,20 +148,62 @@ class Context:
         )
 
     def _run_in_thread(self, target, name: str) -> threading.Thread:
-        """Runs a function in a daemon thread. Returns the thread so callers can track it."""
-        thread = threading.Thread(target=target, name=name, daemon=True)
+        """
+        Runs a function in a daemon thread. Returns the thread so callers can track it.
+
+        If the function raises, the exception is stored in `thread_errors` under the thread's name,
+        so the states can tell a failed job from a finished one, and raised again so the thread
+        prints its traceback like any other thread that fails.
+        """
+
+        def run_and_record_errors() -> None:
+            try:
+                target()
+            except Exception as e:
+                self.thread_errors[name] = e
+                raise
+
+        self.thread_errors.pop(name, None)
+        thread = threading.Thread(target=run_and_record_errors, name=name, daemon=True)
         thread.start()
         return thread
 
     def deploy_zombie(self):
         """
         Deploys Zombie out of the rocket. This method should only be called if code is Grave.
+
+        The deployment sleeps and moves the lead screw for a long time, so it runs in its own
+        thread to keep the main loop reading FIRM and logging while Zombie is ejected.
         """
-        self.grave.deploy_zombie()
+        self._deploy_thread = self._run_in_thread(self.grave.deploy_zombie, "Deploy Zombie Thread")
 
     @property
     def is_deploy_complete(self) -> bool:
-        return self._deploy_thread is not None and not self._deploy_thread.is_alive()
+        """
+        Returns whether Zombie was deployed. A deployment that failed is never complete, see
+        `deploy_error`.
+        """
+        return (
+            self._deploy_thread is not None
+            and not self._deploy_thread.is_alive()
+            and self.deploy_error is None
+        )
+
+    @property
+    def deploy_progress(self) -> float:
+        """
+        How far along the Zombie deployment is, from 0.0 to 1.0.
+        """
+        return self.grave.deploy_progress
+
+    @property
+    def deploy_error(self) -> Exception | None:
+        """
+        The exception that stopped the Zombie deployment, or None if it hasn't failed.
+        """
+        if self._deploy_thread is None:
+            return None
+        return self.thread_errors.get(self._deploy_thread.name)
 
     def generate_data_packets(self) -> None:
         self.context_data_packet = ContextDataPacket(
@@ -190,6 +258,16 @@ class Context:
     def is_drilling_complete(self) -> bool:
         return self._drilling_thread is not None and not self._drilling_thread.is_alive()
 
+    @property
+    def is_mission_complete(self) -> bool:
+        """
+        Returns whether the state machine has nothing left to do: Zombie was deployed out of Grave
+        without an error, or Zombie has collected its sample.
+        """
+        if self.grave:
+            return isinstance(self.state, DeployZombieState) and self.is_deploy_complete
+        return isinstance(self.state, ZombieSampleCollectedState)
+
     @property
     def is_zombie_deployed(self) -> bool:
         return self.zombie.check_deployment() and self.zombie.check_orientation()
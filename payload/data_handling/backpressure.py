@@ -0,0 +1,263 @@
+"""
+Module for keeping the log queue bounded when the logger can't keep up with the main loop.
+"""
+
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+
+import msgspec
+
+from payload.constants import (
+    IDLE_LOG_STATES,
+    LOG_QUEUE_CAPACITY_ROWS,
+    LOG_QUEUE_HIGH_WATER_MARKS,
+    LOG_SHEDDING_KEEP_EVERY,
+    LOG_TRANSITION_GUARD_ROWS,
+)
+
+if TYPE_CHECKING:
+    from payload.data_handling.logger import LogBatch
+    from payload.state import State
+
+
+class LogQueueMetrics(msgspec.Struct):
+    """A snapshot of how far behind the logger is, and what it did about it."""
+
+    depth_rows: int
+    """The number of rows waiting to be written."""
+
+    max_depth_rows: int
+    """The most rows that were ever waiting to be written."""
+
+    shedding_level: int
+    """How many high-water marks the depth is above, 0 if no rows are being shed."""
+
+    enqueue_rate_rows_per_second: float
+    """How fast the main loop queued rows since the last snapshot."""
+
+    drain_rate_rows_per_second: float
+    """How fast the logger took rows off the queue since the last snapshot."""
+
+    max_latency_seconds: float
+    """The longest time a row waited between being queued and being written."""
+
+    shed_rows: int
+    """The number of rows that were shed and will never be written."""
+
+
+class LogBackpressure:
+    """
+    Keeps the number of rows waiting to be written below a capacity, by shedding rows once the
+    queue gets deeper than its high-water marks, and keeps the metrics to see how close it got.
+
+    The rows of the idle states are shed first (decimated, then dropped), and the rows of the other
+    states only when the queue is deeper still. The LOG_TRANSITION_GUARD_ROWS rows after a state
+    change are never shed, and neither are the ones before it: the rows shed most recently are
+    held back, and queued after all when the state changes (or the logger stops). Those come after
+    the rows that were kept around them, so they can go back in time.
+
+    `admit` is only called by the main loop and `record_drained` only by the logger thread, and each
+    counter only has one writer, so no lock is needed. With the "process" backend, the depth comes
+    from the shared memory ring and `record_drained` is never called, so there's no latency metric.
+    """
+
+    __slots__ = (
+        "_held_batches",
+        "_held_rows",
+        "_last_snapshot_drained_rows",
+        "_last_snapshot_enqueued_rows",
+        "_last_snapshot_time",
+        "_last_state",
+        "_rows_since_transition",
+        "_thresholds_rows",
+        "capacity_rows",
+        "drained_rows",
+        "enqueued_rows",
+        "guard_rows",
+        "keep_every",
+        "max_depth_rows",
+        "max_latency_seconds",
+        "shed_rows",
+    )
+
+    def __init__(
+        self,
+        capacity_rows: int = LOG_QUEUE_CAPACITY_ROWS,
+        *,
+        high_water_marks: tuple[float, ...] = LOG_QUEUE_HIGH_WATER_MARKS,
+        keep_every: tuple[tuple[int, int], ...] = LOG_SHEDDING_KEEP_EVERY,
+        guard_rows: int = LOG_TRANSITION_GUARD_ROWS,
+    ) -> None:
+        """
+        Initializes the backpressure.
+
+        :param capacity_rows: The most rows that should wait to be written at a time.
+        :param high_water_marks: The fractions of the capacity at which more rows are shed, in
+            increasing order.
+        :param keep_every: For each high-water mark, keep one in how many rows of the idle states
+            and one in how many rows of the other states. 0 means no rows are kept.
+        :param guard_rows: The number of rows before and after every state change that are never
+            shed.
+        """
+        if len(keep_every) != len(high_water_marks):
+            raise ValueError("There must be a shedding rule for every high-water mark.")
+
+        self.capacity_rows = capacity_rows
+        self.keep_every = keep_every
+        self.guard_rows = guard_rows
+        self._thresholds_rows = [int(mark * capacity_rows) for mark in high_water_marks]
+
+        # Written by the main loop
+        self.enqueued_rows = 0
+        self.shed_rows = 0
+        self.max_depth_rows = 0
+        self._last_state: type[State] | None = None
+        self._rows_since_transition = 0
+        self._held_batches: deque[LogBatch] = deque()
+        self._held_rows = 0
+
+        # Written by the logger thread
+        self.drained_rows = 0
+        self.max_latency_seconds = 0.0
+
+        # Written by whoever takes the snapshots
+        self._last_snapshot_time = time.monotonic()
+        self._last_snapshot_enqueued_rows = 0
+        self._last_snapshot_drained_rows = 0
+
+    def shedding_level(self, depth_rows: int) -> int:
+        """
+        Returns how many high-water marks the depth is above.
+
+        :param depth_rows: The number of rows waiting to be written.
+        """
+        level = 0
+        for threshold in self._thresholds_rows:
+            if depth_rows < threshold:
+                break
+            level += 1
+        return level
+
+    def admit(self, log_batch: LogBatch, depth_rows: int) -> tuple[LogBatch, ...]:
+        """
+        Decides which rows of a batch are queued, given how far behind the logger is.
+
+        :param log_batch: The batch the main loop wants to log.
+        :param depth_rows: The number of rows waiting to be written.
+        :return: The batches to queue, in order. Usually just the batch, but it can be a part of
+            it, nothing, or the held back rows followed by the batch when the state changed.
+        """
+        self.max_depth_rows = max(self.max_depth_rows, depth_rows)
+        row_count = len(log_batch.firm_data_packets)
+        state = log_batch.context_data_packet.state
+
+        if state is not self._last_state:
+            self._last_state = state
+            self._rows_since_transition = row_count
+            admitted = (*self.release_held_batches(), log_batch)
+        elif self._rows_since_transition < self.guard_rows:
+            self._rows_since_transition += row_count
+            admitted = (log_batch,)
+        else:
+            level = self.shedding_level(depth_rows)
+            if not level:
+                admitted = (log_batch,)
+            else:
+                idle_keep_every, flight_keep_every = self.keep_every[level - 1]
+                keep_every = (
+                    idle_keep_every if state.__name__ in IDLE_LOG_STATES else flight_keep_every
+                )
+                admitted = self._shed(log_batch, keep_every)
+
+        for batch in admitted:
+            self.enqueued_rows += len(batch.firm_data_packets)
+        return admitted
+
+    def _shed(self, log_batch: LogBatch, keep_every: int) -> tuple[LogBatch, ...]:
+        """
+        Keeps one in every `keep_every` rows of a batch, and holds back the rest.
+
+        :param log_batch: The batch to shed rows from.
+        :param keep_every: Keep one in how many rows, 0 to keep none.
+        :return: The batch to queue with the rows that are kept, if any.
+        """
+        if keep_every == 1:
+            return (log_batch,)
+
+        firm_data_packets = log_batch.firm_data_packets
+        if keep_every == 0:
+            self._hold(log_batch)
+            return ()
+
+        shed_packets = list(firm_data_packets)
+        del shed_packets[::keep_every]
+        self._hold(msgspec.structs.replace(log_batch, firm_data_packets=shed_packets))
+        kept_packets = firm_data_packets[::keep_every]
+        return (msgspec.structs.replace(log_batch, firm_data_packets=kept_packets),)
+
+    def _hold(self, log_batch: LogBatch) -> None:
+        """
+        Holds back shed rows in case the state changes soon, and drops the oldest ones for good once
+        more than `guard_rows` are held.
+
+        :param log_batch: The batch of shed rows.
+        """
+        if not log_batch.firm_data_packets:
+            return
+        self._held_batches.append(log_batch)
+        self._held_rows += len(log_batch.firm_data_packets)
+        while self._held_rows - len(self._held_batches[0].firm_data_packets) >= self.guard_rows:
+            dropped_rows = len(self._held_batches.popleft().firm_data_packets)
+            self._held_rows -= dropped_rows
+            self.shed_rows += dropped_rows
+
+    def release_held_batches(self) -> list[LogBatch]:
+        """
+        Gives back the rows that were held back, so they can be queued after all.
+
+        :return: The held back batches, oldest first.
+        """
+        held_batches = list(self._held_batches)
+        self._held_batches.clear()
+        self._held_rows = 0
+        return held_batches
+
+    # ------------------------ Called by the logger thread ----------------------------------------
+    def record_drained(self, row_count: int, oldest_enqueued_ns: int) -> None:
+        """
+        Tells the backpressure that rows were taken off the queue and written.
+
+        :param row_count: The number of rows.
+        :param oldest_enqueued_ns: When the oldest of them was queued, from time.monotonic_ns.
+        """
+        self.drained_rows += row_count
+        latency_seconds = (time.monotonic_ns() - oldest_enqueued_ns) / 1e9
+        self.max_latency_seconds = max(self.max_latency_seconds, latency_seconds)
+
+    # ------------------------ Called by whoever reads the metrics --------------------------------
+    def snapshot(self, depth_rows: int) -> LogQueueMetrics:
+        """
+        Takes a snapshot of the metrics. The rates are averaged since the last snapshot.
+
+        :param depth_rows: The number of rows waiting to be written.
+        :return: The metrics.
+        """
+        now = time.monotonic()
+        elapsed = max(now - self._last_snapshot_time, 1e-9)
+        enqueued_rows = self.enqueued_rows
+        drained_rows = enqueued_rows - depth_rows
+        metrics = LogQueueMetrics(
+            depth_rows=depth_rows,
+            max_depth_rows=max(self.max_depth_rows, depth_rows),
+            shedding_level=self.shedding_level(depth_rows),
+            enqueue_rate_rows_per_second=(enqueued_rows - self._last_snapshot_enqueued_rows)
+            / elapsed,
+            drain_rate_rows_per_second=(drained_rows - self._last_snapshot_drained_rows) / elapsed,
+            max_latency_seconds=self.max_latency_seconds,
+            shed_rows=self.shed_rows,
+        )
+        self._last_snapshot_time = now
+        self._last_snapshot_enqueued_rows = enqueued_rows
+        self._last_snapshot_drained_rows = drained_rows
+        return metrics
@@ -0,0 +1,108 @@
+"""
+Module for the queue that hands packets from a producer thread to the main loop (or the logger
+thread) a batch at a time.
+"""
+
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+class BatchQueue[T]:
+    """
+    A queue that the consumer always empties at once, like get_data_packets does every loop.
+
+    The items wait in a plain list. The producer adds a whole batch of them with one lock, and the
+    consumer swaps the list for an empty one, so taking any number of items costs the same as
+    taking one. A queue.SimpleQueue had to be drained with a get() per item, which is a lock round
+    trip for every packet at 1 kHz.
+
+    Stopping the queue takes the place of putting a stop signal in it: the items put before it are
+    still handed out, the items put after it are dropped, and once it is empty every get returns
+    right away.
+
+    A queue with a max size makes the producer wait while it is full, until the consumer takes the
+    items or the queue is stopped.
+    """
+
+    __slots__ = ("_condition", "_is_stopped", "_items", "_max_size")
+
+    def __init__(self, max_size: int | None = None) -> None:
+        """
+        Initializes the queue.
+
+        :param max_size: How many items the queue can hold before a put waits for the consumer, or
+            None for no limit. A batch is added whole once there is room, so it can go over this.
+        """
+        self._condition = threading.Condition(threading.Lock())
+        self._items: list[T] = []
+        self._is_stopped = False
+        self._max_size = max_size
+
+    @property
+    def is_stopped(self) -> bool:
+        """Returns whether the queue was stopped, even if it still has items."""
+        return self._is_stopped
+
+    def put(self, item: T) -> None:
+        """
+        Adds an item to the queue.
+
+        :param item: The item.
+        """
+        with self._condition:
+            self._wait_for_room()
+            if self._is_stopped:
+                return
+            self._items.append(item)
+            self._condition.notify()
+
+    def put_batch(self, items: Iterable[T]) -> None:
+        """
+        Adds items to the queue, all at once.
+
+        :param items: The items, in order. They are read before the lock is taken, so a lazy
+            iterable doesn't hold up the consumer.
+        """
+        items = list(items)
+        if not items:
+            return
+        with self._condition:
+            self._wait_for_room()
+            if self._is_stopped:
+                return
+            self._items.extend(items)
+            self._condition.notify()
+
+    def stop(self) -> None:
+        """Stops the queue, and wakes up the consumer if it is waiting for items."""
+        with self._condition:
+            self._is_stopped = True
+            self._condition.notify_all()
+
+    def get_all(self, block: bool = True, timeout: float | None = None) -> tuple[list[T], bool]:
+        """
+        Takes every item in the queue.
+
+        :param block: Whether to wait for an item if the queue is empty.
+        :param timeout: The longest time to wait, in seconds. None waits until there is an item or
+            the queue is stopped.
+        :return: The items, in order, and whether the queue was stopped after them, which both come
+            from the same moment so no item put before the stop can be missed.
+        """
+        with self._condition:
+            if block and not self._items:
+                self._condition.wait_for(lambda: self._items or self._is_stopped, timeout)
+            items = self._items
+            self._items = []
+            if self._max_size is not None:
+                # The producer shares the condition, so wake it up too
+                self._condition.notify_all()
+            return items, self._is_stopped
+
+    def _wait_for_room(self) -> None:
+        """Waits until the queue isn't full or is stopped. Needs the lock of the condition."""
+        if self._max_size is not None:
+            self._condition.wait_for(lambda: len(self._items) < self._max_size or self._is_stopped)
@@ -0,0 +1,160 @@
+"""
+Module for reading the binary logs written by the Logger, and converting them to CSV.
+
+A binary log is BINARY_LOG_MAGIC, followed by frames which are each a little-endian uint32 length
+and a MessagePack payload. The first frame is the schema (the name and type of every column), and
+every frame after that is one batch of rows, each row being an array in the order of the schema.
+Compressed binary logs (.bin.gz and .bin.xz) are decompressed first.
+"""
+
+import argparse
+import csv
+import itertools
+import mmap
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import msgspec
+import polars as pl
+
+from payload.constants import (
+    BINARY_LOG_FRAME_HEADER_FORMAT,
+    BINARY_LOG_MAGIC,
+    LOG_COMPRESSION_SUFFIXES,
+)
+from payload.data_handling.logger import Logger, decompress_log
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+FRAME_HEADER_SIZE = struct.calcsize(BINARY_LOG_FRAME_HEADER_FORMAT)
+
+POLARS_TYPES: dict[str, pl.DataType] = {
+    "str": pl.String(),
+    "float": pl.Float64(),
+    "int": pl.Int64(),
+    "bool": pl.Boolean(),
+}
+"""The Polars dtype of a column, by the first type in its schema type (e.g. "float | None")."""
+
+
+class BinaryLogSchema(msgspec.Struct):
+    """The schema frame at the start of a binary log."""
+
+    fields: list[str]
+    types: list[str]
+
+    @property
+    def polars_schema(self) -> dict[str, pl.DataType]:
+        """
+        The Polars schema of the log, with every column that can't be mapped read as a string.
+        """
+        return {
+            name: POLARS_TYPES.get(type_name.split("|")[0].strip(), pl.String())
+            for name, type_name in zip(self.fields, self.types, strict=True)
+        }
+
+
+def _iter_frames(
+    data: bytes | mmap.mmap, offset: int = len(BINARY_LOG_MAGIC), end: int | None = None
+) -> Iterator[memoryview]:
+    """
+    Splits the data of a binary log (after the magic bytes) into frames.
+
+    If the logger lost power in the middle of writing a frame, the torn frame at the end is
+    skipped, and every complete frame before it is still returned. The same goes for the zeros at
+    the end of a preallocated log that wasn't closed.
+
+    :param data: The contents of the log file.
+    :param offset: Where the first frame starts.
+    :param end: Where to stop reading frames. Defaults to the end of the data.
+    :return: An iterator over the payload of every complete frame.
+    """
+    with memoryview(data) as data_view, data_view[:end] as view:
+        while offset + FRAME_HEADER_SIZE <= len(view):
+            (length,) = struct.unpack_from(BINARY_LOG_FRAME_HEADER_FORMAT, view, offset)
+            start = offset + FRAME_HEADER_SIZE
+            if length == 0 or start + length > len(view):
+                break
+            with view[start : start + length] as frame:
+                yield frame
+            offset = start + length
+
+
+def iter_binary_log(log_path: Path) -> Iterator[BinaryLogSchema | list[list[Any]]]:
+    """
+    Reads a binary log frame by frame.
+
+    :param log_path: The path to the binary log.
+    :return: An iterator which first yields the schema of the log, then every batch of rows.
+    """
+    compression = next(
+        (name for name, suffix in LOG_COMPRESSION_SUFFIXES.items() if log_path.suffix == suffix),
+        None,
+    )
+    with log_path.open("rb") as file:
+        data = (
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if compression is None
+            else decompress_log(file.read(), compression)
+        )
+        if data[: len(BINARY_LOG_MAGIC)] != BINARY_LOG_MAGIC:
+            raise ValueError(f"{log_path} is not a binary payload log.")
+
+        frames = _iter_frames(data)
+        try:
+            yield msgspec.msgpack.decode(next(frames), type=BinaryLogSchema)
+            decoder = msgspec.msgpack.Decoder(list[list[Any]])
+            for frame in frames:
+                yield decoder.decode(frame)
+        finally:
+            # Release our views of the file before it is unmapped
+            frames.close()
+            if compression is None:
+                data.close()
+
+
+def read_binary_log(log_path: Path) -> pl.DataFrame:
+    """
+    Reads a binary log into a Polars DataFrame.
+
+    :param log_path: The path to the binary log.
+    :return: A DataFrame with one row per logged packet, typed according to the log's schema.
+    """
+    frames = iter_binary_log(log_path)
+    schema: BinaryLogSchema = next(frames)
+    rows = list(itertools.chain.from_iterable(frames))
+    return pl.DataFrame(rows, schema=schema.polars_schema, orient="row", strict=False)
+
+
+def convert_binary_log_to_csv(log_path: Path, csv_path: Path) -> None:
+    """
+    Converts a binary log to the CSV that the Logger would have written for the same data.
+
+    :param log_path: The path to the binary log.
+    :param csv_path: The path of the CSV file to write.
+    """
+    frames = iter_binary_log(log_path)
+    schema: BinaryLogSchema = next(frames)
+    with csv_path.open("w", newline="") as csv_file:
+        csv.writer(csv_file).writerow(schema.fields)
+        for rows in frames:
+            if rows:
+                csv_file.write(Logger._encode_csv_batch(rows))
+
+
+def main() -> None:
+    """Converts binary logs given on the command line to CSV files next to them."""
+    parser = argparse.ArgumentParser(description="Convert binary payload logs to CSV.")
+    parser.add_argument(
+        "logs", type=Path, nargs="+", metavar="LOG", help="The .bin (or .bin.gz, .bin.xz) logs."
+    )
+    args = parser.parse_args()
+    for log_path in args.logs:
+        csv_path = log_path.with_name(f"{log_path.name.split('.')[0]}.csv")
+        convert_binary_log_to_csv(log_path, csv_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Module for deciding when the logger forces the log file onto the SD card.
+"""
+
+import bisect
+import os
+import time
+from typing import TYPE_CHECKING, Literal
+
+from payload.constants import (
+    FSYNC_LATENCY_BUCKETS_MS,
+    LOG_PREALLOCATION_CHUNK_BYTES,
+    NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING,
+    STATE_SYNC_INTERVALS_SECONDS,
+    SYNC_INTERVAL_SECONDS,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import BinaryIO
+
+DurabilityStrategy = Literal["rows", "interval", "state"]
+"""
+When to sync the log file:
+- "rows": every `rows_per_sync` rows, however long that takes.
+- "interval": at most `sync_interval_seconds` after the oldest unsynced row was written.
+- "state": like "interval", but the interval depends on the state of the last row written.
+"""
+
+
+def ends_in_reserved_space(log_path: Path) -> bool:
+    """
+    Returns whether a log file ends in zeros, the space that was reserved for it but never written.
+    Only a preallocated log that wasn't closed (e.g. the power was cut) does.
+
+    :param log_path: The log file.
+    :return: Whether the file ends in a zero byte.
+    """
+    with log_path.open("rb") as file:
+        if not file.seek(0, os.SEEK_END):
+            return False
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\0"
+
+
+def strip_reserved_space(data: bytes) -> bytes:
+    """
+    Removes the zeros at the end of a preallocated log that wasn't closed, which aren't rows.
+
+    :param data: The contents of the log, or of its last rows.
+    :return: The contents without the zeros.
+    """
+    return data.rstrip(b"\0")
+
+
+class DurabilityPolicy:
+    """
+    Decides when the logger flushes and syncs the log file, and measures how long every sync takes.
+
+    Syncing is what actually gets the data onto the SD card, so it's what saves the data when the
+    power is cut, but it is also slow and wears the card. The latencies are kept in a histogram
+    (see FSYNC_LATENCY_BUCKETS_MS), so the strategy can be picked from measurements.
+
+    All the methods are called from the logger thread.
+    """
+
+    __slots__ = (
+        "_allocated_bytes",
+        "_first_unsynced_write_time",
+        "_last_state_name",
+        "_rows_since_sync",
+        "fsync_latency_counts",
+        "max_fsync_latency_ms",
+        "preallocate",
+        "rows_per_sync",
+        "state_sync_intervals_seconds",
+        "strategy",
+        "sync_interval_seconds",
+        "use_fdatasync",
+    )
+
+    def __init__(
+        self,
+        strategy: DurabilityStrategy = "rows",
+        *,
+        rows_per_sync: int = NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING,
+        sync_interval_seconds: float = SYNC_INTERVAL_SECONDS,
+        state_sync_intervals_seconds: dict[str, float] | None = None,
+        use_fdatasync: bool = False,
+        preallocate: bool = False,
+    ) -> None:
+        """
+        Initializes the durability policy.
+
+        :param strategy: When to sync the log file, see DurabilityStrategy.
+        :param rows_per_sync: The number of rows between syncs with the "rows" strategy.
+        :param sync_interval_seconds: The longest time rows can stay unsynced with the "interval"
+            strategy, and the default for the states without their own interval.
+        :param state_sync_intervals_seconds: The longest time rows can stay unsynced in each state,
+            by state name, with the "state" strategy. Defaults to STATE_SYNC_INTERVALS_SECONDS.
+        :param use_fdatasync: Whether to use fdatasync instead of fsync, which skips writing
+            metadata like the modification time. Only available on Linux.
+        :param preallocate: Whether to reserve space for the log file in chunks of
+            LOG_PREALLOCATION_CHUNK_BYTES with posix_fallocate, so the file size doesn't change on
+            every write. Only available on Linux.
+        """
+        self.strategy = strategy
+        self.rows_per_sync = rows_per_sync
+        self.sync_interval_seconds = sync_interval_seconds
+        self.state_sync_intervals_seconds = (
+            STATE_SYNC_INTERVALS_SECONDS
+            if state_sync_intervals_seconds is None
+            else state_sync_intervals_seconds
+        )
+        self.use_fdatasync = use_fdatasync and hasattr(os, "fdatasync")
+        self.preallocate = preallocate and hasattr(os, "posix_fallocate")
+
+        self._allocated_bytes = 0
+        self._rows_since_sync = 0
+        self._first_unsynced_write_time: float | None = None
+        self._last_state_name = ""
+
+        # One count per bucket in FSYNC_LATENCY_BUCKETS_MS, plus one for slower syncs
+        self.fsync_latency_counts = [0] * (len(FSYNC_LATENCY_BUCKETS_MS) + 1)
+        self.max_fsync_latency_ms = 0.0
+
+    @property
+    def fsync_latency_histogram(self) -> dict[str, int]:
+        """
+        Returns the number of syncs in each latency bucket, e.g. {"<= 5 ms": 12, "<= 10 ms": 3}.
+        """
+        labels = [f"<= {bound} ms" for bound in FSYNC_LATENCY_BUCKETS_MS]
+        labels.append(f"> {FSYNC_LATENCY_BUCKETS_MS[-1]} ms")
+        return dict(zip(labels, self.fsync_latency_counts, strict=True))
+
+    @property
+    def current_sync_interval_seconds(self) -> float | None:
+        """
+        Returns how long rows may stay unsynced right now, or None if syncing only depends on the
+        number of rows.
+        """
+        if self.strategy == "rows":
+            return None
+        if self.strategy == "state":
+            return self.state_sync_intervals_seconds.get(
+                self._last_state_name, self.sync_interval_seconds
+            )
+        return self.sync_interval_seconds
+
+    @property
+    def wait_timeout_seconds(self) -> float | None:
+        """
+        Returns how long the logger thread can wait for new rows before it has to sync, or None if
+        it can wait forever. This is what makes sure quiet periods don't leave rows unsynced.
+        """
+        interval = self.current_sync_interval_seconds
+        if interval is None or self._first_unsynced_write_time is None:
+            return None
+        return max(0.0, self._first_unsynced_write_time + interval - time.monotonic())
+
+    def open(self, file: BinaryIO) -> None:
+        """
+        Prepares a log file opened for writing, with its position at the end of the data.
+
+        :param file: The log file.
+        """
+        self._reserve_space(file)
+
+    def record_write(self, file: BinaryIO, row_count: int, state_name: str) -> None:
+        """
+        Tells the policy that rows were just written to the log file.
+
+        :param file: The log file.
+        :param row_count: The number of rows written.
+        :param state_name: The state of the last row written.
+        """
+        if self._first_unsynced_write_time is None:
+            self._first_unsynced_write_time = time.monotonic()
+        self._rows_since_sync += row_count
+        self._last_state_name = state_name
+        self._reserve_space(file)
+
+    def is_sync_due(self) -> bool:
+        """
+        Returns whether the rows written so far should be synced now.
+        """
+        if not self._rows_since_sync:
+            return False
+        if self.strategy == "rows":
+            return self._rows_since_sync >= self.rows_per_sync
+        return self.wait_timeout_seconds == 0.0
+
+    def sync_if_due(self, file: BinaryIO) -> None:
+        """
+        Syncs the log file if the strategy says it's time to.
+
+        :param file: The log file.
+        """
+        if self.is_sync_due():
+            self.sync(file)
+
+    def sync(self, file: BinaryIO) -> None:
+        """
+        Flushes and syncs the log file, and records how long the sync took.
+
+        :param file: The log file.
+        """
+        # Tell Python to flush the data. This gives the data to the OS, and it is stored as a dirty
+        # page cache (in memory) until the OS decides to write it to disk.
+        file.flush()
+        # Tell the OS to write the file to disk from the dirty page cache. This operation is the
+        # one which is actually "blocking" when talking about file I/O.
+        start = time.perf_counter()
+        if self.use_fdatasync:
+            os.fdatasync(file.fileno())
+        else:
+            os.fsync(file.fileno())
+        latency_ms = (time.perf_counter() - start) * 1e3
+
+        self.fsync_latency_counts[bisect.bisect_left(FSYNC_LATENCY_BUCKETS_MS, latency_ms)] += 1
+        self.max_fsync_latency_ms = max(self.max_fsync_latency_ms, latency_ms)
+        self._rows_since_sync = 0
+        self._first_unsynced_write_time = None
+
+    def close(self, file: BinaryIO) -> None:
+        """
+        Syncs the rows that are left and gives back the space that was reserved but not used.
+
+        After this, the policy can be used for another file, e.g. the next segment of the log.
+
+        :param file: The log file.
+        """
+        if self._allocated_bytes:
+            file.truncate()
+            self._allocated_bytes = 0
+        self.sync(file)
+
+    def _reserve_space(self, file: BinaryIO) -> None:
+        """
+        Reserves another chunk of space for the log file once less than half a chunk is left.
+
+        :param file: The log file.
+        """
+        if not self.preallocate:
+            return
+        position = file.tell()
+        if self._allocated_bytes - position < LOG_PREALLOCATION_CHUNK_BYTES // 2:
+            self._allocated_bytes = position + LOG_PREALLOCATION_CHUNK_BYTES
+            os.posix_fallocate(file.fileno(), 0, self._allocated_bytes)
@@ -0,0 +1,376 @@
+"""
+Module for the index of the log directory.
+
+The index (LOG_INDEX_NAME in the log directory) keeps the number of the next log and an entry for
+every log: when it started, how long it ran, how many rows and which states it has, and how big it
+is. The Logger updates it when a log is created and when it is stopped, so starting the Logger
+doesn't list the directory however many logs are in it, and tools can list the flights without
+opening the logs.
+
+The index is a JSON lines file, and every update appends one record with the entry of one log as it
+is after the update, so updating it costs the same however many logs there are. The Logger only
+reads the end of the index, where the last record has the number of the next log. Reading the whole
+index replays the records, where the last record of a log wins. A power cut can only tear the last
+line, which is skipped. If the index is missing or damaged, it is rebuilt from the names of the logs
+in the directory, which also compacts it to one record per log.
+"""
+
+import argparse
+import contextlib
+import os
+import re
+import time
+from pathlib import Path
+
+import msgspec
+
+from payload.constants import (
+    LOG_COMPRESSION_SUFFIXES,
+    LOG_FILE_SUFFIXES,
+    LOG_INDEX_NAME,
+    LOG_OFFSET_INDEX_SUFFIX,
+    LOGS_PATH,
+)
+
+LOG_NAME_PATTERN = re.compile(r"log_(\d+)(\..*)?")
+"""Matches the name of a log file or a segmented log directory, capturing the number of the log."""
+
+LOG_INDEX_TAIL_BYTES = 16 * 1024
+"""How much of the end of the index is read to find the number of the next log."""
+
+
+class LogIndexEntry(msgspec.Struct):
+    """What the index knows about a log. A log that was never stopped only has its start time."""
+
+    name: str
+    """The name of the log file (or segmented log directory) in the log directory."""
+
+    number: int
+    """The number of the log."""
+
+    start_time: float
+    """When the log was created, in seconds since the epoch."""
+
+    duration_seconds: float | None = None
+    """How long the Logger ran."""
+
+    row_count: int | None = None
+    """The number of rows written to the log."""
+
+    states: list[str] = msgspec.field(default_factory=list)
+    """The states of the rows in the log, in alphabetical order."""
+
+    size_bytes: int | None = None
+    """The size of the log on the disk, when it was stopped."""
+
+
+class LogIndexRecord(msgspec.Struct, omit_defaults=True):
+    """A line of the index: the entry of one log, as it is after an update."""
+
+    next_log_number: int
+    """The number the next log gets, after the update."""
+
+    entry: LogIndexEntry
+    """The entry of the log."""
+
+    removed: bool = False
+    """Whether the log was removed from the index."""
+
+
+class LogIndex(msgspec.Struct):
+    """The index of a log directory."""
+
+    next_log_number: int = 1
+    """The number the next log gets."""
+
+    logs: list[LogIndexEntry] = msgspec.field(default_factory=list)
+    """The logs in the directory, oldest first."""
+
+    def find(self, name: str) -> LogIndexEntry | None:
+        """
+        Finds the entry of a log.
+
+        :param name: The name of the log.
+        :return: The entry, or None if the log isn't in the index.
+        """
+        return next((entry for entry in self.logs if entry.name == name), None)
+
+
+LOG_INDEX_RECORD_DECODER = msgspec.json.Decoder(LogIndexRecord)
+"""Decodes a line of the index."""
+
+
+def _log_size_bytes(log_path: Path) -> int:
+    """
+    Returns the size of a log, which is the total size of the segments of a segmented log.
+
+    :param log_path: The log file or segmented log directory.
+    """
+    if log_path.is_dir():
+        return sum(path.stat().st_size for path in log_path.iterdir())
+    return log_path.stat().st_size
+
+
+def _decode_records(lines: list[bytes]) -> list[LogIndexRecord]:
+    """
+    Decodes lines of the index, skipping the ones that were torn by a power cut.
+
+    :param lines: The lines of the index.
+    :return: The records, in order.
+    """
+    records = []
+    for line in lines:
+        with contextlib.suppress(msgspec.DecodeError):
+            records.append(LOG_INDEX_RECORD_DECODER.decode(line))
+    return records
+
+
+def _read_records(log_dir: Path) -> list[LogIndexRecord]:
+    """
+    Reads every record of the index.
+
+    :param log_dir: The log directory.
+    :return: The records, in order, or none if there is no index.
+    """
+    try:
+        return _decode_records((log_dir / LOG_INDEX_NAME).read_bytes().splitlines())
+    except FileNotFoundError:
+        return []
+
+
+def _replay_records(records: list[LogIndexRecord]) -> dict[str, LogIndexEntry]:
+    """
+    Works out the entry of every log from the records, where the last record of a log wins.
+
+    :param records: The records, in order.
+    :return: The entries of the logs that weren't removed, by name.
+    """
+    entries: dict[str, LogIndexEntry] = {}
+    for record in records:
+        if record.removed:
+            entries.pop(record.entry.name, None)
+        else:
+            entries[record.entry.name] = record.entry
+    return entries
+
+
+def rebuild_log_index(log_dir: Path) -> LogIndex:
+    """
+    Rebuilds the index from the logs in the directory, and writes it with one record per log.
+
+    What the old index knew about a log is kept. The logs aren't opened, so for the other logs only
+    the size is known, and the modification time stands in for the start time. Offset indexes next
+    to the logs aren't logs, so they are skipped.
+
+    :param log_dir: The log directory.
+    :return: The rebuilt index.
+    """
+    known_entries = _replay_records(_read_records(log_dir))
+    logs = sorted(
+        (
+            known_entries.get(log_path.name)
+            or LogIndexEntry(
+                name=log_path.name,
+                number=int(match.group(1)),
+                start_time=log_path.stat().st_mtime,
+                size_bytes=_log_size_bytes(log_path),
+            )
+            for log_path in log_dir.glob("log_*")
+            if (match := LOG_NAME_PATTERN.fullmatch(log_path.name))
+            and not log_path.name.endswith(LOG_OFFSET_INDEX_SUFFIX)
+        ),
+        key=lambda entry: entry.number,
+    )
+    index = LogIndex(next_log_number=logs[-1].number + 1 if logs else 1, logs=logs)
+    write_log_index(log_dir, index)
+    return index
+
+
+def read_log_index(log_dir: Path) -> LogIndex:
+    """
+    Reads the index of the log directory, rebuilding it if it is missing or damaged.
+
+    :param log_dir: The log directory.
+    :return: The index.
+    """
+    records = _read_records(log_dir)
+    if not records:
+        return rebuild_log_index(log_dir)
+    logs = sorted(_replay_records(records).values(), key=lambda entry: entry.number)
+    return LogIndex(next_log_number=records[-1].next_log_number, logs=logs)
+
+
+def _read_last_records(log_dir: Path) -> list[LogIndexRecord]:
+    """
+    Reads the records at the end of the index, without reading the rest of it.
+
+    :param log_dir: The log directory.
+    :return: The records in the last LOG_INDEX_TAIL_BYTES of the index, in order.
+    """
+    try:
+        with (log_dir / LOG_INDEX_NAME).open("rb") as file:
+            file.seek(max(0, file.seek(0, os.SEEK_END) - LOG_INDEX_TAIL_BYTES))
+            # The first line can be cut off by the seek, and the last one torn by a power cut
+            return _decode_records(file.read().splitlines())
+    except FileNotFoundError:
+        return []
+
+
+def _append_record(log_dir: Path, record: LogIndexRecord) -> None:
+    """
+    Appends a record to the index, and syncs it.
+
+    :param log_dir: The log directory.
+    :param record: The record.
+    """
+    line = msgspec.json.encode(record) + b"\n"
+    with (log_dir / LOG_INDEX_NAME).open("a+b") as file:
+        if file.tell():
+            # Start on a new line if the last one was torn by a power cut
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b"\n":
+                line = b"\n" + line
+        file.write(line)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def write_log_index(log_dir: Path, index: LogIndex) -> None:
+    """
+    Replaces the index of the log directory with one record per log, atomically.
+
+    :param log_dir: The log directory.
+    :param index: The new index.
+    """
+    index_path = log_dir / LOG_INDEX_NAME
+    temporary_path = index_path.with_name(f"{LOG_INDEX_NAME}.tmp")
+    with temporary_path.open("wb") as file:
+        file.writelines(
+            msgspec.json.encode(LogIndexRecord(index.next_log_number, entry)) + b"\n"
+            for entry in index.logs
+        )
+        file.flush()
+        os.fsync(file.fileno())
+    temporary_path.replace(index_path)
+
+
+def _is_log_number_taken(log_dir: Path, number: int) -> bool:
+    """
+    Checks whether a log with the number is in the directory, whatever its format. This only
+    checks the few names the log could have, so it doesn't depend on how many logs there are.
+
+    :param log_dir: The log directory.
+    :param number: The number of the log.
+    """
+    suffixes = [""]
+    for suffix in LOG_FILE_SUFFIXES.values():
+        suffixes.append(suffix)
+        suffixes.extend(suffix + extra for extra in LOG_COMPRESSION_SUFFIXES.values())
+    return any((log_dir / f"log_{number}{suffix}").exists() for suffix in suffixes)
+
+
+def create_log(log_dir: Path, suffix: str, *, is_directory: bool = False) -> Path:
+    """
+    Creates an empty log with the next number, and adds it to the index.
+
+    If a log with that number is already there (e.g. logs were copied into the directory), the
+    index is out of date, so it is rebuilt first.
+
+    :param log_dir: The log directory. It must already exist.
+    :param suffix: The suffix of the log file, e.g. ".csv" or ".bin.gz".
+    :param is_directory: Whether to create a segmented log directory instead of a file.
+    :return: The path of the new log.
+    """
+    last_records = _read_last_records(log_dir)
+    if last_records:
+        number = last_records[-1].next_log_number
+    else:
+        number = read_log_index(log_dir).next_log_number
+    if _is_log_number_taken(log_dir, number):
+        number = rebuild_log_index(log_dir).next_log_number
+
+    log_path = log_dir / f"log_{number}{suffix}"
+    if is_directory:
+        log_path.mkdir()
+    else:
+        log_path.touch(exist_ok=False)
+
+    entry = LogIndexEntry(name=log_path.name, number=number, start_time=time.time())
+    _append_record(log_dir, LogIndexRecord(number + 1, entry))
+    return log_path
+
+
+def finish_log(log_path: Path, row_count: int, states: set[str]) -> None:
+    """
+    Records what was written to a log once the Logger stopped.
+
+    :param log_path: The log.
+    :param row_count: The number of rows written to the log.
+    :param states: The states of the rows written to the log.
+    """
+    # The record of when the log was created is almost always among the last ones
+    last_records = _read_last_records(log_path.parent)
+    record = next(
+        (record for record in reversed(last_records) if record.entry.name == log_path.name), None
+    )
+    if record is not None and not record.removed:
+        entry, next_log_number = record.entry, last_records[-1].next_log_number
+    else:
+        index = read_log_index(log_path.parent)
+        entry, next_log_number = index.find(log_path.name), index.next_log_number
+    if entry is None:
+        # The index was rebuilt while the log was being written, and it was empty back then
+        entry = LogIndexEntry(
+            name=log_path.name,
+            number=int(LOG_NAME_PATTERN.fullmatch(log_path.name).group(1)),
+            start_time=time.time(),
+        )
+    entry.duration_seconds = time.time() - entry.start_time
+    entry.row_count = row_count
+    entry.states = sorted(states)
+    entry.size_bytes = _log_size_bytes(log_path)
+    _append_record(log_path.parent, LogIndexRecord(next_log_number, entry))
+
+
+def remove_log(log_path: Path) -> None:
+    """
+    Removes a deleted log from the index. If it was the newest log, its number is used again.
+
+    :param log_path: The log.
+    """
+    index = read_log_index(log_path.parent)
+    entry = index.find(log_path.name)
+    if entry is None:
+        return
+    next_log_number = index.next_log_number
+    if entry.number == next_log_number - 1:
+        next_log_number = entry.number
+    _append_record(log_path.parent, LogIndexRecord(next_log_number, entry, removed=True))
+
+
+def main() -> None:
+    """Lists the logs in the log directory, from its index."""
+    parser = argparse.ArgumentParser(description="List the payload logs from the log index.")
+    parser.add_argument(
+        "log_dir", type=Path, nargs="?", default=LOGS_PATH, help="The log directory."
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Rebuild and compact the index from the logs."
+    )
+    args = parser.parse_args()
+
+    index = rebuild_log_index(args.log_dir) if args.rebuild else read_log_index(args.log_dir)
+    for entry in index.logs:
+        start = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.start_time))
+        duration = "?" if entry.duration_seconds is None else f"{entry.duration_seconds:.0f} s"
+        rows = "?" if entry.row_count is None else str(entry.row_count)
+        size = "?" if entry.size_bytes is None else f"{entry.size_bytes / 1e6:.1f} MB"
+        print(  # noqa: T201
+            f"{entry.name:<16} {start}  {duration:>8}  {rows:>9} rows  {size:>9}  "
+            f"{', '.join(entry.states)}"
+        )
+
+
+if __name__ == "__main__":
+    with contextlib.suppress(BrokenPipeError):
+        main()
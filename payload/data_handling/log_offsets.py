@@ -0,0 +1,162 @@
+"""
+Module for the offset index the Logger writes next to a log.
+
+The offset index is LOG_OFFSET_INDEX_MAGIC followed by fixed size entries (see
+LOG_OFFSET_INDEX_ENTRY_FORMAT), each pointing at a row of the log: the first row, the first row of
+every state, and the first row of every LOG_OFFSET_INDEX_INTERVAL_SECONDS of FIRM time. A reader
+(see log_seek) can then jump to a state or a time in the log without parsing the rows before it.
+
+Rows are written so that every entry is at the start of a write: in a CSV log it points at the start
+of a line, and in a binary log at the start of a frame. Only plain log files get an offset index,
+since the offsets of a compressed or segmented log can't be seeked to.
+"""
+
+import struct
+from typing import TYPE_CHECKING
+
+from payload.constants import (
+    LOG_OFFSET_INDEX_ENTRY_FORMAT,
+    LOG_OFFSET_INDEX_INTERVAL_SECONDS,
+    LOG_OFFSET_INDEX_MAGIC,
+    LOG_OFFSET_INDEX_SUFFIX,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+    from typing import BinaryIO, Self
+
+    from payload.data_handling.log_schema import LogRow, LogSchema
+
+LOG_OFFSET_INDEX_ENTRY = struct.Struct(LOG_OFFSET_INDEX_ENTRY_FORMAT)
+
+TIMESTAMP_COLUMN_NAME = "timestamp_seconds"
+"""The column with the FIRM time of the rows, which the time entries of the index are based on."""
+
+
+def offset_index_path(log_path: Path) -> Path:
+    """
+    Returns the path of the offset index of a log.
+
+    :param log_path: The log.
+    """
+    return log_path.with_name(log_path.name + LOG_OFFSET_INDEX_SUFFIX)
+
+
+class LogOffsetIndexWriter:
+    """
+    Writes the rows of the Logger to the log, and an entry to the offset index for every row where
+    the state changes or a new interval of FIRM time starts.
+
+    The index isn't synced with the log: it is only used to find rows faster, so a reader that finds
+    fewer entries after a crash still finds every row, it only parses more of them.
+    """
+
+    __slots__ = (
+        "_file",
+        "_interval_seconds",
+        "_last_state",
+        "_next_timestamp",
+        "_row_number",
+        "_state_index",
+        "_timestamp_index",
+    )
+
+    def __init__(
+        self,
+        log_path: Path,
+        log_schema: LogSchema,
+        interval_seconds: float = LOG_OFFSET_INDEX_INTERVAL_SECONDS,
+    ) -> None:
+        """
+        Creates the offset index of a log.
+
+        :param log_path: The log, which must not have any rows yet.
+        :param log_schema: The schema of the rows of the log.
+        :param interval_seconds: How often, in FIRM time, to record where the log is.
+        """
+        self._file = offset_index_path(log_path).open("wb")
+        self._file.write(LOG_OFFSET_INDEX_MAGIC)
+        self._interval_seconds = interval_seconds
+        self._state_index = log_schema.state_index
+        column_names = log_schema.column_names
+        self._timestamp_index = (
+            column_names.index(TIMESTAMP_COLUMN_NAME)
+            if TIMESTAMP_COLUMN_NAME in column_names
+            else None
+        )
+        self._last_state: str | None = None
+        self._next_timestamp = float("-inf")
+        self._row_number = 0
+
+    def __enter__(self) -> Self:
+        """Lets the writer be used in a with statement, like a file."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Closes the offset index."""
+        self._file.close()
+
+    def _entry_rows(self, rows: list[LogRow]) -> list[int]:
+        """
+        Finds the rows that get an entry in the index.
+
+        The rows that the backpressure shed and held back are written after newer rows, so the time
+        entries only follow the newest timestamp seen, and never go back in time.
+
+        :param rows: The rows about to be written.
+        :return: The positions of the rows in the list, in order.
+        """
+        entry_rows = []
+        state_index = self._state_index
+        timestamp_index = self._timestamp_index
+        for position, row in enumerate(rows):
+            is_entry = row[state_index] != self._last_state
+            self._last_state = row[state_index]
+            if timestamp_index is not None and row[timestamp_index] >= self._next_timestamp:
+                is_entry = True
+                self._next_timestamp = (
+                    row[timestamp_index] // self._interval_seconds + 1
+                ) * self._interval_seconds
+            if is_entry:
+                entry_rows.append(position)
+        return entry_rows
+
+    def write_rows(
+        self,
+        file_writer: BinaryIO,
+        rows: list[LogRow],
+        encode: Callable[[list[LogRow]], bytes],
+    ) -> None:
+        """
+        Writes rows to the log, and their entries to the index.
+
+        The rows are split at every entry and encoded separately, so every entry points at the
+        start of a write. Most batches don't have an entry, and are written in one go.
+
+        :param file_writer: The log file, positioned at the end of the rows.
+        :param rows: The rows to write.
+        :param encode: Encodes rows in the format of the log.
+        """
+        entry_rows = self._entry_rows(rows)
+        if not entry_rows:
+            file_writer.write(encode(rows))
+            self._row_number += len(rows)
+            return
+
+        if entry_rows[0]:
+            file_writer.write(encode(rows[: entry_rows[0]]))
+        for start, end in zip(entry_rows, [*entry_rows[1:], len(rows)], strict=True):
+            row = rows[start]
+            self._file.write(
+                LOG_OFFSET_INDEX_ENTRY.pack(
+                    file_writer.tell(),
+                    self._row_number + start,
+                    float("nan") if self._timestamp_index is None else row[self._timestamp_index],
+                    row[self._state_index].encode(),
+                )
+            )
+            file_writer.write(encode(rows[start:end]))
+        self._row_number += len(rows)
+        # Entries are rare (about one per interval), so they are handed to the OS right away
+        self._file.flush()
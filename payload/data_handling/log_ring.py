@@ -0,0 +1,282 @@
+"""
+Module for the shared memory ring that feeds the logger process.
+"""
+
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING
+
+from payload.constants import FSYNC_LATENCY_BUCKETS_MS, LOG_RING_CAPACITY, LOG_RING_POLL_SECONDS
+
+if TYPE_CHECKING:
+    from payload.data_handling.log_schema import LogRow, LogSchema
+    from payload.data_handling.logger import LogBatch
+
+COUNTER = struct.Struct("<Q")
+"""The head (rows written) and tail (rows read) counters, which only ever go up."""
+
+FSYNC_LATENCIES = struct.Struct(f"<{len(FSYNC_LATENCY_BUCKETS_MS) + 1}Qd")
+"""The fsync latency histogram of the logger process: the count of every bucket, then the max."""
+
+HEAD_OFFSET = 0
+TAIL_OFFSET = 64
+STOP_OFFSET = 128
+BUFFERED_ROWS_OFFSET = 192
+FSYNC_LATENCIES_OFFSET = 256
+RECORDS_OFFSET = 384
+"""
+Where everything is in the shared memory. The head and the tail are on their own cache lines, since
+one process writes the head and the other writes the tail.
+"""
+
+STRUCT_CODES = {"str": "32s", "float": "d", "int": "q", "bool": "?"}
+"""How a value of each column type is stored in a row of the ring."""
+
+PREFIX_CACHE_SIZE = 1024
+
+
+class SharedMemoryLogRing:
+    """
+    A single producer, single consumer ring of fixed size rows in shared memory, which takes the
+    rows from the main loop to the logger process without pickling anything. The layout of the rows
+    comes from the schema of the log: the values that are the same for a whole batch (the prefix),
+    followed by the values of the FIRM packet.
+
+    The main loop writes the rows and then moves the head forward, and the logger process reads
+    the rows up to the head and then moves the tail forward. Each counter only has one writer, so no
+    lock is needed. Python can't issue memory barriers, so this relies on the head being stored
+    after the rows it covers, and the tail after the rows were read.
+    """
+
+    __slots__ = (
+        "_buffer",
+        "_capacity",
+        "_firm_struct",
+        "_head",
+        "_is_owner",
+        "_prefix_cache",
+        "_prefix_struct",
+        "_row_struct",
+        "_shared_memory",
+        "_string_indices",
+        "_tail",
+        "dropped_rows",
+        "log_schema",
+    )
+
+    def __init__(self, log_schema: LogSchema, capacity: int = LOG_RING_CAPACITY) -> None:
+        """
+        Creates the shared memory of the ring.
+
+        :param log_schema: The schema of the rows.
+        :param capacity: The number of rows the ring can hold.
+        """
+        self._set_layout(log_schema)
+        self._shared_memory = shared_memory.SharedMemory(
+            create=True, size=RECORDS_OFFSET + capacity * self._row_struct.size
+        )
+        self._is_owner = True
+        self._attach(capacity)
+
+    def __getstate__(self) -> tuple[str, int, LogSchema]:
+        """The logger process attaches to the same shared memory by its name."""
+        return self._shared_memory.name, self._capacity, self.log_schema
+
+    def __setstate__(self, state: tuple[str, int, LogSchema]) -> None:
+        """
+        Attaches to the shared memory created by the main process.
+
+        :param state: The name of the shared memory, the capacity of the ring and the schema.
+        """
+        name, capacity, log_schema = state
+        self._set_layout(log_schema)
+        # The main process created the shared memory, so it is the one that removes it
+        self._shared_memory = shared_memory.SharedMemory(name=name, track=False)
+        self._is_owner = False
+        self._attach(capacity)
+
+    def _set_layout(self, log_schema: LogSchema) -> None:
+        """
+        Works out the layout of the rows from the types of the columns.
+
+        :param log_schema: The schema of the rows.
+        """
+        self.log_schema = log_schema
+        prefix_columns = log_schema.columns[: log_schema.batch_column_count]
+        firm_columns = log_schema.columns[log_schema.batch_column_count :]
+        self._prefix_struct = struct.Struct(
+            "<" + "".join(STRUCT_CODES[column.type_name] for column in prefix_columns)
+        )
+        self._firm_struct = struct.Struct(
+            "<" + "".join(STRUCT_CODES[column.type_name] for column in firm_columns)
+        )
+        self._row_struct = struct.Struct(self._prefix_struct.format + self._firm_struct.format[1:])
+        self._string_indices = [
+            index for index, column in enumerate(prefix_columns) if column.type_name == "str"
+        ]
+
+    def _attach(self, capacity: int) -> None:
+        self._buffer = self._shared_memory.buf
+        self._capacity = capacity
+        (self._head,) = COUNTER.unpack_from(self._buffer, HEAD_OFFSET)
+        (self._tail,) = COUNTER.unpack_from(self._buffer, TAIL_OFFSET)
+        self._prefix_cache: dict[LogRow, LogRow] = {}
+        self.dropped_rows = 0
+
+    # ------------------------ Used by the main process -------------------------------------------
+    @property
+    def queued_rows(self) -> int:
+        """
+        Returns the number of rows written to the ring that the logger process hasn't read yet.
+        """
+        (tail,) = COUNTER.unpack_from(self._buffer, TAIL_OFFSET)
+        return self._head - tail
+
+    def put(self, log_batch: LogBatch) -> None:
+        """
+        Writes a row for every FIRM packet of the batch to the ring, or drops them all if they don't
+        fit.
+
+        :param log_batch: The batch to log.
+        """
+        firm_data_packets = log_batch.firm_data_packets
+        head = self._head
+        (tail,) = COUNTER.unpack_from(self._buffer, TAIL_OFFSET)
+        if head + len(firm_data_packets) - tail > self._capacity:
+            self.dropped_rows += len(firm_data_packets)
+            return
+
+        prefix_values = list(self.log_schema.batch_values(log_batch))
+        for index in self._string_indices:
+            prefix_values[index] = prefix_values[index].encode()
+        prefix = self._prefix_struct.pack(*prefix_values)
+
+        buffer = self._buffer
+        prefix_size = self._prefix_struct.size
+        row_size = self._row_struct.size
+        firm_values = self.log_schema.firm_values
+        pack_firm_values = self._firm_struct.pack_into
+        for firm_data_packet in firm_data_packets:
+            offset = RECORDS_OFFSET + (head % self._capacity) * row_size
+            buffer[offset : offset + prefix_size] = prefix
+            pack_firm_values(buffer, offset + prefix_size, *firm_values(firm_data_packet))
+            head += 1
+
+        # Only now can the logger process see the new rows
+        COUNTER.pack_into(buffer, HEAD_OFFSET, head)
+        self._head = head
+
+    @property
+    def buffered_rows(self) -> int:
+        """
+        Returns the number of rows in the log buffer of the logger process.
+        """
+        (buffered_rows,) = COUNTER.unpack_from(self._buffer, BUFFERED_ROWS_OFFSET)
+        return buffered_rows
+
+    def get_fsync_latencies(self) -> tuple[list[int], float]:
+        """
+        Reads the fsync latency histogram that the logger process wrote when it stopped.
+
+        :return: The number of syncs in every bucket of FSYNC_LATENCY_BUCKETS_MS (plus one for the
+            slower syncs), and the longest sync in milliseconds.
+        """
+        *counts, max_latency_ms = FSYNC_LATENCIES.unpack_from(self._buffer, FSYNC_LATENCIES_OFFSET)
+        return counts, max_latency_ms
+
+    def request_stop(self) -> None:
+        """Tells the logger process to stop once it has read every row written so far."""
+        self._buffer[STOP_OFFSET] = 1
+
+    def close(self) -> None:
+        """Detaches from the shared memory, and removes it if this process created it."""
+        self._shared_memory.close()
+        if self._is_owner:
+            self._shared_memory.unlink()
+
+    # ------------------------ Used by the logger process -----------------------------------------
+    def get(self, timeout: float | None) -> tuple[list[LogRow], bool]:
+        """
+        Reads every row in the ring, waiting until there is one.
+
+        :param timeout: The longest time to wait for a row, in seconds, or None to wait forever.
+        :return: The rows, and whether the main process asked to stop after them.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Read the stop flag before the head, so no row written before the stop is missed
+            stop_requested = self._buffer[STOP_OFFSET] == 1
+            (head,) = COUNTER.unpack_from(self._buffer, HEAD_OFFSET)
+            if head != self._tail or stop_requested:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                return [], False
+            time.sleep(LOG_RING_POLL_SECONDS)
+
+        rows = self._read_rows(self._tail, head)
+        self._tail = head
+        COUNTER.pack_into(self._buffer, TAIL_OFFSET, head)
+        return rows, stop_requested
+
+    def set_buffered_rows(self, buffered_rows: int) -> None:
+        """
+        Tells the main process how many rows are in the log buffer.
+
+        :param buffered_rows: The number of rows in the log buffer.
+        """
+        COUNTER.pack_into(self._buffer, BUFFERED_ROWS_OFFSET, buffered_rows)
+
+    def put_fsync_latencies(self, counts: list[int], max_latency_ms: float) -> None:
+        """
+        Hands the fsync latency histogram to the main process, since it's lost when the logger
+        process exits.
+
+        :param counts: The number of syncs in every bucket.
+        :param max_latency_ms: The longest sync in milliseconds.
+        """
+        FSYNC_LATENCIES.pack_into(self._buffer, FSYNC_LATENCIES_OFFSET, *counts, max_latency_ms)
+
+    def _read_rows(self, tail: int, head: int) -> list[LogRow]:
+        """
+        Reads the rows between the tail and the head, which can wrap around the end of the ring.
+
+        :param tail: The number of the first row to read.
+        :param head: The number of the row after the last one to read.
+        :return: The rows, in the order of the columns of the schema.
+        """
+        row_count = head - tail
+        start = tail % self._capacity
+        rows_before_wrap = min(row_count, self._capacity - start)
+        row_size = self._row_struct.size
+        records: list[LogRow] = []
+        for slot, count in ((start, rows_before_wrap), (0, row_count - rows_before_wrap)):
+            if count:
+                offset = RECORDS_OFFSET + slot * row_size
+                with self._buffer[offset : offset + count * row_size] as view:
+                    records.extend(self._row_struct.iter_unpack(view))
+
+        decode_prefix = self._decode_prefix
+        prefix_length = self.log_schema.batch_column_count
+        return [
+            decode_prefix(record[:prefix_length]) + record[prefix_length:] for record in records
+        ]
+
+    def _decode_prefix(self, raw_prefix: LogRow) -> LogRow:
+        """
+        Turns the null padded strings of the prefix of a row back into strs. All the rows of a batch
+        have the same prefix, so the decoded prefixes are cached.
+
+        :param raw_prefix: The prefix, as unpacked from the ring.
+        :return: The prefix with the strings decoded.
+        """
+        prefix = self._prefix_cache.get(raw_prefix)
+        if prefix is None:
+            # The epoch time changes every second, so don't let the cache grow forever
+            if len(self._prefix_cache) > PREFIX_CACHE_SIZE:
+                self._prefix_cache.clear()
+            values = list(raw_prefix)
+            for index in self._string_indices:
+                values[index] = values[index].rstrip(b"\0").decode()
+            prefix = self._prefix_cache[raw_prefix] = tuple(values)
+        return prefix
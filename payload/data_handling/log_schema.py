@@ -0,0 +1,209 @@
+"""
+Module for the columns the Logger writes, and for turning the packets of the main loop into rows.
+
+The columns aren't written out by hand: they are generated from the fields of the ContextDataPacket,
+ZombieDataPacket, GraveDataPacket and FIRMDataPacket, so a new field in one of those packets can be
+logged without changing the Logger. A log profile picks which of the columns are written.
+"""
+
+import operator
+from typing import TYPE_CHECKING, Any, Literal
+
+import msgspec
+from firm_client import FIRMDataPacket
+
+from payload.constants import CONTEXT_LOG_COLUMN_NAMES, LOG_PROFILE_COLUMNS
+from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.grave_data_packet import GraveDataPacket
+from payload.data_handling.packets.zombie_data_packet import ZombieDataPacket
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from payload.data_handling.logger import LogBatch
+
+LogProfile = Literal["minimal", "standard", "full"]
+"""
+Which columns the Logger writes:
+- "minimal": the state, the time, and the FIRM fields needed to see the flight.
+- "standard": the columns the Logger has always written.
+- "full": every field of the Context, Zombie, Grave and FIRM data packets.
+"""
+
+LogSource = Literal["context", "zombie", "grave", "firm"]
+"""The packet a column comes from. The columns of a schema are in this order of sources."""
+
+LogRow = tuple[Any, ...]
+"""A row of the log, with one value per column of the schema."""
+
+
+class LogColumn(msgspec.Struct, frozen=True):
+    """A column that can be logged, and where its values come from."""
+
+    name: str
+    """The name of the column in the log."""
+
+    source: LogSource
+    """The packet the values come from."""
+
+    attribute: str
+    """The attribute of the packet that holds the value, which can be dotted."""
+
+    type_name: str
+    """The name of the type of the values: "str", "float", "int" or "bool"."""
+
+
+def _struct_columns(struct_type: type[msgspec.Struct], source: LogSource) -> list[LogColumn]:
+    """
+    Makes a column for every field of one of our data packets.
+
+    :param struct_type: The data packet.
+    :param source: The source of the columns.
+    :return: The columns, in the order of the fields.
+    """
+    return [
+        LogColumn(field.name, source, field.name, field.type.__name__)
+        for field in msgspec.structs.fields(struct_type)
+    ]
+
+
+def _context_columns() -> list[LogColumn]:
+    """
+    Makes a column for every field of the ContextDataPacket. The renamed fields come first, so every
+    profile starts with the epoch time and the state.
+
+    :return: The columns.
+    """
+    columns = {
+        field.name: LogColumn(
+            CONTEXT_LOG_COLUMN_NAMES.get(field.name, field.name),
+            "context",
+            # The state is a class, which is logged by its name
+            "state.__name__" if field.name == "state" else field.name,
+            "str" if field.name == "state" else field.type.__name__,
+        )
+        for field in msgspec.structs.fields(ContextDataPacket)
+    }
+    renamed_columns = [columns.pop(field_name) for field_name in CONTEXT_LOG_COLUMN_NAMES]
+    return renamed_columns + list(columns.values())
+
+
+LOG_COLUMNS: dict[str, LogColumn] = {
+    column.name: column
+    for column in (
+        *_context_columns(),
+        *_struct_columns(ZombieDataPacket, "zombie"),
+        *_struct_columns(GraveDataPacket, "grave"),
+        # FIRMDataPacket isn't a msgspec Struct, but it also lists its fields in __struct_fields__.
+        # All of them are floats.
+        *(LogColumn(name, "firm", name, "float") for name in FIRMDataPacket.__struct_fields__),
+    )
+}
+"""Every column that can be logged, by name, in the order of the "full" profile."""
+
+SOURCE_ORDER: tuple[LogSource, ...] = ("context", "zombie", "grave", "firm")
+
+
+def _tuple_getter(attributes: list[str]) -> Callable[[Any], LogRow]:
+    """
+    Makes a function that reads the attributes from an object, as a tuple. operator.attrgetter does
+    the reading in C, but returns a lone value instead of a tuple for a single attribute.
+
+    :param attributes: The attributes to read.
+    :return: The function.
+    """
+    if not attributes:
+        return lambda _: ()
+    getter = operator.attrgetter(*attributes)
+    if len(attributes) == 1:
+        return lambda obj: (getter(obj),)
+    return getter
+
+
+class LogSchema:
+    """
+    The columns of a log, and the row builder for them.
+
+    The row builder is made once for the schema: the values of the Context, Zombie and Grave
+    packets are read once per batch, and the values of each FIRM packet are read by a single
+    operator.attrgetter call, so logging every field costs about the same as logging a few.
+    """
+
+    __slots__ = (
+        "_context_values",
+        "_grave_values",
+        "_zombie_values",
+        "batch_column_count",
+        "columns",
+        "firm_values",
+        "profile",
+        "state_index",
+    )
+
+    def __init__(self, profile: LogProfile = "standard") -> None:
+        """
+        Makes the schema of a log profile.
+
+        :param profile: Which columns to log, see LogProfile.
+        """
+        column_names = tuple(LOG_COLUMNS) if profile == "full" else LOG_PROFILE_COLUMNS[profile]
+        self.profile = profile
+        self.columns = [LOG_COLUMNS[name] for name in column_names]
+
+        source_indices = [SOURCE_ORDER.index(column.source) for column in self.columns]
+        if source_indices != sorted(source_indices):
+            raise ValueError(f"The columns of the {profile} profile must be grouped by source.")
+
+        attributes: dict[LogSource, list[str]] = {source: [] for source in SOURCE_ORDER}
+        for column in self.columns:
+            attributes[column.source].append(column.attribute)
+        self._context_values = _tuple_getter(attributes["context"])
+        self._zombie_values = _tuple_getter(attributes["zombie"])
+        self._grave_values = _tuple_getter(attributes["grave"])
+        # Reads the values of the FIRM columns from a FIRM packet
+        self.firm_values = _tuple_getter(attributes["firm"])
+
+        self.batch_column_count = len(self.columns) - len(attributes["firm"])
+        self.state_index = column_names.index(CONTEXT_LOG_COLUMN_NAMES["state"])
+
+    def __reduce__(self) -> tuple[type[LogSchema], tuple[LogProfile]]:
+        """The row builder can't be pickled, so the logger process makes its own."""
+        return LogSchema, (self.profile,)
+
+    @property
+    def column_names(self) -> list[str]:
+        """Returns the names of the columns, in order."""
+        return [column.name for column in self.columns]
+
+    @property
+    def type_names(self) -> list[str]:
+        """Returns the names of the types of the columns, in order."""
+        return [column.type_name for column in self.columns]
+
+    def batch_values(self, log_batch: LogBatch) -> LogRow:
+        """
+        Reads the values that are the same for every row of a batch: the ones from the Context,
+        Zombie and Grave packets.
+
+        :param log_batch: The batch.
+        :return: The values of the first `batch_column_count` columns.
+        """
+        return (
+            self._context_values(log_batch.context_data_packet)
+            + self._zombie_values(log_batch.zombie_data_packet)
+            + self._grave_values(log_batch.grave_data_packet)
+        )
+
+    def build_rows(self, log_batches: list[LogBatch]) -> list[LogRow]:
+        """
+        Builds a row for every FIRM packet of the batches.
+
+        :param log_batches: The batches from the log queue.
+        :return: The rows, in order.
+        """
+        rows: list[LogRow] = []
+        firm_values = self.firm_values
+        for log_batch in log_batches:
+            batch_values = self.batch_values(log_batch)
+            rows.extend(map(batch_values.__add__, map(firm_values, log_batch.firm_data_packets)))
+        return rows
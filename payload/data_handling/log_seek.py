@@ -0,0 +1,203 @@
+"""
+Module for reading part of a log through its offset index.
+
+The log is mapped into memory, and the offset index (see log_offsets) says where every state and
+every interval of FIRM time starts in it, so only the rows that were asked for are parsed. This
+works for CSV and binary logs that aren't compressed or segmented.
+"""
+
+import itertools
+import mmap
+import struct
+from typing import TYPE_CHECKING, Any
+
+import msgspec
+import numpy as np
+import polars as pl
+
+from payload.constants import (
+    BINARY_LOG_FRAME_HEADER_FORMAT,
+    BINARY_LOG_MAGIC,
+    LOG_FILE_SUFFIXES,
+    LOG_OFFSET_INDEX_MAGIC,
+)
+from payload.data_handling.binary_log import FRAME_HEADER_SIZE, BinaryLogSchema, _iter_frames
+from payload.data_handling.durability import strip_reserved_space
+from payload.data_handling.log_offsets import TIMESTAMP_COLUMN_NAME, offset_index_path
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import Self
+
+OFFSET_INDEX_DTYPE = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("row_number", "<u8"),
+        ("timestamp_seconds", "<f8"),
+        ("state", "S32"),
+    ]
+)
+"""The NumPy dtype of the entries of an offset index, matching LOG_OFFSET_INDEX_ENTRY_FORMAT."""
+
+
+class IndexedLog:
+    """
+    A log mapped into memory, with the entries of its offset index.
+
+    Example::
+
+        with IndexedLog(Path("logs/log_3.csv")) as log:
+            launch = log.read_state("Launched")
+            descent = log.read_time_range(120.0, 180.0)
+    """
+
+    __slots__ = ("_file", "_map", "_schema", "data_offset", "entries", "log_format", "log_path")
+
+    def __init__(self, log_path: Path) -> None:
+        """
+        Opens a log and reads its offset index.
+
+        :param log_path: The log, a plain .csv or .bin file.
+        """
+        index_data = offset_index_path(log_path).read_bytes()
+        if not index_data.startswith(LOG_OFFSET_INDEX_MAGIC):
+            raise ValueError(f"{log_path} doesn't have an offset index.")
+        # An entry torn by a crash at the end of the index is skipped
+        entry_count = (len(index_data) - len(LOG_OFFSET_INDEX_MAGIC)) // OFFSET_INDEX_DTYPE.itemsize
+        self.entries: np.ndarray = np.frombuffer(
+            index_data, OFFSET_INDEX_DTYPE, count=entry_count, offset=len(LOG_OFFSET_INDEX_MAGIC)
+        )
+
+        self.log_path = log_path
+        self.log_format = "binary" if log_path.suffix == LOG_FILE_SUFFIXES["binary"] else "csv"
+        self._file = log_path.open("rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Where the rows start, after the header of the log
+        self._schema: BinaryLogSchema | None = None
+        if self.log_format == "binary":
+            if self._map[: len(BINARY_LOG_MAGIC)] != BINARY_LOG_MAGIC:
+                raise ValueError(f"{log_path} is not a binary payload log.")
+            (schema_length,) = struct.unpack_from(
+                BINARY_LOG_FRAME_HEADER_FORMAT, self._map, len(BINARY_LOG_MAGIC)
+            )
+            self.data_offset = len(BINARY_LOG_MAGIC) + FRAME_HEADER_SIZE + schema_length
+            self._schema = msgspec.msgpack.decode(
+                self._map[len(BINARY_LOG_MAGIC) + FRAME_HEADER_SIZE : self.data_offset],
+                type=BinaryLogSchema,
+            )
+        else:
+            self.data_offset = self._map.find(b"\n") + 1
+
+    def __enter__(self) -> Self:
+        """Lets the log be used in a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Closes the log."""
+        self.close()
+
+    def close(self) -> None:
+        """Unmaps and closes the log."""
+        self._map.close()
+        self._file.close()
+
+    @property
+    def states(self) -> list[str]:
+        """Returns the states of the log, in the order the log first enters them."""
+        states = self.entries["state"]
+        first_indices = np.sort(np.unique(states, return_index=True)[1])
+        return [state.decode() for state in states[first_indices]]
+
+    def _entry_offset(self, entry_index: int) -> int:
+        """
+        Returns the byte offset of an entry, with the indices past the last entry meaning the end
+        of the log.
+
+        :param entry_index: The index of the entry.
+        """
+        if entry_index >= len(self.entries):
+            return len(self._map)
+        return int(self.entries["offset"][entry_index])
+
+    def state_offsets(self, state: str) -> tuple[int, int]:
+        """
+        Finds the rows of the first time the log was in a state.
+
+        :param state: The name of the state, e.g. "Launched".
+        :return: The byte offsets of the first row of the state, and of the row after its last row.
+        """
+        states = self.entries["state"]
+        (matches,) = np.nonzero(states == state.encode())
+        if not matches.size:
+            raise KeyError(f"{self.log_path} has no rows in {state}.")
+        first = int(matches[0])
+        (others,) = np.nonzero(states[first:] != state.encode())
+        return self._entry_offset(first), self._entry_offset(
+            first + int(others[0]) if others.size else len(self.entries)
+        )
+
+    def time_offsets(self, start_seconds: float, end_seconds: float) -> tuple[int, int]:
+        """
+        Finds the rows between two FIRM timestamps.
+
+        The range can hold some rows outside of the timestamps, which read_time_range filters out.
+        The rows that the backpressure shed and held back are written after newer rows, so at the
+        end of the range, a few of them can be missed.
+
+        :param start_seconds: The first FIRM timestamp.
+        :param end_seconds: The last FIRM timestamp.
+        :return: The byte offsets of the start and the end of the range.
+        """
+        # The newest timestamp written before every entry, which never goes back in time
+        newest_timestamps = np.maximum.accumulate(self.entries["timestamp_seconds"])
+        start = int(np.searchsorted(newest_timestamps, start_seconds, side="left")) - 1
+        end = int(np.searchsorted(newest_timestamps, end_seconds, side="right"))
+        return (
+            self.data_offset if start < 0 else self._entry_offset(start),
+            self._entry_offset(end),
+        )
+
+    def read_rows(self, start_offset: int, end_offset: int) -> pl.DataFrame:
+        """
+        Parses the rows between two byte offsets of the log.
+
+        :param start_offset: The offset of the first row.
+        :param end_offset: The offset after the last row.
+        :return: A DataFrame with the rows.
+        """
+        if self._schema is not None:
+            decoder = msgspec.msgpack.Decoder(list[list[Any]])
+            rows = list(
+                itertools.chain.from_iterable(
+                    decoder.decode(frame)
+                    for frame in _iter_frames(self._map, start_offset, end_offset)
+                )
+            )
+            return pl.DataFrame(rows, schema=self._schema.polars_schema, orient="row", strict=False)
+
+        data = self._map[: self.data_offset] + strip_reserved_space(
+            self._map[start_offset:end_offset]
+        )
+        return pl.read_csv(data)
+
+    def read_state(self, state: str) -> pl.DataFrame:
+        """
+        Reads the rows of the first time the log was in a state.
+
+        :param state: The name of the state, e.g. "Launched".
+        :return: A DataFrame with the rows.
+        """
+        rows = self.read_rows(*self.state_offsets(state))
+        return rows.filter(pl.col("state_letter") == state)
+
+    def read_time_range(self, start_seconds: float, end_seconds: float) -> pl.DataFrame:
+        """
+        Reads the rows between two FIRM timestamps.
+
+        :param start_seconds: The first FIRM timestamp.
+        :param end_seconds: The last FIRM timestamp.
+        :return: A DataFrame with the rows.
+        """
+        rows = self.read_rows(*self.time_offsets(start_seconds, end_seconds))
+        return rows.filter(pl.col(TIMESTAMP_COLUMN_NAME).is_between(start_seconds, end_seconds))
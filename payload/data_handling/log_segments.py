@@ -0,0 +1,304 @@
+"""
+Module for writing logs as a directory of segments, and for salvaging them after a crash.
+
+A segmented log is a directory (e.g. logs/log_3/) of segment files named segment_00000.seg,
+segment_00001.seg, and so on. Every segment starts with LOG_SEGMENT_MAGIC, a
+LOG_SEGMENT_HEADER_FORMAT header and the log header (the CSV column names, or the binary magic and
+schema frame). After that come the blocks: a LOG_SEGMENT_BLOCK_HEADER_FORMAT header with the length
+and CRC32 of the block, and one batch of rows encoded the same way as in a log that isn't
+segmented.
+
+Since every block has its own CRC, a crash can only cost the block that was being written, and
+salvaging a log only has to copy the blocks that check out, without decoding any rows.
+"""
+
+import argparse
+import mmap
+import struct
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Self
+
+import msgspec
+
+from payload.constants import (
+    LOG_FILE_SUFFIXES,
+    LOG_SEGMENT_BLOCK_HEADER_FORMAT,
+    LOG_SEGMENT_FORMAT_CODES,
+    LOG_SEGMENT_HEADER_FORMAT,
+    LOG_SEGMENT_MAGIC,
+    LOG_SEGMENT_SIZE_BYTES,
+)
+
+if TYPE_CHECKING:
+    from typing import BinaryIO
+
+    from payload.data_handling.durability import DurabilityPolicy
+
+SEGMENT_HEADER_SIZE = struct.calcsize(LOG_SEGMENT_HEADER_FORMAT)
+BLOCK_HEADER_SIZE = struct.calcsize(LOG_SEGMENT_BLOCK_HEADER_FORMAT)
+SEGMENT_GLOB = "segment_*.seg"
+
+
+class LogSegmentWriter:
+    """
+    Writes blocks to the segments of a segmented log, and starts a new segment once the current
+    one would grow past the segment size.
+
+    Only `write` knows about blocks and segments. The other methods act on the current segment
+    file, so the Logger thread and the DurabilityPolicy can use this like the file of a log that
+    isn't segmented.
+    """
+
+    __slots__ = (
+        "_durability_policy",
+        "_file",
+        "_format_code",
+        "_log_header",
+        "_segment_index",
+        "_segment_size_bytes",
+        "log_dir",
+    )
+
+    def __init__(
+        self,
+        log_dir: Path,
+        log_header: bytes,
+        log_format: str,
+        durability_policy: DurabilityPolicy,
+        segment_size_bytes: int = LOG_SEGMENT_SIZE_BYTES,
+    ) -> None:
+        """
+        Creates the first segment of the log.
+
+        :param log_dir: The directory of the segmented log. It must already exist.
+        :param log_header: What a log file of this format starts with, which is repeated at the
+            start of every segment so each of them can be read on its own.
+        :param log_format: The format of the rows in the blocks, a key of LOG_SEGMENT_FORMAT_CODES.
+        :param durability_policy: The policy that syncs the segments. It is closed on the old
+            segment and opened on the new one every time a new segment is started.
+        :param segment_size_bytes: The size at which a new segment is started.
+        """
+        self.log_dir = log_dir
+        self._log_header = log_header
+        self._format_code = LOG_SEGMENT_FORMAT_CODES[log_format]
+        self._durability_policy = durability_policy
+        self._segment_size_bytes = segment_size_bytes
+        self._segment_index = 0
+        self._file = self._open_segment()
+
+    def __enter__(self) -> Self:
+        """Lets the writer be used in a with statement, like a file."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Closes the current segment."""
+        self.close()
+
+    def _open_segment(self) -> BinaryIO:
+        """
+        Creates the segment file for the current segment index and writes its header.
+
+        :return: The segment file, positioned after the header.
+        """
+        segment_path = self.log_dir / f"segment_{self._segment_index:05d}.seg"
+        file = segment_path.open(mode="wb")
+        file.write(
+            LOG_SEGMENT_MAGIC
+            + struct.pack(
+                LOG_SEGMENT_HEADER_FORMAT,
+                self._segment_index,
+                self._format_code,
+                len(self._log_header),
+                zlib.crc32(self._log_header),
+            )
+            + self._log_header
+        )
+        return file
+
+    def write(self, payload: bytes) -> int:
+        """
+        Writes a block, starting a new segment first if the block doesn't fit in this one.
+
+        :param payload: The encoded batch of rows to write as one block.
+        :return: The number of bytes written.
+        """
+        position = self._file.tell()
+        block_size = BLOCK_HEADER_SIZE + len(payload)
+        has_blocks = position > len(LOG_SEGMENT_MAGIC) + SEGMENT_HEADER_SIZE + len(self._log_header)
+        if has_blocks and position + block_size > self._segment_size_bytes:
+            self._durability_policy.close(self._file)
+            self._file.close()
+            self._segment_index += 1
+            self._file = self._open_segment()
+            self._durability_policy.open(self._file)
+
+        block_header = struct.pack(
+            LOG_SEGMENT_BLOCK_HEADER_FORMAT, len(payload), zlib.crc32(payload)
+        )
+        return self._file.write(block_header + payload)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def truncate(self) -> int:
+        return self._file.truncate()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class SalvageReport(msgspec.Struct):
+    """What was kept and what was dropped when salvaging a segmented log."""
+
+    segments: int = 0
+    damaged_segments: int = 0
+    blocks: int = 0
+    dropped_bytes: int = 0
+
+
+def _read_segment_header(data: mmap.mmap) -> tuple[int, bytes, int] | None:
+    """
+    Reads and checks the header of a segment.
+
+    :param data: The contents of the segment.
+    :return: The format code, the log header and the offset of the first block, or None if the
+        segment header is damaged.
+    """
+    header_end = len(LOG_SEGMENT_MAGIC) + SEGMENT_HEADER_SIZE
+    if len(data) < header_end or data[: len(LOG_SEGMENT_MAGIC)] != LOG_SEGMENT_MAGIC:
+        return None
+    _, format_code, log_header_length, log_header_crc = struct.unpack_from(
+        LOG_SEGMENT_HEADER_FORMAT, data, len(LOG_SEGMENT_MAGIC)
+    )
+    log_header = data[header_end : header_end + log_header_length]
+    if len(log_header) != log_header_length or zlib.crc32(log_header) != log_header_crc:
+        return None
+    return format_code, log_header, header_end + log_header_length
+
+
+def _copy_valid_blocks(data: mmap.mmap, offset: int, output: BinaryIO) -> tuple[int, int]:
+    """
+    Copies the payload of every block of a segment to the output, up to the first damaged block.
+
+    A block is damaged if its length runs past the end of the segment or its CRC doesn't match.
+    A length of 0 is where the writing stopped in a preallocated segment.
+
+    :param data: The contents of the segment.
+    :param offset: The offset of the first block.
+    :param output: The file of the salvaged log.
+    :return: The number of blocks copied, and the offset where the copying stopped.
+    """
+    blocks = 0
+    with memoryview(data) as view:
+        while offset + BLOCK_HEADER_SIZE <= len(view):
+            length, crc = struct.unpack_from(LOG_SEGMENT_BLOCK_HEADER_FORMAT, view, offset)
+            start = offset + BLOCK_HEADER_SIZE
+            if length == 0 or start + length > len(view):
+                break
+            with view[start : start + length] as payload:
+                if zlib.crc32(payload) != crc:
+                    break
+                output.write(payload)
+            blocks += 1
+            offset = start + length
+    return blocks, offset
+
+
+def salvage_segmented_log(log_dir: Path, output_path: Path | None = None) -> SalvageReport:
+    """
+    Rebuilds a regular log (the same as the Logger writes without segments) from the segments of a
+    segmented log, skipping only the damaged parts.
+
+    Every segment is read up to its first damaged block, and a segment whose header is damaged is
+    skipped, so a crash in one segment doesn't lose the segments after it. The blocks are copied
+    without being decoded, which makes this about as fast as the disk.
+
+    :param log_dir: The directory of the segmented log.
+    :param output_path: Where to write the salvaged log. Defaults to a file in the log directory
+        with the same name as the directory, and the suffix of the log format.
+    :return: A report of what was kept and dropped.
+    """
+    report = SalvageReport()
+    output: BinaryIO | None = None
+    log_header = b""
+    try:
+        for segment_path in sorted(log_dir.glob(SEGMENT_GLOB)):
+            report.segments += 1
+            segment_size = segment_path.stat().st_size
+            if segment_size == 0:
+                report.damaged_segments += 1
+                continue
+            with (
+                segment_path.open("rb") as file,
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+            ):
+                segment_header = _read_segment_header(data)
+                if segment_header is None:
+                    report.damaged_segments += 1
+                    report.dropped_bytes += segment_size
+                    continue
+
+                format_code, segment_log_header, offset = segment_header
+                if output is None:
+                    log_format = next(
+                        name
+                        for name, code in LOG_SEGMENT_FORMAT_CODES.items()
+                        if code == format_code
+                    )
+                    if output_path is None:
+                        output_path = log_dir / f"{log_dir.name}{LOG_FILE_SUFFIXES[log_format]}"
+                    output = output_path.open("wb")
+                    log_header = segment_log_header
+                    output.write(log_header)
+                elif segment_log_header != log_header:
+                    raise ValueError(
+                        f"{segment_path} has different columns than the segments before it."
+                    )
+
+                blocks, end = _copy_valid_blocks(data, offset, output)
+                report.blocks += blocks
+                # Anything left after the last good block is dropped, except preallocated zeros
+                if data[end:].strip(b"\0"):
+                    report.damaged_segments += 1
+                    report.dropped_bytes += segment_size - end
+    finally:
+        if output is not None:
+            output.close()
+    return report
+
+
+def main() -> None:
+    """Salvages the segmented logs given on the command line."""
+    parser = argparse.ArgumentParser(
+        description="Rebuild clean logs from segmented payload logs, dropping only damaged blocks."
+    )
+    parser.add_argument(
+        "log_dirs", type=Path, nargs="+", metavar="LOG_DIR", help="The segmented log directories."
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="Where to write the salvaged log. Only allowed with a single log directory.",
+    )
+    args = parser.parse_args()
+    if args.output is not None and len(args.log_dirs) > 1:
+        parser.error("--output can only be used with a single log directory.")
+
+    for log_dir in args.log_dirs:
+        report = salvage_segmented_log(log_dir, args.output)
+        print(  # noqa: T201
+            f"{log_dir}: {report.blocks} blocks from {report.segments} segments, "
+            f"{report.damaged_segments} damaged segments, {report.dropped_bytes} bytes dropped"
+        )
+
+
+if __name__ == "__main__":
+    main()
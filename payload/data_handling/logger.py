@@ -1,27 +1,49 @@
 """
-Module for logging data to a CSV file in real time.
+Module for logging data to a CSV (or binary) file in real time.
 """
 
+import contextlib
 import csv
-import os
-import queue
+import io
+import itertools
+import lzma
+import multiprocessing
+import operator
+import struct
+import sys
 import threading
+import time
 import typing
+import zlib
 from collections import deque
 from typing import Any, Literal
 
 import msgspec
 
 from payload.constants import (
+    BINARY_LOG_FRAME_HEADER_FORMAT,
+    BINARY_LOG_MAGIC,
+    IDLE_LOG_CAPACITY,
+    IDLE_LOG_STATES,
     LOG_BUFFER_SIZE,
-    NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING,
-    STOP_SIGNAL,
+    LOG_BUFFER_SNAPSHOT_INTERVAL,
+    LOG_COMPRESSION_LEVELS,
+    LOG_COMPRESSION_SUFFIXES,
+    LOG_FILE_SUFFIXES,
 )
-from payload.data_handling.packets.logger_data_packet import LoggerDataPacket
-from payload.utils import get_all_packets_from_queue
+from payload.data_handling.backpressure import LogBackpressure, LogQueueMetrics
+from payload.data_handling.batch_queue import BatchQueue
+from payload.data_handling.durability import DurabilityPolicy
+from payload.data_handling.log_index import create_log, finish_log
+from payload.data_handling.log_offsets import LogOffsetIndexWriter
+from payload.data_handling.log_ring import SharedMemoryLogRing
+from payload.data_handling.log_schema import LogProfile, LogRow, LogSchema
+from payload.data_handling.log_segments import LogSegmentWriter
+from payload.utils import convert_unknown_type_to_float
 
 if typing.TYPE_CHECKING:
     from pathlib import Path
+    from typing import BinaryIO
 
     from firm_client import FIRMDataPacket
 
@@ -29,33 +51,208 @@ if typing.TYPE_CHECKING:
     from payload.data_handling.packets.grave_data_packet import GraveDataPacket
     from payload.data_handling.packets.zombie_data_packet import ZombieDataPacket
 
-DecodedLoggerDataPacket = list[int | float | str]
+CSV_SPECIAL_CHARACTERS = frozenset(',"\r\n')
+"""The characters that make csv.writer (with QUOTE_MINIMAL) put quotes around a field."""
+
+LogFormat = Literal["csv", "binary"]
+"""
+The formats the Logger can write. "binary" writes length-prefixed MessagePack frames, which is a lot
+cheaper to encode and smaller on the SD card. See payload.data_handling.binary_log to read it back.
+"""
+
+LogCompression = Literal["gzip", "xz"]
+"""The codecs the Logger can compress the log with."""
+
+LoggerBackend = Literal["thread", "process"]
+"""
+Where the Logger encodes and writes the rows. A thread shares the GIL with the main loop, so the
+"process" backend moves that work to another process, fed through a SharedMemoryLogRing.
+"""
+
+LOG_PROCESS_CONTEXT = multiprocessing.get_context(
+    "forkserver" if sys.platform == "linux" else "spawn"
+)
 """
-The type of LoggerDataPacket after an instance of it converted to primitive type by
-msgspec.to_builtins.
+How the logger process is started. Forking a process that already runs threads (FIRM, display) is
+unsafe, so the process is started fresh and gets the Logger by pickling it.
 """
 
 
+def _new_compressor(compression: LogCompression) -> zlib._Compress | lzma.LZMACompressor:
+    """
+    Creates a compressor that writes one gzip member or one xz stream.
+
+    :param compression: The codec to compress with.
+    :return: The compressor.
+    """
+    if compression == "gzip":
+        # wbits=31 writes the gzip header and trailer, so the log can be read with gzip
+        return zlib.compressobj(LOG_COMPRESSION_LEVELS["gzip"], zlib.DEFLATED, 31)
+    return lzma.LZMACompressor(lzma.FORMAT_XZ, preset=LOG_COMPRESSION_LEVELS["xz"])
+
+
+def decompress_log(data: bytes, compression: LogCompression) -> bytes:
+    """
+    Decompresses a compressed log, one gzip member or xz stream at a time.
+
+    A member that was cut off by a crash (or the zeros at the end of a preallocated log) ends the
+    log, and everything before it is still returned.
+
+    :param data: The contents of the compressed log.
+    :param compression: The codec the log was compressed with.
+    :return: The decompressed log.
+    """
+    chunks = []
+    while data:
+        decompressor = zlib.decompressobj(31) if compression == "gzip" else lzma.LZMADecompressor()
+        try:
+            chunk = decompressor.decompress(data)
+        except zlib.error, lzma.LZMAError:
+            break
+        if not decompressor.eof:
+            break
+        chunks.append(chunk)
+        data = decompressor.unused_data
+    return b"".join(chunks)
+
+
+class CompressedLogFile:
+    """
+    A log file that compresses everything written to it.
+
+    Every flush ends the current gzip member (or xz stream), and the next write starts a new one.
+    The durability policy flushes right before every sync, so everything up to a sync can be
+    decompressed without what comes after it, and a crash can only cost what was written since
+    the last sync. A file of several members is still a regular .gz or .xz file.
+    """
+
+    __slots__ = ("_compression", "_compressor", "_file")
+
+    def __init__(self, file: BinaryIO, compression: LogCompression) -> None:
+        """
+        Wraps an open log file.
+
+        :param file: The log file, opened for writing.
+        :param compression: The codec to compress with.
+        """
+        self._file = file
+        self._compression = compression
+        self._compressor: zlib._Compress | lzma.LZMACompressor | None = None
+
+    def __enter__(self) -> typing.Self:
+        """Lets the compressed file be used in a with statement, like a file."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Finishes the last member and closes the file."""
+        self.close()
+
+    def write(self, data: bytes) -> int:
+        """
+        Compresses the data and writes what the compressor gives back.
+
+        :param data: The data to write.
+        :return: The number of bytes of data, before compression.
+        """
+        if self._compressor is None:
+            self._compressor = _new_compressor(self._compression)
+        self._file.write(self._compressor.compress(data))
+        return len(data)
+
+    def flush(self) -> None:
+        """Finishes the current member and flushes the file."""
+        if self._compressor is not None:
+            self._file.write(self._compressor.flush())
+            self._compressor = None
+        self._file.flush()
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def truncate(self) -> int:
+        return self._file.truncate()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+class LogBatch(msgspec.Struct):
+    """
+    Everything the main loop wants logged from one iteration.
+
+    Logger.log only puts one of these in the queue, and the logger thread expands it into a row per
+    FIRM packet. The packets are not copied, which is fine because the Context makes new ones every
+    iteration instead of changing the old ones.
+    """
+
+    context_data_packet: ContextDataPacket
+    firm_data_packets: list[FIRMDataPacket]
+    grave_data_packet: GraveDataPacket
+    zombie_data_packet: ZombieDataPacket
+    enqueued_ns: int = 0
+    """When the batch was put in the log queue, from time.monotonic_ns."""
+
+
 class Logger:
     """
-    A class that logs data to a CSV file.
+    A class that logs data to a CSV file, or optionally to a binary file of MessagePack frames.
 
     Similar to the IMU class, it runs in a separate thread. This is because the logging thread is
     I/O-bound, meaning that it spends most of its time waiting for the file to be written to. By
     running it in a separate thread, we can continue to log data while the main loop is running. It
     uses Python's csv module to append the airbrakes' current state, extension, and IMU data to our
-    logs in real time.
+    logs in real time. Which columns are logged depends on the log profile, see LogSchema.
+
+    In StandbyState and LandedState, only the first IDLE_LOG_CAPACITY rows are written. After
+    that the rows go into a ring buffer of the last LOG_BUFFER_SIZE rows, and of the rows that fall
+    out of it only one in every LOG_BUFFER_SNAPSHOT_INTERVAL is written. When the state changes, the
+    buffer is written, so the seconds before launch are always in the log, and the rows are written
+    in the order they came in.
+
+    The log can also be written as a directory of segments with a CRC on every block, so a crash
+    only costs the block being written (see payload.data_handling.log_segments), or be compressed
+    with gzip or xz. A log that is neither gets an offset index next to it, with where every state
+    and every second of FIRM time starts, see payload.data_handling.log_seek.
+
+    With the "process" backend, everything that runs in the logger thread runs in a separate
+    process instead, so encoding and writing the rows doesn't hold the GIL of the main loop.
+
+    If the logger falls behind (e.g. the SD card stalls), the LogBackpressure sheds rows before
+    they are queued, so the queue can't grow until the Pi runs out of memory.
     """
 
     __slots__ = (
         "_log_buffer",
         "_log_counter",
         "_log_queue",
+        "_log_ring",
         "_log_thread",
+        "_msgpack_encoder",
+        "backpressure",
+        "compression",
+        "durability_policy",
+        "log_format",
         "log_path",
+        "log_schema",
+        "segment_size_bytes",
     )
 
-    def __init__(self, log_dir: Path) -> None:
+    def __init__(
+        self,
+        log_dir: Path,
+        log_format: LogFormat = "csv",
+        *,
+        durability_policy: DurabilityPolicy | None = None,
+        segment_size_bytes: int | None = None,
+        compression: LogCompression | None = None,
+        backend: LoggerBackend = "thread",
+        backpressure: LogBackpressure | None = None,
+        log_profile: LogProfile = "standard",
+    ) -> None:
         """
         Initializes the logger object.
 
@@ -64,46 +261,133 @@ class Logger:
         lot of data, and logging is I/O-bound, so running it in a separate thread allows the main
         loop to continue running without waiting for the log file to be written to.
         :param log_dir: The directory where the log files will be.
+        :param log_format: Whether to write a CSV file, or a binary file of MessagePack frames.
+        :param durability_policy: When to sync the log file to the disk. Defaults to syncing every
+            NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING rows.
+        :param segment_size_bytes: If given, the log is a directory of segments of up to this size
+            instead of a single file.
+        :param compression: If given, the codec to compress the log with. Compressed logs can't be
+            segmented.
+        :param backend: Whether to encode and write the rows in a thread or in a separate process.
+        :param backpressure: How many rows can wait to be written, and which rows to shed when more
+            would. Defaults to LOG_QUEUE_CAPACITY_ROWS rows.
+        :param log_profile: Which columns to log, see LogProfile.
         """
+        if compression is not None and segment_size_bytes is not None:
+            raise ValueError("Compressed logs can't be segmented.")
+
         # Create the log directory if it doesn't exist
         log_dir.mkdir(parents=True, exist_ok=True)
 
-        # Get all existing log files and find the highest suffix number
-        existing_logs = list(log_dir.glob("log_*.csv"))
-        max_suffix = (
-            max(int(log.stem.split("_")[-1]) for log in existing_logs) if existing_logs else 0
-        )
-
-        # Buffer for StandbyState and LandedState
+        # Buffer for StandbyState and LandedState. Both are only used by the logger thread.
         self._log_counter = 0
-        self._log_buffer = deque(maxlen=LOG_BUFFER_SIZE)
+        self._log_buffer: deque[LogRow] = deque(maxlen=LOG_BUFFER_SIZE)
+
+        self.log_format = log_format
+        self.log_schema = LogSchema(log_profile)
+        self.segment_size_bytes = segment_size_bytes
+        self.compression = compression
+        self.durability_policy = durability_policy or DurabilityPolicy()
+        self.backpressure = backpressure or LogBackpressure()
+        self._msgpack_encoder = msgspec.msgpack.Encoder(enc_hook=convert_unknown_type_to_float)
+
+        # Create a new log file with the next number in sequence, which the index of the log
+        # directory keeps, so the directory isn't listed. The segments of a segmented log are
+        # created by the logger thread.
+        if segment_size_bytes is not None:
+            self.log_path = create_log(log_dir, "", is_directory=True)
+        else:
+            suffix = LOG_FILE_SUFFIXES[log_format]
+            if compression is not None:
+                suffix += LOG_COMPRESSION_SUFFIXES[compression]
+            self.log_path = create_log(log_dir, suffix)
+            with self._open_log_file(mode="wb") as file_writer:
+                file_writer.write(self._encode_header())
+
+        self._log_queue: BatchQueue[LogBatch] = BatchQueue()
+        self._log_ring = SharedMemoryLogRing(self.log_schema) if backend == "process" else None
+
+        # Start the logging thread (or process)
+        self._log_thread: threading.Thread | multiprocessing.Process
+        if self._log_ring is None:
+            self._log_thread = threading.Thread(
+                target=self._logging_loop, name="Logger Thread", daemon=True
+            )
+        else:
+            self._log_thread = LOG_PROCESS_CONTEXT.Process(
+                target=self._logging_loop, name="Logger Process", daemon=True
+            )
 
-        # Create a new log file with the next number in sequence
-        self.log_path = log_dir / f"log_{max_suffix + 1}.csv"
-        with self.log_path.open(mode="w", newline="") as file_writer:
-            headers = list(LoggerDataPacket.__struct_fields__)
-            writer = csv.writer(file_writer)
-            writer.writerow(headers)
+    def __getstate__(self) -> dict[str, Any]:
+        """
+        Returns what the logger process needs to run the logging loop. The queue, the thread and
+        the msgspec encoder can't be pickled, and the process doesn't need them.
 
-        self._log_queue: queue.SimpleQueue[LoggerDataPacket | Literal["STOP"]] = queue.SimpleQueue()
+        The durability policy is a copy in the logger process, so its fsync latencies are handed
+        back through the shared memory ring when the process stops.
+        """
+        return {
+            "_log_ring": self._log_ring,
+            "compression": self.compression,
+            "durability_policy": self.durability_policy,
+            "log_format": self.log_format,
+            "log_path": self.log_path,
+            "log_schema": self.log_schema,
+            "segment_size_bytes": self.segment_size_bytes,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """
+        Sets up the Logger in the logger process.
 
-        # Start the logging thread
-        self._log_thread = threading.Thread(
-            target=self._logging_loop, name="Logger Thread", daemon=True
-        )
+        :param state: What __getstate__ returned in the main process.
+        """
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._log_counter = 0
+        self._log_buffer = deque(maxlen=LOG_BUFFER_SIZE)
+        self._msgpack_encoder = msgspec.msgpack.Encoder(enc_hook=convert_unknown_type_to_float)
 
     @property
     def is_running(self) -> bool:
         """
-        Returns whether the logging thread is running.
+        Returns whether the logging thread (or process) is running.
         """
         return self._log_thread.is_alive()
 
+    @property
+    def dropped_rows(self) -> int:
+        """
+        Returns the number of rows that were shed or dropped because the logger fell too far behind.
+        """
+        ring_dropped_rows = 0 if self._log_ring is None else self._log_ring.dropped_rows
+        return self.backpressure.shed_rows + ring_dropped_rows
+
+    @property
+    def queue_depth_rows(self) -> int:
+        """
+        Returns the number of rows that were queued but not written yet.
+        """
+        if self._log_ring is not None:
+            return self._log_ring.queued_rows
+        return self.backpressure.enqueued_rows - self.backpressure.drained_rows
+
+    @property
+    def queue_metrics(self) -> LogQueueMetrics:
+        """
+        Returns a snapshot of the depth, rates and latency of the log queue. The rates are averaged
+        since the last time this was read.
+        """
+        return self.backpressure.snapshot(self.queue_depth_rows)
+
     @property
     def is_log_buffer_full(self) -> bool:
         """
-        Returns whether the log buffer is full.
+        Returns whether the log buffer is full. With the "process" backend, the buffer is in the
+        logger process, which tells the main process its size through the shared memory ring.
         """
+        if self._log_ring is not None:
+            return self._log_ring.buffered_rows == LOG_BUFFER_SIZE
         return len(self._log_buffer) == LOG_BUFFER_SIZE
 
     @staticmethod
@@ -117,55 +401,36 @@ class Logger:
         """
         return f"{obj_type:.8f}"
 
-    @staticmethod
-    def _prepare_logger_packets(
-        context_data_packet: ContextDataPacket,
-        firm_data_packets: list[FIRMDataPacket],
-        grave_data_packet: GraveDataPacket,
-        zombie_data_packet: ZombieDataPacket,
-    ) -> list[LoggerDataPacket]:
+    def _encode_header(self) -> bytes:
         """
-        Creates a data packet representing a row of data to be logged.
-
-        :param context_data_packet: The Context Data Packet to log.
-        :param firm_data_packets: The FIRM data packets to log.
-        length as the number of EstimatedDataPackets present in the `imu_data_packets`.
-        :return: A deque of LoggerDataPacket objects.
-        """
-        logger_data_packets: list[LoggerDataPacket] = []
-
-        # Convert the imu data packets to a LoggerDataPacket:
-        for firm_data_packet in firm_data_packets:
-            logger_packet = LoggerDataPacket(
-                timestamp_epoch=context_data_packet.epoch_time,
-                state_letter=context_data_packet.state.__name__,
-                timestamp_seconds=firm_data_packet.timestamp_seconds,
-            )
+        Creates what goes at the start of a new log file.
 
-            # Get the IMU data packet fields:
-            # Performance comparison (python 3.13.1 on x86_64 linux):
-            # - isinstance is 45.2% faster than match statement
-            # - hasattr is 20.57% faster than isinstance
-            # - type() is 34.85% faster than hasattr
-            logger_packet.nitrogen = zombie_data_packet.nitrogen
-            logger_packet.pH = zombie_data_packet.pH
-            logger_packet.electrical_conductivity = zombie_data_packet.electrical_conductivity
+        For CSV, that's the row of column names. A binary log starts with BINARY_LOG_MAGIC and a
+        schema frame with the name and type of every column, so it can be read back whatever the log
+        profile was.
 
-            logger_packet.ejecting_zombie = grave_data_packet.ejecting_zombie
-            logger_packet.latch = grave_data_packet.latch
-            logger_packet.activating_legs = zombie_data_packet.activating_legs
-            logger_packet.checking_orientation = zombie_data_packet.checking_orientation
-
-            logger_packet.est_position_z_meters = firm_data_packet.est_position_z_meters
-            logger_packet.est_velocity_z_meters_per_s = firm_data_packet.est_velocity_z_meters_per_s
-            logger_packet.temperature_celsius = firm_data_packet.temperature_celsius
-            logger_packet.raw_acceleration_x_gs = firm_data_packet.raw_acceleration_x_gs
-            logger_packet.raw_acceleration_y_gs = firm_data_packet.raw_acceleration_y_gs
-            logger_packet.raw_acceleration_z_gs = firm_data_packet.raw_acceleration_z_gs
-
-            logger_data_packets.append(logger_packet)
+        :return: The bytes to write at the start of the log file.
+        """
+        if self.log_format == "binary":
+            schema = {
+                "fields": self.log_schema.column_names,
+                "types": self.log_schema.type_names,
+            }
+            return BINARY_LOG_MAGIC + self._encode_frame(schema)
+
+        header = io.StringIO(newline="")
+        csv.writer(header).writerow(self.log_schema.column_names)
+        return header.getvalue().encode()
+
+    def _encode_frame(self, message: Any) -> bytes:
+        """
+        Encodes a message as a MessagePack frame, prefixed with its length.
 
-        return logger_data_packets
+        :param message: The message to encode.
+        :return: The frame.
+        """
+        payload = self._msgpack_encoder.encode(message)
+        return struct.pack(BINARY_LOG_FRAME_HEADER_FORMAT, len(payload)) + payload
 
     def start(self) -> None:
         """
@@ -181,9 +446,20 @@ class Logger:
 
         It will finish logging the current message and then stop.
         """
-        # Log the buffer before stopping the thread
-        self._log_the_buffer()
-        self._log_queue.put(STOP_SIGNAL)  # Put the stop signal in the queue
+        # Don't lose the rows that were held back in case the state changed
+        self._enqueue(self.backpressure.release_held_batches())
+        # The logger thread logs the buffer before stopping
+        if self._log_ring is not None:
+            self._log_ring.request_stop()
+            self._log_thread.join()
+            # The syncs were measured by the copy of the durability policy in the logger process
+            (
+                self.durability_policy.fsync_latency_counts,
+                self.durability_policy.max_fsync_latency_ms,
+            ) = self._log_ring.get_fsync_latencies()
+            self._log_ring.close()
+            return
+        self._log_queue.stop()  # The logger thread stops once it logged everything before this
         # Waits for the thread to finish before stopping it
         self._log_thread.join()
 
@@ -197,39 +473,139 @@ class Logger:
         """
         Logs the current state, extension, and IMU data to the CSV file.
 
+        This runs on the main loop, so it only queues the packets, after the backpressure shed any
+        rows the logger can't keep up with. The rows are built, and buffered in Standby and Landed
+        State, on the logger thread.
+
         :param context_data_packet: The Context Data Packet to log.
         :param firm_data_packets: The IMU data packets to log.
         :param grave_data_packet: The processor data packets to log.
         :param zombie_data_packet: The most recent apogee predictor data packet to log.
         """
-        # We are populating a list with the fields of the logger data packet
-        logger_data_packets: list[LoggerDataPacket] = Logger._prepare_logger_packets(
-            context_data_packet,
-            firm_data_packets,
-            grave_data_packet,
-            zombie_data_packet,
+        log_batch = LogBatch(
+            context_data_packet, firm_data_packets, grave_data_packet, zombie_data_packet
         )
+        self._enqueue(self.backpressure.admit(log_batch, self.queue_depth_rows))
 
-        # If we are not in Standby or Landed State, we should log the buffer if it's not empty:
-        if self._log_buffer:
-            self._log_the_buffer()
+    def _enqueue(self, log_batches: typing.Iterable[LogBatch]) -> None:
+        """
+        Puts batches in the log queue, or in the shared memory ring of the logger process.
 
-        # Reset the counter for other states
-        self._log_counter = 0
-        for packet in logger_data_packets:
-            self._log_queue.put(packet, block=False)
+        :param log_batches: The batches to queue, in order.
+        """
+        if self._log_ring is not None:
+            for log_batch in log_batches:
+                self._log_ring.put(log_batch)
+            return
+        enqueued_ns = time.monotonic_ns()
+        log_batches = list(log_batches)
+        for log_batch in log_batches:
+            log_batch.enqueued_ns = enqueued_ns
+        self._log_queue.put_batch(log_batches)
+
+    def _open_log_file(
+        self, mode: Literal["wb", "r+b"] = "r+b"
+    ) -> BinaryIO | LogSegmentWriter | CompressedLogFile:
+        """
+        Opens the log for writing, positioned at the end of what was already written.
+
+        The file isn't opened in append mode, since that would write after the space the durability
+        policy might have preallocated.
+
+        :param mode: "wb" to create the log file, "r+b" to keep writing to it.
+        :return: The log file, or the writer of the segments of a segmented log.
+        """
+        if self.segment_size_bytes is not None:
+            return LogSegmentWriter(
+                self.log_path,
+                self._encode_header(),
+                self.log_format,
+                self.durability_policy,
+                self.segment_size_bytes,
+            )
+        file_writer = self.log_path.open(mode=mode)
+        file_writer.seek(0, io.SEEK_END)
+        if self.compression is not None:
+            return CompressedLogFile(file_writer, self.compression)
+        return file_writer
 
-    def _log_the_buffer(self):
+    def _open_offset_index(self) -> LogOffsetIndexWriter | contextlib.nullcontext[None]:
         """
-        Enqueues all the packets in the log buffer to the log queue, so they will be logged.
+        Creates the offset index of the log, if it can have one.
+
+        :return: The writer of the offset index, or a context of None for a compressed or segmented
+            log, whose offsets can't be seeked to.
         """
-        for packet in self._log_buffer:
-            self._log_queue.put(packet, block=False)
-        self._log_buffer.clear()
+        if self.segment_size_bytes is not None or self.compression is not None:
+            return contextlib.nullcontext()
+        return LogOffsetIndexWriter(self.log_path, self.log_schema)
 
     # ------------------------ ALL METHODS BELOW RUN IN A SEPARATE THREAD -------------------------
+    def _get_logger_packets(self, timeout: float | None) -> tuple[list[LogRow], bool, int | None]:
+        """
+        Waits for the next rows to log, from the log queue or from the shared memory ring.
+
+        :param timeout: The longest time to wait for rows, in seconds, or None to wait forever.
+        :return: The rows, whether the logger was asked to stop after them, and when the oldest of
+            them was queued (None if that isn't known, or there are no rows).
+        """
+        if self._log_ring is not None:
+            return *self._log_ring.get(timeout), None
+
+        # Take everything in the queue (this will block until a message is available, or until the
+        # timeout runs out). If the logger was stopped, these are the last batches to log
+        log_batches, stop_requested = self._log_queue.get_all(timeout=timeout)
+        oldest_enqueued_ns = log_batches[0].enqueued_ns if log_batches else None
+        return self.log_schema.build_rows(log_batches), stop_requested, oldest_enqueued_ns
+
+    def _log_the_buffer(self, packets_to_log: list[LogRow]) -> None:
+        """
+        Moves all the packets in the log buffer to the packets to log, so they will be logged.
+
+        :param packets_to_log: The list of packets that will be written next.
+        """
+        packets_to_log.extend(self._log_buffer)
+        self._log_buffer.clear()
+
+    def _buffer_idle_packets(self, logger_packets: list[LogRow]) -> list[LogRow]:
+        """
+        Puts the packets from the idle states in the log buffer once IDLE_LOG_CAPACITY is reached,
+        and logs the buffer as soon as a packet from another state comes in.
+
+        Every idle packet goes through the buffer, and only the packets that fall out of its far end
+        are decimated to one snapshot in every LOG_BUFFER_SNAPSHOT_INTERVAL. The snapshots are
+        older than everything still in the buffer, so the log never goes back in time.
+
+        :param logger_packets: The packets built from the log queue, in order.
+        :return: The packets to write to the log file now.
+        """
+        packets_to_log: list[LogRow] = []
+        state_index = self.log_schema.state_index
+        for packet in logger_packets:
+            if packet[state_index] in IDLE_LOG_STATES:
+                self._log_counter += 1
+                if self._log_counter <= IDLE_LOG_CAPACITY:
+                    packets_to_log.append(packet)
+                    continue
+                if len(self._log_buffer) == LOG_BUFFER_SIZE:
+                    # The oldest packet is about to fall out of the buffer
+                    evicted_packets = self._log_counter - IDLE_LOG_CAPACITY - LOG_BUFFER_SIZE
+                    if evicted_packets % LOG_BUFFER_SNAPSHOT_INTERVAL == 0:
+                        packets_to_log.append(self._log_buffer[0])
+                self._log_buffer.append(packet)
+                continue
+
+            # If we are not in Standby or Landed State, we should log the buffer if it's not empty:
+            if self._log_buffer:
+                self._log_the_buffer(packets_to_log)
+            # Reset the counter for other states
+            self._log_counter = 0
+            packets_to_log.append(packet)
+
+        return packets_to_log
+
     @staticmethod
-    def _truncate_floats(data: DecodedLoggerDataPacket) -> list[str | int]:
+    def _truncate_floats(data: LogRow) -> list[str | int]:
         """
         Truncates the decimal place of the floats in the list to 8 decimal places.
 
@@ -238,44 +614,127 @@ class Logger:
         """
         return [f"{value:.8f}" if isinstance(value, float) else value for value in data]
 
+    @staticmethod
+    def _format_csv_value(value: Any) -> str:
+        """
+        Formats a single value exactly like csv.writer would write it after _truncate_floats.
+
+        :param value: The value to format.
+        :return: The formatted field.
+        """
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            return f"{value:.8f}"
+        field = str(value)
+        if CSV_SPECIAL_CHARACTERS.intersection(field):
+            return '"' + field.replace('"', '""') + '"'
+        return field
+
+    @staticmethod
+    def _encode_csv_batch(packet_fields: list[LogRow]) -> str:
+        """
+        Formats a whole batch of rows as CSV in one go.
+
+        The rows are transposed into columns, and a format is picked for each column: the columns
+        that only hold floats (the FIRM fields) get "%.8f", and every other column (states, epoch
+        time, Grave and Zombie fields) only takes a handful of distinct values in a batch, so each
+        distinct value is formatted once and looked up. The whole batch is then formatted by a
+        single C-level % operation on one format string, instead of formatting every value and
+        writing every row from Python. The output is byte for byte what csv.writer produced for
+        the same rows after _truncate_floats.
+
+        :param packet_fields: The rows to encode, as returned by msgspec.to_builtins.
+        :return: The CSV text for all the rows.
+        """
+        columns: list[Any] = list(zip(*packet_fields, strict=True))
+        column_formats = []
+        for index, column in enumerate(columns):
+            types = set(map(type, column))
+            if types == {float}:
+                column_formats.append("%.8f")
+                continue
+            column_formats.append("%s")
+            if float not in types and not {bool, int} <= types:
+                # True == 1 and 0.0 == -0.0, so values can only be looked up if they can't collide
+                formatted = {value: Logger._format_csv_value(value) for value in set(column)}
+                columns[index] = map(formatted.__getitem__, column)
+            else:
+                columns[index] = map(Logger._format_csv_value, column)
+
+        row_format = ",".join(column_formats) + "\r\n"
+        return (row_format * len(packet_fields)) % tuple(
+            itertools.chain.from_iterable(zip(*columns, strict=True))
+        )
+
+    def _encode_batch(self, logger_packets: list[LogRow]) -> bytes:
+        """
+        Encodes a batch of packets in the format of the log file.
+
+        In a binary log, the whole batch is a single frame holding one array per packet.
+
+        :param logger_packets: The packets to encode.
+        :return: The bytes to append to the log file.
+        """
+        if self.log_format == "binary":
+            return self._encode_frame(logger_packets)
+
+        packet_fields: list[LogRow] = msgspec.to_builtins(
+            logger_packets, enc_hook=Logger._convert_unknown_type_to_str
+        )
+        return Logger._encode_csv_batch(packet_fields).encode()
+
     def _logging_loop(self) -> None:  # pragma: no cover
         """
         The loop that saves data to the logs.
         It runs in parallel with the main loop.
         """
-        # Set up the csv logging in the new thread
-        with self.log_path.open(mode="a", newline="") as file_writer:
-            writer = csv.writer(file_writer)
-            number_of_lines_logged = 0
+        # Set up the logging in the new thread
+        written_rows = 0
+        states: set[str] = set()
+        state_index = self.log_schema.state_index
+        with self._open_log_file() as file_writer, self._open_offset_index() as offset_index:
+            self.durability_policy.open(file_writer)
             while True:
-                # Get a message from the queue (this will block until a message is available)
-                # Because there's no timeout, it will wait indefinitely until it gets a message.
-                logger_packets: list[LoggerDataPacket | Literal["STOP"]] = (
-                    get_all_packets_from_queue(self._log_queue, block=True)
+                # Wait for rows, or until the durability policy wants to sync the rows it's holding
+                logger_packets, stop_requested, oldest_enqueued_ns = self._get_logger_packets(
+                    self.durability_policy.wait_timeout_seconds
                 )
-                packet_fields: list[DecodedLoggerDataPacket | Literal["STOP"]] = (
-                    msgspec.to_builtins(
-                        logger_packets, enc_hook=Logger._convert_unknown_type_to_str
+                drained_rows = len(logger_packets)
+                logger_packets = self._buffer_idle_packets(logger_packets)
+                if self._log_ring is not None:
+                    self._log_ring.set_buffered_rows(len(self._log_buffer))
+                # Don't lose the buffer when we stop while still in Standby or Landed State
+                if stop_requested:
+                    self._log_the_buffer(logger_packets)
+
+                if logger_packets:
+                    if offset_index is None:
+                        file_writer.write(self._encode_batch(logger_packets))
+                    else:
+                        offset_index.write_rows(file_writer, logger_packets, self._encode_batch)
+                    self.durability_policy.record_write(
+                        file_writer, len(logger_packets), logger_packets[-1][state_index]
                     )
-                )
-                # If the message is the stop signal, break out of the loop
-                for message_field in packet_fields:
-                    if message_field == STOP_SIGNAL:
-                        return
-                    writer.writerow(Logger._truncate_floats(message_field))
-                    number_of_lines_logged += 1
-                    # During our Pelicanator 1 flight, the rocket fell and had a very hard impact
-                    # causing the pi to lose power. This caused us to lose a lot of lines of data
-                    # that were not written to the log file. To prevent this from happening again,
-                    # we flush the logger 1000 lines (equivalent to 1 second).
-                    if number_of_lines_logged % NUMBER_OF_LINES_TO_LOG_BEFORE_FLUSHING == 0:
-                        # Tell Python to flush the data. This gives the data to the OS, and it is
-                        # stored as a dirty page cache (in memory) until the OS decides to write it
-                        # to disk. Technically python automatically flushes the data when the python
-                        # buffer is full (8192 bytes, which would be about 25 lines of data).
-                        file_writer.flush()
-                        # Tell the OS to write the file to disk from the dirty page cache. This
-                        # ensures that the data is written to disk and not just stored in memory.
-                        # This operation is the one which is actually "blocking" when talking about
-                        # file I/O.
-                        os.fsync(file_writer.fileno())
+                    written_rows += len(logger_packets)
+                    states.update(map(operator.itemgetter(state_index), logger_packets))
+                if oldest_enqueued_ns is not None:
+                    self.backpressure.record_drained(drained_rows, oldest_enqueued_ns)
+
+                if stop_requested:
+                    self.durability_policy.close(file_writer)
+                    if self._log_ring is not None:
+                        self._log_ring.put_fsync_latencies(
+                            self.durability_policy.fsync_latency_counts,
+                            self.durability_policy.max_fsync_latency_ms,
+                        )
+                    break
+
+                # During our Pelicanator 1 flight, the rocket fell and had a very hard impact
+                # causing the pi to lose power. This caused us to lose a lot of lines of data that
+                # were not written to the log file. To prevent this from happening again, we sync
+                # the log file as often as the durability policy says to.
+                self.durability_policy.sync_if_due(file_writer)
+
+        # The log is closed, so its size is final
+        finish_log(self.log_path, written_rows, states)
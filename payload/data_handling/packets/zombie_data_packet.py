@@ -11,5 +11,7 @@ class ZombieDataPacket(msgspec.Struct, tag=True, array_like=True):
     nitrogen: float
     pH: float
     electrical_conductivity: float
+    motor_current_a: float = 0.0
+    """The current drawn by the drill motor, in amps."""
 
     # add more as needed
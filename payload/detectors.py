@@ -0,0 +1,273 @@
+"""
+Module for the detectors the states use to decide when a flight event has happened.
+"""
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import polars as pl
+
+from payload.constants import (
+    LANDING_ACCELERATION_BAND_GS,
+    LANDING_ACCELERATION_MAX_STD_GS,
+    LANDING_WINDOW_SIZE,
+    LAUNCH_ACCELERATION_GS,
+    LAUNCH_CONSECUTIVE_SAMPLES,
+)
+
+if TYPE_CHECKING:
+    from firm_client import FIRMDataPacket
+
+ACCELERATION_GS = (
+    pl.col("raw_acceleration_x_gs") ** 2
+    + pl.col("raw_acceleration_y_gs") ** 2
+    + pl.col("raw_acceleration_z_gs") ** 2
+).sqrt()
+"""
+The magnitude of the acceleration of a row, for finding flight events in a whole log or replay file
+at once.
+"""
+
+
+def squared_acceleration_magnitudes(firm_data_packets: list[FIRMDataPacket]) -> np.ndarray:
+    """
+    Calculates the squared total raw acceleration of every packet in one vectorized pass.
+
+    :param firm_data_packets: The FIRM data packets to get the acceleration of.
+    :return: An array with the squared acceleration magnitude in Gs² of each packet.
+    """
+    accelerations = np.array(
+        [
+            (
+                packet.raw_acceleration_x_gs,
+                packet.raw_acceleration_y_gs,
+                packet.raw_acceleration_z_gs,
+            )
+            for packet in firm_data_packets
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    return np.einsum("ij,ij->i", accelerations, accelerations)
+
+
+def acceleration_magnitudes(firm_data_packets: list[FIRMDataPacket]) -> np.ndarray:
+    """
+    Calculates the total raw acceleration of every packet in one vectorized pass.
+
+    :param firm_data_packets: The FIRM data packets to get the acceleration of.
+    :return: An array with the acceleration magnitude in Gs of each packet.
+    """
+    return np.sqrt(squared_acceleration_magnitudes(firm_data_packets))
+
+
+class LaunchDetector:
+    """
+    Detects launch by looking at every packet in a batch, not just the most recent one.
+
+    A batch can hold dozens of packets, so only checking the last one can miss a short boost spike
+    in the middle of it. Instead, the squared acceleration magnitude of every packet is compared
+    against the squared threshold (no square roots needed) in one vectorized pass. Optionally,
+    launch is only detected once `consecutive_samples` packets in a row are above the threshold,
+    which also works across batches.
+    """
+
+    __slots__ = (
+        "_consecutive_samples",
+        "_run_length",
+        "_run_start_timestamp_seconds",
+        "_threshold_squared",
+        "launch_timestamp_seconds",
+    )
+
+    def __init__(
+        self,
+        threshold_gs: float = LAUNCH_ACCELERATION_GS,
+        consecutive_samples: int = LAUNCH_CONSECUTIVE_SAMPLES,
+    ) -> None:
+        """
+        Initializes the launch detector.
+
+        :param threshold_gs: The total acceleration in Gs that a packet must be above.
+        :param consecutive_samples: How many packets in a row must be above the threshold.
+        """
+        self._threshold_squared = threshold_gs**2
+        self._consecutive_samples = max(1, consecutive_samples)
+        # How many packets at the end of the previous batches were above the threshold
+        self._run_length = 0
+        self._run_start_timestamp_seconds = 0.0
+        self.launch_timestamp_seconds: float | None = None
+        """The timestamp_seconds of the first packet of the run that triggered launch."""
+
+    @property
+    def has_launched(self) -> bool:
+        """
+        Returns whether launch has been detected.
+        """
+        return self.launch_timestamp_seconds is not None
+
+    def update(self, firm_data_packets: list[FIRMDataPacket]) -> bool:
+        """
+        Checks a batch of FIRM data packets for launch.
+
+        :param firm_data_packets: The FIRM data packets received this loop.
+        :return: True if launch was detected in this batch, or in an earlier one.
+        """
+        if self.has_launched or not firm_data_packets:
+            return self.has_launched
+
+        above_threshold = (
+            squared_acceleration_magnitudes(firm_data_packets) > self._threshold_squared
+        )
+        if not above_threshold.any():
+            self._run_length = 0
+            return False
+
+        # For every packet, the index of the last packet at or before it that was below the
+        # threshold, so the length of the run ending at each packet is its distance from that.
+        indices = np.arange(len(above_threshold))
+        last_below = np.maximum.accumulate(np.where(above_threshold, -1, indices))
+        run_lengths = indices - last_below
+        # Runs that started in a previous batch continue into this one
+        continues_previous_run = last_below == -1
+        run_lengths[continues_previous_run] += self._run_length
+
+        triggered = np.flatnonzero(run_lengths >= self._consecutive_samples)
+        if triggered.size:
+            end = int(triggered[0])
+            start = end - self._consecutive_samples + 1
+            self.launch_timestamp_seconds = (
+                firm_data_packets[start].timestamp_seconds
+                if start >= 0
+                else self._run_start_timestamp_seconds
+            )
+            return True
+
+        # Remember the run that reaches the end of the batch, if any
+        if above_threshold[-1]:
+            if not continues_previous_run[-1] or self._run_length == 0:
+                start = int(last_below[-1]) + 1
+                self._run_start_timestamp_seconds = firm_data_packets[start].timestamp_seconds
+            self._run_length = int(run_lengths[-1])
+        else:
+            self._run_length = 0
+        return False
+
+
+class LandingDetector:
+    """
+    Detects when the rocket is sitting still on the ground, i.e. when the last `window_size`
+    acceleration magnitudes are all close to 1 G and barely vary.
+
+    The deviations |a - 1 G| are kept in a preallocated ring buffer, along with their running sum,
+    running sum of squares and the number of them that are outside the band. Each batch only adds
+    the new values and subtracts the ones they overwrite, so checking for landing costs O(batch)
+    instead of rebuilding and rescanning the whole window every loop.
+
+    Because we store the deviation from 1 G rather than the raw magnitude, the values are close to
+    zero exactly when we care about them (on the ground), which keeps the sum-of-squares variance
+    well conditioned. The sums are recomputed from the buffer every time it wraps around so
+    floating point error can't build up over a long flight.
+    """
+
+    __slots__ = (
+        "_band",
+        "_buffer",
+        "_count",
+        "_index",
+        "_max_std",
+        "_out_of_band",
+        "_sum",
+        "_sum_of_squares",
+        "window_size",
+    )
+
+    def __init__(
+        self,
+        window_size: int = LANDING_WINDOW_SIZE,
+        band: float = LANDING_ACCELERATION_BAND_GS,
+        max_std: float = LANDING_ACCELERATION_MAX_STD_GS,
+    ) -> None:
+        """
+        Initializes the landing detector.
+
+        :param window_size: How many of the most recent packets must be quiet.
+        :param band: How far from 1 G each acceleration magnitude can be.
+        :param max_std: The maximum standard deviation of the deviations from 1 G.
+        """
+        self.window_size = window_size
+        self._band = band
+        self._max_std = max_std
+        self._buffer = np.zeros(window_size, dtype=np.float64)
+        self._index = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sum_of_squares = 0.0
+        self._out_of_band = 0
+
+    @property
+    def is_full(self) -> bool:
+        """
+        Returns whether the detector has seen at least `window_size` packets.
+        """
+        return self._count >= self.window_size
+
+    @property
+    def std(self) -> float:
+        """
+        The (population) standard deviation of the deviations from 1 G in the window.
+        """
+        count = min(self._count, self.window_size)
+        if count == 0:
+            return 0.0
+        mean = self._sum / count
+        return max(self._sum_of_squares / count - mean * mean, 0.0) ** 0.5
+
+    @property
+    def is_landed(self) -> bool:
+        """
+        Returns whether the whole window is inside the band and its standard deviation is below
+        the threshold.
+        """
+        return self.is_full and self._out_of_band == 0 and self.std < self._max_std
+
+    def update(self, firm_data_packets: list[FIRMDataPacket]) -> None:
+        """
+        Adds a batch of FIRM data packets to the window.
+
+        :param firm_data_packets: The FIRM data packets received this loop.
+        """
+        if not firm_data_packets:
+            return
+        # Anything older than the window would be overwritten anyway
+        deviations = np.abs(acceleration_magnitudes(firm_data_packets[-self.window_size :]) - 1.0)
+        self._add(deviations)
+
+    def _add(self, deviations: np.ndarray) -> None:
+        """
+        Writes the deviations into the ring buffer and updates the running statistics.
+
+        :param deviations: At most `window_size` values of |a - 1 G| to add.
+        """
+        number_of_new = len(deviations)
+        positions = (self._index + np.arange(number_of_new)) % self.window_size
+        overwritten = self._buffer[positions]
+
+        self._buffer[positions] = deviations
+        self._index = (self._index + number_of_new) % self.window_size
+        self._count += number_of_new
+
+        if self._index < number_of_new:
+            # We wrapped around, so recompute from scratch to get rid of accumulated error
+            self._sum = float(self._buffer.sum())
+            self._sum_of_squares = float(np.dot(self._buffer, self._buffer))
+            self._out_of_band = int(np.count_nonzero(self._buffer > self._band))
+            return
+
+        # The slots we overwrite are zero until the buffer fills up, so they subtract nothing
+        self._sum += float(deviations.sum() - overwritten.sum())
+        self._sum_of_squares += float(
+            np.dot(deviations, deviations) - np.dot(overwritten, overwritten)
+        )
+        self._out_of_band += int(
+            np.count_nonzero(deviations > self._band) - np.count_nonzero(overwritten > self._band)
+        )
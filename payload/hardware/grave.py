@@ -8,13 +8,40 @@ if platform.system() == 'Linux':
     # Servo Imports
     # Stepper Motor Imports
     import board  # type: ignore # Only imported when real hardware is used # noqa: PLC0415
+    import pigpio
     from digitalio import DigitalInOut, Direction  # type: ignore # noqa: PLC0415
-    from gpiozero import AngularServo, Device, OutputDevice
+    from gpiozero import AngularServo, Device
     from gpiozero.pins.pigpio import PiGPIOFactory
 
 from payload.base_classes.base_grave import BaseGrave
 from payload.data_handling.packets.grave_data_packet import GraveDataPacket
 
+# ==================================================
+# ------------------- CONSTANTS --------------------
+# ==================================================
+
+# Lead screw stepper (A4988, pigpio DMA waveforms)
+LEAD_SCREW_DIR_PIN = 27
+LEAD_SCREW_STEP_PIN = 17
+LEAD_SCREW_SLEEP_PIN = 22
+LEAD_SCREW_MM_PER_FULL_STEP = 0.01
+LEAD_SCREW_MICROSTEPS = 16
+
+LEAD_SCREW_START_STEP_RATE_HZ = 2_000       # microsteps/s the motor can start and stop at
+LEAD_SCREW_MAX_STEP_RATE_HZ = 25_000        # microsteps/s cruise (the old 20 us high / 20 us low)
+LEAD_SCREW_ACCELERATION_STEPS_PER_S2 = 50_000
+LEAD_SCREW_RAMP_SEGMENTS = 20               # constant-rate waves per acceleration ramp
+LEAD_SCREW_SETTLE_SECONDS = 1.0             # hold torque after a move before sleeping the driver
+
+# pigpio wave chains can only repeat a wave 65535 times per loop, and a chain is limited to 600
+# bytes, so a move is split into (wave, repeat count) segments.
+WAVE_CHAIN_MAX_LOOP_COUNT = 65_535
+WAVE_CHAIN_MAX_BYTES = 600
+
+# Deployment
+ZOMBIE_EJECT_DISTANCE_MM = 465
+LEAD_SCREW_RETRACT_DISTANCE_MM = 120
+
 
 class ServoDriver:
     """Driver for the latch servo."""
@@ -64,44 +91,271 @@ class ServoDriver:
             )
 
 
+def plan_trapezoidal_profile(
+    steps: int,
+    start_rate_hz: float = LEAD_SCREW_START_STEP_RATE_HZ,
+    max_rate_hz: float = LEAD_SCREW_MAX_STEP_RATE_HZ,
+    acceleration: float = LEAD_SCREW_ACCELERATION_STEPS_PER_S2,
+    ramp_segments: int = LEAD_SCREW_RAMP_SEGMENTS,
+) -> list[tuple[int, int]]:
+    """
+    Splits a move into constant-rate segments that approximate a trapezoidal velocity profile.
+
+    The acceleration ramp is divided into `ramp_segments` equal step counts, each played at the
+    rate the motor would have reached at the middle of that segment (v² = v0² + 2an). The cruise
+    segment runs at `max_rate_hz`, and the deceleration ramp mirrors the acceleration ramp. Short
+    moves that never reach `max_rate_hz` become a triangle profile.
+
+    :param steps: The exact number of microsteps to move.
+    :param start_rate_hz: The step rate the motor can start from without stalling.
+    :param max_rate_hz: The cruise step rate.
+    :param acceleration: The acceleration in steps/s².
+    :param ramp_segments: How many constant-rate segments to use for each ramp.
+    :return: A list of (period_us, step_count) tuples whose step counts sum to `steps`.
+    """
+    if steps <= 0:
+        return []
+
+    # Number of steps needed to go from the start rate to the cruise rate
+    ramp_steps = int((max_rate_hz**2 - start_rate_hz**2) / (2 * acceleration))
+    # If we can't reach cruise speed, accelerate for half the move and decelerate for the rest
+    ramp_steps = min(ramp_steps, steps // 2)
+    cruise_steps = steps - 2 * ramp_steps
+    cruise_rate_hz = min(max_rate_hz, (start_rate_hz**2 + 2 * acceleration * ramp_steps) ** 0.5)
+
+    ramp: list[tuple[int, int]] = []
+    ramp_segments = max(1, min(ramp_segments, ramp_steps))
+    steps_per_segment, remainder = divmod(ramp_steps, ramp_segments)
+    steps_taken = 0
+    for segment in range(ramp_segments):
+        segment_steps = steps_per_segment + (1 if segment < remainder else 0)
+        if segment_steps == 0:
+            continue
+        midpoint = steps_taken + segment_steps / 2
+        rate_hz = min(max_rate_hz, (start_rate_hz**2 + 2 * acceleration * midpoint) ** 0.5)
+        ramp.append((round(1_000_000 / rate_hz), segment_steps))
+        steps_taken += segment_steps
+
+    cruise = [(round(1_000_000 / cruise_rate_hz), cruise_steps)] if cruise_steps else []
+    return ramp + cruise + ramp[::-1]
+
+
 class LeadScrewDriver:
-    """Driver for the lead screw."""
+    """
+    Driver for the lead screw, stepped by an A4988 using pigpio DMA waveforms.
 
-    def __init__(self, dir_pin=27, step_pin=17, slp_pin=22):
+    Instead of toggling the STEP pin from Python, every move is turned into a pigpio wave chain:
+    one single-step wave per constant-rate segment of a trapezoidal profile, repeated with the
+    chain's loop command. pigpio's DMA engine then plays the chain with ~1 us timing accuracy, so
+    a move takes as long as the mechanism needs, and the step count is exact.
 
-        self.dir = OutputDevice(dir_pin)
+    A pigpio edge callback tallies the STEP pulses as they go out, which is used to report the
+    progress of the current move. The tally reaches us through pigpio's notification pipe, so it
+    can lag the pulses: a move that runs to the end counts as every step of it, and the tally only
+    decides the lead screw's position when a move is aborted.
+    """
 
-        self.step = OutputDevice(step_pin)
+    __slots__ = (
+        "_dir_pin",
+        "_is_move_complete",
+        "_is_stop_requested",
+        "_move_direction",
+        "_move_steps",
+        "_pi",
+        "_slp_pin",
+        "_step_counter",
+        "_step_pin",
+        "position_steps",
+    )
 
-        self.slp = OutputDevice(slp_pin, initial_value=False)  # Start in sleep mode — LOW = sleeping on A4988 CHECK THIS WITH GRAVE
+    def __init__(
+        self,
+        pi: pigpio.pi | None = None,
+        dir_pin=LEAD_SCREW_DIR_PIN,
+        step_pin=LEAD_SCREW_STEP_PIN,
+        slp_pin=LEAD_SCREW_SLEEP_PIN,
+    ):
+        self._pi = pi if pi is not None else pigpio.pi()
+        if not self._pi.connected:
+            raise RuntimeError("Could not connect to pigpio daemon. Run: sudo pigpiod")
+
+        self._dir_pin = dir_pin
+        self._step_pin = step_pin
+        self._slp_pin = slp_pin
+        for pin in (dir_pin, step_pin, slp_pin):
+            self._pi.set_mode(pin, pigpio.OUTPUT)
+        self._pi.write(step_pin, 0)
+        # Start in sleep mode — LOW = sleeping on A4988 CHECK THIS WITH GRAVE
+        self._pi.write(slp_pin, 0)
+
+        # Counts the rising edges on the STEP pin. No function means pigpio just tallies them.
+        self._step_counter = self._pi.callback(step_pin, pigpio.RISING_EDGE)
+
+        self.position_steps: int = 0
+        """The position of the lead screw in microsteps, relative to where it was at startup."""
+        self._move_steps: int = 0
+        self._move_direction: int = 1
+        self._is_move_complete = False
+        self._is_stop_requested = False
+
+    @property
+    def steps_completed(self) -> int:
+        """
+        The number of steps of the current (or last) move that have been sent to the driver.
+        """
+        if self._is_move_complete:
+            return self._move_steps
+        return min(self._step_counter.tally(), self._move_steps)
+
+    @property
+    def progress(self) -> float:
+        """
+        How far along the current (or last) move is, from 0.0 to 1.0.
+        """
+        if self._move_steps == 0:
+            return 1.0
+        return self.steps_completed / self._move_steps
+
+    @property
+    def position_mm(self) -> float:
+        """
+        The position of the lead screw in mm, including the steps of a move in progress.
+        """
+        steps = self.position_steps
+        if self.is_moving:
+            steps += self._move_direction * self.steps_completed
+        return steps / LEAD_SCREW_MICROSTEPS * LEAD_SCREW_MM_PER_FULL_STEP
+
+    @property
+    def is_moving(self) -> bool:
+        """
+        Whether a wave chain is currently being played.
+        """
+        return bool(self._pi.wave_tx_busy())
 
     def wake(self):
-        self.slp.on()
+        self._pi.write(self._slp_pin, 1)
         time.sleep(0.001)  # A4988 needs ~1ms to wake before stepping
 
     def sleep(self):
-        self.slp.off()
+        self._pi.write(self._slp_pin, 0)
 
     def move(self, distance_mm, direction="extend"):
-        STEPS = int(distance_mm / 0.01)
-        microMode = 16
-        steps = STEPS * microMode
-        if direction == "retract":
-            self.dir.on()
-        else:
-            self.dir.off()
+        """
+        Moves the lead screw by `distance_mm` and blocks until the move has finished.
+
+        :param distance_mm: How far to move the lead screw, in mm.
+        :param direction: "retract" to pull the lead screw in, anything else extends it.
+        """
+        steps = int(distance_mm / LEAD_SCREW_MM_PER_FULL_STEP) * LEAD_SCREW_MICROSTEPS
+        self._move_direction = -1 if direction == "retract" else 1
+        self._pi.write(self._dir_pin, 1 if direction == "retract" else 0)
 
         self.wake()  # Wake before stepping
 
-        for _ in range(steps):
-            self.step.on()
-            time.sleep(0.00002)
-            self.step.off()
-            time.sleep(0.00002)
+        wave_ids = self._create_waves(plan_trapezoidal_profile(steps))
+        try:
+            self._move_steps = steps
+            self._is_move_complete = False
+            self._is_stop_requested = False
+            self._step_counter.reset_tally()
+            self._pi.wave_chain(self._build_chain(wave_ids))
+            while self._pi.wave_tx_busy():
+                time.sleep(0.01)
+            # The chain played to the end, so every step went out even if the tally lags
+            self._is_move_complete = not self._is_stop_requested
+        finally:
+            for wave_id in {wave_id for wave_id, _ in wave_ids}:
+                self._pi.wave_delete(wave_id)
+            self.position_steps += self._move_direction * self.steps_completed
 
-        time.sleep(1)
+        time.sleep(LEAD_SCREW_SETTLE_SECONDS)
         self.sleep()  # Return to sleep after move completes
 
+    def stop(self):
+        """
+        Aborts the move in progress and puts the driver to sleep.
+        """
+        # Before the chain stops, so the move sees it as soon as the chain isn't busy
+        self._is_stop_requested = True
+        self._pi.wave_tx_stop()
+        self.sleep()
+
+    def _create_waves(self, segments: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """
+        Creates one single-step pigpio wave per segment rate.
+
+        Segments that share a rate (the mirrored halves of the ramps) share a wave.
+
+        :param segments: The (period_us, step_count) segments of the move.
+        :return: A list of (wave_id, step_count) tuples, in the order they should be played.
+        """
+        self._pi.wave_clear()
+        step_mask = 1 << self._step_pin
+        waves_by_period: dict[int, int] = {}
+        wave_ids: list[tuple[int, int]] = []
+        for period_us, step_count in segments:
+            if period_us not in waves_by_period:
+                high_us = period_us // 2
+                self._pi.wave_add_generic(
+                    [
+                        pigpio.pulse(step_mask, 0, high_us),
+                        pigpio.pulse(0, step_mask, period_us - high_us),
+                    ]
+                )
+                waves_by_period[period_us] = self._pi.wave_create()
+            wave_ids.append((waves_by_period[period_us], step_count))
+        return wave_ids
+
+    @staticmethod
+    def _build_chain(wave_ids: list[tuple[int, int]]) -> list[int]:
+        """
+        Builds the wave chain that plays every wave its exact number of times.
+
+        Every wave is played in loops of up to WAVE_CHAIN_MAX_LOOP_COUNT steps. If that makes the
+        chain longer than pigpio allows (a longer travel, or finer microstepping), the full loops of
+        every wave are nested in an outer loop instead, which takes the same few bytes however many
+        steps the wave has.
+
+        :param wave_ids: The (wave_id, step_count) tuples to play.
+        :return: The chain to pass to pigpio's wave_chain.
+        :raises ValueError: If the move can't fit in a chain even with nested loops.
+        """
+        chain = LeadScrewDriver._chain_loops(wave_ids, nest_full_loops=False)
+        if len(chain) > WAVE_CHAIN_MAX_BYTES:
+            chain = LeadScrewDriver._chain_loops(wave_ids, nest_full_loops=True)
+        if len(chain) > WAVE_CHAIN_MAX_BYTES:
+            raise ValueError(
+                f"The move needs a wave chain of {len(chain)} bytes, but pigpio only takes "
+                f"{WAVE_CHAIN_MAX_BYTES}. Use fewer ramp segments."
+            )
+        return chain
+
+    @staticmethod
+    def _chain_loops(wave_ids: list[tuple[int, int]], nest_full_loops: bool) -> list[int]:
+        """
+        Builds the loops of a wave chain.
+
+        :param wave_ids: The (wave_id, step_count) tuples to play.
+        :param nest_full_loops: Whether to play the full loops of a wave in an outer loop, instead
+            of one after the other.
+        :return: The chain to pass to pigpio's wave_chain.
+        """
+        chain: list[int] = []
+        for wave_id, step_count in wave_ids:
+            full_loops, remainder = divmod(step_count, WAVE_CHAIN_MAX_LOOP_COUNT)
+            # Loop start, wave, loop repeat `repeats` times (little-endian 16 bit count)
+            full_loop = [255, 0, wave_id, 255, 1, *WAVE_CHAIN_MAX_LOOP_COUNT.to_bytes(2, "little")]
+            if nest_full_loops and full_loops > 1:
+                if full_loops > WAVE_CHAIN_MAX_LOOP_COUNT:
+                    raise ValueError(f"A move of {step_count} steps is too long for a wave chain.")
+                chain += [255, 0, *full_loop, 255, 1, *full_loops.to_bytes(2, "little")]
+            else:
+                chain += full_loop * full_loops
+            if remainder:
+                chain += [255, 0, wave_id, 255, 1, *remainder.to_bytes(2, "little")]
+        return chain
+
 
 # =========================
 # Grave High-Level Controller
@@ -113,13 +367,21 @@ class Grave(BaseGrave):
     High-level controller for the Grave deployment system.
     """
 
-    __slots__ = ("deployed", "ejecting_zombie", "latch_state", "lead_screw", "servo")
+    __slots__ = (
+        "_eject_complete",
+        "deployed",
+        "ejecting_zombie",
+        "latch_state",
+        "lead_screw",
+        "servo",
+    )
 
     def __init__(self):
         self.lead_screw = LeadScrewDriver()
         self.deployed = False
         self.latch_state = False
         self.ejecting_zombie = False
+        self._eject_complete = False
 
     # TODO: use these when giving grave its own thread
     def start(self):
@@ -131,7 +393,7 @@ class Grave(BaseGrave):
             self.deployed = True
 
     def stop(self):
-        pass
+        self.lead_screw.stop()
 
     def deploy_zombie(self):
         self.servo = ServoDriver()
@@ -139,9 +401,22 @@ class Grave(BaseGrave):
         self.latch_state = True
         time.sleep(5)
         self.ejecting_zombie = True
-        self.lead_screw.move(465, direction="deploy")  # mm
+        self.lead_screw.move(ZOMBIE_EJECT_DISTANCE_MM, direction="deploy")
+        self._eject_complete = True
         time.sleep(5)
-        self.lead_screw.move(120, direction="retract")  # mm
+        self.lead_screw.move(LEAD_SCREW_RETRACT_DISTANCE_MM, direction="retract")
+
+    @property
+    def deploy_progress(self) -> float:
+        """
+        How far along the deployment is. Zombie is out once the lead screw has fully extended, so
+        the retract afterward doesn't count towards the progress.
+        """
+        if self._eject_complete:
+            return 1.0
+        if not self.ejecting_zombie:
+            return 0.0
+        return self.lead_screw.progress
 
     def get_data_packet(self):
         return GraveDataPacket(ejecting_zombie=self.ejecting_zombie, latch=self.latch_state)
@@ -302,6 +302,7 @@ class Zombie(BaseZombie):
             electrical_conductivity=self.ec,
             activating_legs=self.activating_legs,
             checking_orientation=self.checking_orientation,
+            motor_current_a=self.current_a,
         )
 
     # --------------------------------------------------
@@ -4,13 +4,22 @@ The main file which will be run on the Raspberry Pi.
 It will create the Context object and run the main loop.
 """
 
-from payload.constants import LOGS_PATH
+from payload.clock import FIRMClock, MonotonicClock
+from payload.constants import (
+    GRAVE_DEPLOY_LENGTH_SECONDS,
+    LAUNCH_STATE_MAX_LENGTH_SECONDS,
+    LOGS_PATH,
+    TOTAL_OPERATION_TIME,
+)
 from payload.context import Context
+from payload.data_handling.durability import DurabilityPolicy
 from payload.data_handling.logger import Logger
 from payload.hardware.firm import FIRM
 from payload.mock.display import FlightDisplay
 from payload.mock.mock_firm import MockFIRM
 from payload.mock.mock_logger import MockLogger
+from payload.mock.replay_seek import seed_state
+from payload.mock.synthetic_firm import SyntheticFIRM
 from payload.utils import arg_parser
 import time
 
@@ -23,7 +32,22 @@ def create_firm_from_args(args):
     if args.mode == "mock":
         return MockFIRM(
             real_time_replay=not args.fast_replay,
+            replay_speed=args.replay_speed or 1.0,
+            start_row=args.start_row,
+            start_timestamp_seconds=args.start_timestamp_seconds,
+            start_phase=args.start_phase,
             log_file_path=args.path,
+            # Keep the replay going long enough for every timer after landing to run out
+            hold_last_packet_seconds=(
+                LAUNCH_STATE_MAX_LENGTH_SECONDS + GRAVE_DEPLOY_LENGTH_SECONDS + TOTAL_OPERATION_TIME
+            ),
+        )
+
+    if args.mode == "synthetic":
+        return SyntheticFIRM(
+            sample_rate_hz=args.synthetic,
+            real_time=not args.fast_replay,
+            replay_speed=args.replay_speed or 1.0,
         )
 
     if args.mode == "pretend":
@@ -41,7 +65,7 @@ def create_grave_from_args(args):
         from payload.hardware.grave import Grave # noqa: PLC0415
         return Grave()
 
-    elif args.mode in {"mock", "pretend"}:
+    elif args.mode in {"mock", "pretend", "synthetic"}:
         from payload.mock.mock_grave import MockGrave  # noqa: PLC0415
         return MockGrave()
 
@@ -52,19 +76,49 @@ def create_zombie_from_args(args):
         from payload.hardware.zombie import Zombie # noqa: PLC0415
         return Zombie()
 
-    elif args.mode in {"mock", "pretend"}:
+    elif args.mode in {"mock", "pretend", "synthetic"}:
         from payload.mock.mock_zombie import MockZombie  # noqa: PLC0415
         return MockZombie()
     raise ValueError(f"Unknown mode: {args.mode}")
 
 
+def create_clock_from_args(args):
+    """
+    Create the clock the state machine runs on. Replays run on the time of the FIRM data, so
+    a fast replay goes through every timer as fast as the data is read.
+    """
+    if args.mode in {"mock", "pretend", "synthetic"}:
+        return FIRMClock()
+    return MonotonicClock()
+
+
 def create_components(args):
     """Creates the system components needed for the payload system."""
     firm = create_firm_from_args(args)
-    if args.mode in ("mock", "pretend"):
-        logger = MockLogger(LOGS_PATH, delete_log_file=not args.keep_log_file)
+    log_format = "binary" if args.binary_log else "csv"
+    durability_policy = DurabilityPolicy(strategy=args.sync_strategy)
+    segment_size_bytes = args.segment_size * 1024 * 1024 if args.segment_size else None
+    if args.mode in ("mock", "pretend", "synthetic"):
+        logger = MockLogger(
+            LOGS_PATH,
+            delete_log_file=not args.keep_log_file,
+            log_format=log_format,
+            durability_policy=durability_policy,
+            segment_size_bytes=segment_size_bytes,
+            compression=args.compress,
+            backend="process" if args.logger_process else "thread",
+            log_profile=args.log_profile,
+        )
     else:
-        logger = Logger(LOGS_PATH)
+        logger = Logger(
+            LOGS_PATH,
+            log_format=log_format,
+            durability_policy=durability_policy,
+            segment_size_bytes=segment_size_bytes,
+            compression=args.compress,
+            backend="process" if args.logger_process else "thread",
+            log_profile=args.log_profile,
+        )
     return firm, logger
 
 
@@ -78,12 +132,16 @@ def run_payload(*, use_grave: bool, use_zombie: bool):
         zombie=zombie,
         firm=firm,
         logger=logger,
+        clock=create_clock_from_args(args),
     )
+    # A replay that starts partway into the flight starts in the state it would be in by then
+    if isinstance(firm, MockFIRM) and firm.replay_start is not None:
+        seed_state(context, firm.replay_start)
     flight_display = FlightDisplay(context, args)
     #flight_display = None
 
     # Run main flight loop
-    run_flight_loop(context, flight_display)
+    run_flight_loop(context, flight_display, is_replay=args.mode in {"mock", "synthetic"})
 
 
 def run_grave():
@@ -97,14 +155,27 @@ def run_zombie():
 
 
 def run_flight_loop(context: Context,
-                    flight_display: FlightDisplay
+                    flight_display: FlightDisplay,
+                    is_replay: bool = False,
                     ):
-    """Runs the main loop for the code."""
+    """
+    Runs the main loop for the code.
+
+    :param is_replay: Whether this is a mock replay, which ends by itself once the mission is
+        complete or there is no data left to replay.
+    """
     try:
         context.start()
         flight_display.start()
         while True:
             context.update()
+            if is_replay and (
+                context.is_mission_complete
+                or not (context.firm.is_running or context.firm_data_packets)
+            ):
+                flight_display.end_mock_natural.set()
+                flight_display.stop()
+                break
     except KeyboardInterrupt:
         pass
     finally:
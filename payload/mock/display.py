@@ -74,7 +74,7 @@ class FlightDisplay:
             self._launch_file = "N/A"
 
         # The string to show at the top of the display:
-        self._display_header = f"{Y}{'=' * 15} {'REPLAY' if self._args.mode == 'mock' else 'REAL TIME'} INFO {'=' * 15}{RESET}"  # noqa: E501
+        self._display_header = f"{Y}{'=' * 15} {'REPLAY' if self._args.mode in {'mock', 'synthetic'} else 'REAL TIME'} INFO {'=' * 15}{RESET}"  # noqa: E501
 
     def start(self) -> None:
         """
@@ -168,10 +168,9 @@ class FlightDisplay:
 
 
         time_since_launch = (
-            (self._context.context_data_packet.update_timestamp_ns / 1_000_000_000)
-            - (self._context.launch_time_seconds
+            self._context.clock.now() - self._context.launch_time_seconds
             if self._context.launch_time_seconds
-            else 0)
+            else 0
         )
 
 
@@ -188,6 +187,7 @@ class FlightDisplay:
             f"Altitude:                  {G}{self._context.most_recent_firm_data_packet.est_position_z_meters:<10.3f}{RESET} {R}m{RESET}", # noqa: E501
             f"Total Acceleration:        {G}{self._context.total_acceleration:<10.3f}{RESET} {R}G{RESET}", # noqa: E501
             f"Max Acceleration so far:   {G}{self._context.max_acceleration:<10.3}{RESET} {R}G{RESET}", # noqa: E501
+            f"Log queue:                 {G}{self._context.logger.queue_depth_rows:<10}{RESET} {R}rows{RESET} ({self._context.logger.dropped_rows} dropped)",  # noqa: E501
         ]
 
 
@@ -196,8 +196,11 @@ class FlightDisplay:
                 [
                     f"Latch Status:              {G}{self._context.grave_data_packet.latch!s:<10}{RESET}",
                     f"Ejection Status:           {G}{self._context.grave_data_packet.ejecting_zombie!s:<10}{RESET}",
+                    f"Deploy Progress:           {G}{self._context.deploy_progress:<10.1%}{RESET}",
                 ]
             )
+            if self._context.deploy_error is not None:
+                output.append(f"{R}Deploy failed: {self._context.deploy_error!r}{RESET}")
 
         if self._context.zombie is not None:
             output.extend(
@@ -1,16 +1,54 @@
 """Module for simulating the FIRM hardware by reading from a log file."""
 
+import contextlib
+import itertools
 import queue
 import threading
 import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import msgspec
+import numpy as np
 import polars as pl
 from firm_client import FIRMDataPacket
 
 from payload.base_classes.base_firm import BaseFIRM
-from payload.constants import SERIAL_TIMEOUT_SECONDS, STOP_SIGNAL
+from payload.constants import (
+    MOCK_FAST_REPLAY_CHUNK_PACKETS,
+    MOCK_FAST_REPLAY_HOLD_SPEEDUP,
+    MOCK_HOLD_PACKET_PERIOD_SECONDS,
+    MOCK_QUEUE_MAX_PACKETS,
+    MOCK_READ_BATCH_ROWS,
+    MOCK_READ_POLL_SECONDS,
+    MOCK_READ_PREFETCH_BATCHES,
+    SERIAL_TIMEOUT_SECONDS,
+)
+from payload.data_handling.batch_queue import BatchQueue
+from payload.mock.replay_cache import find_replay_cache, write_replay_cache
+from payload.mock.replay_pacer import ReplayPacer
+from payload.mock.replay_seek import find_replay_start
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from payload.constants import FlightPhase
+    from payload.mock.replay_seek import ReplayStart
+
+FIRM_COMPUTED_FIELDS = frozenset(
+    {
+        "est_tilt_angle_degrees",
+        "est_mach_number",
+        "raw_rotated_acceleration_x_gs",
+        "raw_rotated_acceleration_y_gs",
+        "raw_rotated_acceleration_z_gs",
+    }
+)
+"""The fields of a FIRMDataPacket that it computes itself, so they aren't read from the file."""
+
+FIRM_CONSTRUCTOR_FIELDS = [
+    field for field in FIRMDataPacket.__struct_fields__ if field not in FIRM_COMPUTED_FIELDS
+]
+"""The arguments of the FIRMDataPacket constructor, in order."""
 
 
 class MockFIRM(BaseFIRM):
@@ -18,17 +56,34 @@ class MockFIRM(BaseFIRM):
     A mock implementation of FIRM for testing/simulation purposes.
 
     It reads a CSV log file and feeds FIRMDataPackets into the queue as
-    if they were coming from the hardware.
+    if they were coming from the hardware. The file is streamed in batches of
+    MOCK_READ_BATCH_ROWS rows, which a reader thread parses while the packets of
+    the previous batch are sent.
+
+    A real time replay is paced by the timestamps of the rows, so the packets come at the rate
+    they were recorded at (or a multiple of it), see ReplayPacer.
+
+    The parsed file is cached next to it, so only the first replay of a flight parses the CSV,
+    see payload.mock.replay_cache. The first replay writes the cache in the background while it
+    reads the CSV as usual.
+
+    A replay can start partway into the flight, at a row, a timestamp or a flight phase, see
+    payload.mock.replay_seek.
     """
 
     __slots__ = (
         "_data_fetch_thread",
         "_headers",
+        "_hold_last_packet_seconds",
         "_is_running",
         "_log_file_path",
         "_needed_fields",
         "_queued_packets",
+        "_replay_cache_thread",
+        "_replay_speed",
         "_requested_to_run",
+        "_use_replay_cache",
+        "replay_start",
     )
 
     def __init__(
@@ -36,6 +91,13 @@ class MockFIRM(BaseFIRM):
         real_time_replay: bool = False,
         log_file_path: Path | None = None,
         start_after_log_buffer: bool = True,
+        hold_last_packet_seconds: float = 0.0,
+        *,
+        replay_speed: float = 1.0,
+        use_replay_cache: bool = True,
+        start_row: int | None = None,
+        start_timestamp_seconds: float | None = None,
+        start_phase: FlightPhase | None = None,
     ):
         """
         Initializes the MockFIRM.
@@ -46,7 +108,21 @@ class MockFIRM(BaseFIRM):
         :param log_file_path: Optional path to a specific CSV log file.
         :param start_after_log_buffer: Whether to send the data packets only after the log buffer
             was filled for Standby state.
+        :param hold_last_packet_seconds: How long to keep sending the last row of the file (with
+            increasing timestamps) after the file ends. Recordings stop shortly after landing, so
+            this is what lets the post-landing timers of a replay run out.
+        :param replay_speed: How many times faster than it was recorded a real time replay runs.
+        :param use_replay_cache: Whether to read the file from its replay cache, and write the
+            cache if it doesn't have a valid one.
+        :param start_row: Start the replay at the row with this index.
+        :param start_timestamp_seconds: Start the replay at the first row at or after this FIRM
+            timestamp.
+        :param start_phase: Start the replay MOCK_SEEK_LEAD_SECONDS before this flight phase.
         """
+        self._hold_last_packet_seconds = hold_last_packet_seconds
+        self._replay_speed = replay_speed
+        self._use_replay_cache = use_replay_cache
+        self._replay_cache_thread: threading.Thread | None = None
         # 1. Resolve Log File Path
         self._log_file_path = log_file_path
         if self._log_file_path is None:
@@ -63,8 +139,19 @@ class MockFIRM(BaseFIRM):
 
         self._log_file_path = self._log_file_path
 
+        # 2. Pre-scan the file for where to start, if the replay doesn't start at the beginning
+        self.replay_start: ReplayStart | None = None
+        """Where the replay starts, if it starts partway into the flight."""
+        if start_row is not None or start_timestamp_seconds is not None or start_phase is not None:
+            self.replay_start = find_replay_start(
+                self._scan_replay_file(),
+                row=start_row,
+                timestamp_seconds=start_timestamp_seconds,
+                phase=start_phase,
+            )
+
         # Set up a queue and thread
-        self._queued_packets: queue.SimpleQueue[FIRMDataPacket | str] = queue.SimpleQueue()
+        self._queued_packets: BatchQueue[FIRMDataPacket] = BatchQueue(MOCK_QUEUE_MAX_PACKETS)
         self._data_fetch_thread = threading.Thread(
             target=self._fetch_data_loop,
             args=(real_time_replay, start_after_log_buffer),
@@ -101,53 +188,76 @@ class MockFIRM(BaseFIRM):
     def stop(self) -> None:
         """Stops the Mock FIRM thread."""
         self._requested_to_run.clear()
-        # Fetch all packets which are not yet fetched and discard them, so main() does not get
-        # stuck (i.e. deadlocks) waiting for the thread to finish.
-        self._queued_packets.put(STOP_SIGNAL)  # signal the main thread to stop waiting
+        # Stop the queue, so main() does not get stuck (i.e. deadlocks) waiting for packets that
+        # will never come.
+        self._queued_packets.stop()
 
         self._data_fetch_thread.join(timeout=SERIAL_TIMEOUT_SECONDS)
         if self._data_fetch_thread.is_alive():
             raise RuntimeError("FIRM data fetch thread did not terminate in time.")
 
     def get_data_packets(self, block: bool = True) -> list[FIRMDataPacket]:
-        """Returns all available FIRM data packets from the queue."""
-        packets = []
-
-        if block:
-            # Block until at least one item is available
-            item = self._queued_packets.get(block=True)
-            if item == STOP_SIGNAL:
-                return packets  # Makes the main update() loop exit early.
-            packets.append(item)
-
-        while not self._queued_packets.empty():
-            item = self._queued_packets.get(block=block)
-
-            # If we hit the stop signal, ensure we mark ourselves as stopped
-            if item == STOP_SIGNAL:
-                break  # Makes the main update() loop exit early.
-
-            packets.append(item)
+        """
+        Returns all available FIRM data packets from the queue, at once.
 
+        Once the replay is stopped and every packet was returned, this returns an empty list right
+        away, which makes the main update() loop exit early.
+        """
+        packets, _ = self._queued_packets.get_all(block=block)
         return packets
 
     # ------------------------ THREAD METHODS -------------------------
 
+    def _open_csv(self, **kwargs) -> pl.LazyFrame:
+        """Prepares the Polars LazyFrame with every column of the CSV."""
+        return pl.scan_csv(self._log_file_path, has_header=True, infer_schema_length=100, **kwargs)
+
     def _scan_csv(self, *, start_index: int = 0, **kwargs) -> pl.LazyFrame:
         """Prepares the Polars LazyFrame with only the columns we need."""
-        # 1. Get all headers present in the CSV
-        excluded_columns = [
-            "est_tilt_angle_degrees",
-            "est_mach_number",
-            "raw_rotated_acceleration_x_gs",
-            "raw_rotated_acceleration_y_gs",
-            "raw_rotated_acceleration_z_gs",
-        ]
-        self._headers = [
-            h
-            for h in pl.scan_csv(self._log_file_path).collect_schema().names()
-            if h not in excluded_columns
-        ]
+        return self._select_needed_fields(
+            self._open_csv(skip_rows_after_header=start_index, **kwargs)
+        )
+
+    def _scan_replay_file(self) -> pl.LazyFrame:
+        """
+        Prepares the Polars LazyFrame with only the columns we need, from the replay cache of the
+        file if it has one. Otherwise the CSV is read as usual, and the cache is written for the
+        next replays in the background.
+        """
+        if not self._use_replay_cache:
+            return self._scan_csv()
+        try:
+            cache_path = find_replay_cache(self._log_file_path)
+            if cache_path is not None:
+                return self._select_needed_fields(pl.scan_ipc(cache_path))
+        except OSError, pl.exceptions.PolarsError:
+            # The cache can't be read, so write it again
+            pass
+        if self._replay_cache_thread is None:
+            self._replay_cache_thread = threading.Thread(
+                target=self._write_replay_cache, name="Mock FIRM Replay Cache Thread"
+            )
+            self._replay_cache_thread.start()
+        return self._scan_csv()
+
+    def _write_replay_cache(self) -> None:
+        """
+        Parses the whole file into its replay cache. Runs in its own thread, which isn't a daemon so
+        the cache is finished even if the replay isn't. The cache is skipped if it can't be written
+        (e.g. the directory is read only).
+        """
+        with contextlib.suppress(OSError, pl.exceptions.PolarsError):
+            write_replay_cache(self._log_file_path, self._open_csv())
+
+    def _select_needed_fields(self, scan: pl.LazyFrame) -> pl.LazyFrame:
+        """
+        Selects the columns of the file that are fields of the FIRMDataPacket.
+
+        :param scan: Every column of the file.
+        :return: The needed columns, in the order of the fields.
+        """
+        # 1. Get all headers present in the file, from the same scan that reads the rows
+        self._headers = [h for h in scan.collect_schema().names() if h not in FIRM_COMPUTED_FIELDS]
 
         # 2. Get all fields defined in the FIRMDataPacket struct
         packet_fields = list(FIRMDataPacket.__struct_fields__)
@@ -155,51 +265,197 @@ class MockFIRM(BaseFIRM):
         # 3. Intersection: Only read columns that exist in both the CSV and the Packet
         self._needed_fields = [f for f in packet_fields if f in self._headers]
 
-        return pl.scan_csv(
-            self._log_file_path,
-            has_header=True,
-            skip_rows_after_header=start_index,
-            infer_schema_length=100,
-            **kwargs,
-        ).select(self._needed_fields)
+        return scan.select(self._needed_fields)
+
+    def _read_batches(self, batches: queue.Queue[pl.DataFrame | BaseException | None]) -> None:
+        """
+        Parses the file in batches, and hands them to the Mock FIRM thread. Runs in the reader
+        thread, and stops early if the Mock FIRM is stopped.
+
+        :param batches: The queue of parsed batches. None marks the end of the file, and an
+            exception that the parsing failed.
+        """
+        try:
+            scan = self._scan_replay_file()
+            if self.replay_start is not None:
+                scan = scan.slice(self.replay_start.row)
+            for batch in scan.collect_batches(chunk_size=MOCK_READ_BATCH_ROWS):
+                if not self._put_when_room(batches, batch):
+                    return
+        except Exception as e:
+            self._put_when_room(batches, e)
+            return
+        self._put_when_room(batches, None)
+
+    def _put_when_room(
+        self,
+        batches: queue.Queue[pl.DataFrame | BaseException | None],
+        item: pl.DataFrame | BaseException | None,
+    ) -> bool:
+        """
+        Waits for room in the queue of parsed batches, so at most MOCK_READ_PREFETCH_BATCHES are in
+        memory, and puts the item in it.
+
+        :param batches: The queue of parsed batches.
+        :param item: The batch, the exception or the end of the file.
+        :return: False if the Mock FIRM was stopped before there was room, since nothing takes
+            items from the queue after that.
+        """
+        while self._requested_to_run.is_set():
+            try:
+                batches.put(item, timeout=SERIAL_TIMEOUT_SECONDS)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def _iter_batches(self) -> Iterator[pl.DataFrame]:
+        """
+        Returns the batches of the file as they are parsed by a reader thread, so the next batch
+        is parsed while the packets of this one are sent.
+
+        :return: An iterator over the batches, in order. It ends early if the Mock FIRM is stopped,
+            since the reader thread stops without marking the end of the file then.
+        """
+        batches: queue.Queue[pl.DataFrame | BaseException | None] = queue.Queue(
+            maxsize=MOCK_READ_PREFETCH_BATCHES
+        )
+        threading.Thread(
+            target=self._read_batches, args=(batches,), name="Mock FIRM Reader Thread", daemon=True
+        ).start()
+        while True:
+            try:
+                batch = batches.get(timeout=MOCK_READ_POLL_SECONDS)
+            except queue.Empty:
+                if not self._requested_to_run.is_set():
+                    return
+                continue
+            if batch is None:
+                return
+            if isinstance(batch, BaseException):
+                raise batch
+            yield batch
+
+    def _build_packets(self, batch: pl.DataFrame) -> Iterator[FIRMDataPacket]:
+        """
+        Converts a batch of rows to FIRMDataPackets.
+
+        When the file has every argument of the constructor, the rows are passed to it as they are,
+        which is several times faster than building a dict of keyword arguments for every row. Only
+        the rows with a missing value, found column-wise by Polars, still go through a dict, so
+        FIRMDataPacket can use its defaults for them.
+
+        :param batch: The rows, with the columns in `_needed_fields`.
+        :return: The packets, in order, built as they are iterated so the first ones can be sent
+            before the whole batch is converted.
+        """
+        if self._needed_fields != FIRM_CONSTRUCTOR_FIELDS:
+            return map(self._row_to_packet, batch.iter_rows())
+        if not batch.null_count().sum_horizontal().item():
+            return itertools.starmap(FIRMDataPacket, batch.iter_rows())
+        has_nulls = batch.select(pl.any_horizontal(pl.all().is_null())).to_series()
+        return (
+            self._row_to_packet(row) if row_has_nulls else FIRMDataPacket(*row)
+            for row, row_has_nulls in zip(batch.iter_rows(), has_nulls, strict=True)
+        )
+
+    def _row_to_packet(self, row: tuple) -> FIRMDataPacket:
+        """
+        Converts a row to a FIRMDataPacket by keyword, leaving out the missing values.
 
+        :param row: The values of the row, in the order of `_needed_fields`.
+        :return: The packet.
+        """
+        return FIRMDataPacket(
+            **{
+                field: value
+                for field, value in zip(self._needed_fields, row, strict=True)
+                if value is not None
+            }
+        )
 
     def _read_file(self, real_time_replay: bool, start_after_log_buffer: bool = False) -> None:
         """
         Reads the CSV, converts rows to FIRMDataPackets, and manages replay
         timing.
 
-        :param real_time_replay: Whether to mimic a real flight by sleeping for a set period, or run
-            at full speed, e.g. for using it in the CI.
+        :param real_time_replay: Whether to mimic a real flight by sending every packet when it is
+            due, or run at full speed, e.g. for using it in the CI.
         :param start_after_log_buffer: Whether to send the data packets only after the log buffer
             was filled for Standby state.
         """
-        collected_data: pl.DataFrame = self._scan_csv().collect()
+        last_row: dict | None = None
+        pacer = ReplayPacer(self._replay_speed)
 
-        # Iterate over the rows of the dataframe and put the data packets in the queue
-        for row in collected_data.iter_rows(named=True):
+        # Convert every batch at once and put its data packets in the queue
+        for batch in self._iter_batches():
             # Check if the loop should stop:
             if not self._requested_to_run.is_set():
-                break
-
-            start_time = time.time()
+                return
+
+            packets = self._build_packets(batch)
+            if not real_time_replay:
+                for chunk in itertools.batched(
+                    packets, MOCK_FAST_REPLAY_CHUNK_PACKETS, strict=False
+                ):
+                    self._queued_packets.put_batch(chunk)
+            elif not self._send_when_due(packets, batch, pacer):
+                return
+
+            if batch.height:
+                last_row = batch.row(-1, named=True)
+
+        if last_row is not None and self._hold_last_packet_seconds > 0:
+            self._hold_last_packet(last_row, real_time_replay, pacer)
+
+    def _send_when_due(
+        self, packets: Iterator[FIRMDataPacket], batch: pl.DataFrame, pacer: ReplayPacer
+    ) -> bool:
+        """
+        Sends the packets of a batch as they become due, every packet that is due at once.
 
-            # Drop None values from the row so msgspec Structs can be made:
-            # This approach of deleting is faster than using a dict comprehension by about 6%
-            row_dict = row.copy()
-            for k in list(row_dict.keys()):
-                if row_dict[k] is None:
-                    del row_dict[k]
+        :param packets: The packets of the batch.
+        :param batch: The rows of the batch, for their timestamps.
+        :param pacer: The pacer of the replay.
+        :return: False if the Mock FIRM was stopped before every packet was sent.
+        """
+        # A timestamp that goes back in time makes the packet due right away, so the timestamps
+        # can be searched
+        timestamps = np.maximum.accumulate(
+            batch.get_column("timestamp_seconds")
+            .fill_null(strategy="forward")
+            .fill_null(strategy="backward")
+            .to_numpy()
+        )
+        return pacer.send_when_due(
+            packets, timestamps, self._queued_packets, self._requested_to_run
+        )
 
-            firm_data_packet = FIRMDataPacket(**row_dict)
+    def _hold_last_packet(self, last_row: dict, real_time_replay: bool, pacer: ReplayPacer) -> None:
+        """
+        Keeps sending copies of the last row of the file, as if the rocket was sitting still on
+        the ground, until `hold_last_packet_seconds` have passed in FIRM time.
 
-            self._queued_packets.put(firm_data_packet)
+        The copies are sent every MOCK_HOLD_PACKET_PERIOD_SECONDS rather than at the recorded
+        rate, since nothing is happening and we only need the FIRM time to keep moving. A real time
+        replay sends each of them when it is due, and a fast replay sends them
+        MOCK_FAST_REPLAY_HOLD_SPEEDUP times faster than real time.
 
-            # Sleep only if we are running a real-time replay
+        :param last_row: The last row of the file.
+        :param real_time_replay: Whether to wait between packets like a real time replay.
+        :param pacer: The pacer of the replay, which was started by the rows of the file.
+        """
+        row_dict = {key: value for key, value in last_row.items() if value is not None}
+        end_timestamp = row_dict["timestamp_seconds"] + self._hold_last_packet_seconds
+        timestamp = row_dict["timestamp_seconds"]
+        while timestamp < end_timestamp and self._requested_to_run.is_set():
+            timestamp += MOCK_HOLD_PACKET_PERIOD_SECONDS
+            row_dict["timestamp_seconds"] = timestamp
             if real_time_replay:
-                # Mimic the polling interval so it "runs in real time"
-                end_time = time.time()
-                time.sleep(max(0.0, 1.0 / 100.0 - (end_time - start_time)))
+                pacer.wait_until(timestamp)
+            else:
+                time.sleep(MOCK_HOLD_PACKET_PERIOD_SECONDS / MOCK_FAST_REPLAY_HOLD_SPEEDUP)
+            self._queued_packets.put(FIRMDataPacket(**row_dict))
 
     def _fetch_data_loop(
         self,
@@ -215,9 +471,11 @@ class MockFIRM(BaseFIRM):
         """The main thread loop."""
         self._is_running.set()
 
-        self._read_file(real_time_replay, start_after_log_buffer)
-
-        self._is_running.clear()
-        # If we don't put the STOP_SIGNAL in the queue, the main thread will wait till
-        # FIRM_SERIAL_TIMEOUT seconds before exiting, which is not what we want.
-        self._queued_packets.put(STOP_SIGNAL)
+        try:
+            self._read_file(real_time_replay, start_after_log_buffer)
+        finally:
+            self._is_running.clear()
+            # If we don't stop the queue, the main thread will wait till FIRM_SERIAL_TIMEOUT
+            # seconds before exiting (or forever, if reading the file failed), which is not what
+            # we want.
+            self._queued_packets.stop()
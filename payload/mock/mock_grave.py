@@ -33,5 +33,9 @@ class MockGrave(BaseGrave):
         time.sleep(5)
         self.ejecting_zombie = True
 
+    @property
+    def deploy_progress(self) -> float:
+        return 1.0 if self.ejecting_zombie else 0.0
+
     def get_data_packet(self):
         return GraveDataPacket(ejecting_zombie=self.ejecting_zombie, latch=self.latch_state)
@@ -4,13 +4,21 @@ Mock Logger class for testing purposes.
 Currently only used to delete the log file.
 """
 
+import shutil
 from typing import TYPE_CHECKING
 
+from payload.data_handling.log_index import remove_log
+from payload.data_handling.log_offsets import offset_index_path
 from payload.data_handling.logger import Logger
 
 if TYPE_CHECKING:
     from pathlib import Path
 
+    from payload.data_handling.backpressure import LogBackpressure
+    from payload.data_handling.durability import DurabilityPolicy
+    from payload.data_handling.log_schema import LogProfile
+    from payload.data_handling.logger import LogCompression, LogFormat, LoggerBackend
+
 
 class MockLogger(Logger):
     """
@@ -24,7 +32,19 @@ class MockLogger(Logger):
 
     __slots__ = ("_delete_log_file",)
 
-    def __init__(self, log_file_path: Path, delete_log_file: bool = True) -> None:
+    def __init__(
+        self,
+        log_file_path: Path,
+        delete_log_file: bool = True,
+        *,
+        log_format: LogFormat = "csv",
+        durability_policy: DurabilityPolicy | None = None,
+        segment_size_bytes: int | None = None,
+        compression: LogCompression | None = None,
+        backend: LoggerBackend = "thread",
+        backpressure: LogBackpressure | None = None,
+        log_profile: LogProfile = "standard",
+    ) -> None:
         """
         Initializes the mock logger object.
 
@@ -33,8 +53,26 @@ class MockLogger(Logger):
         :param log_file_path: The path to the log file to.
         :param delete_log_file: True if the log file should be deleted
             after the logger stops.
+        :param log_format: Whether to write a CSV or a binary log.
+        :param durability_policy: When to sync the log file to the disk.
+        :param segment_size_bytes: If given, the log is written as a directory of segments of up
+            to this size.
+        :param compression: If given, the codec to compress the log with.
+        :param backend: Whether to write the log from a thread or a separate process.
+        :param backpressure: How many rows can wait to be written, and which rows to shed when more
+            would.
+        :param log_profile: Which columns to log.
         """
-        super().__init__(log_file_path)
+        super().__init__(
+            log_file_path,
+            log_format=log_format,
+            durability_policy=durability_policy,
+            segment_size_bytes=segment_size_bytes,
+            compression=compression,
+            backend=backend,
+            backpressure=backpressure,
+            log_profile=log_profile,
+        )
         self._delete_log_file = delete_log_file
         self._log_thread.name = "Mock Logger Thread"
 
@@ -45,4 +83,9 @@ class MockLogger(Logger):
         """
         super().stop()
         if self._delete_log_file:
-            self.log_path.unlink()
+            if self.log_path.is_dir():
+                shutil.rmtree(self.log_path)
+            else:
+                self.log_path.unlink()
+                offset_index_path(self.log_path).unlink(missing_ok=True)
+            remove_log(self.log_path)
@@ -7,12 +7,20 @@ from payload.data_handling.packets.zombie_data_packet import ZombieDataPacket
 class MockZombie(BaseZombie):
     """A mock implementation of the Zombie class for testing purposes."""
 
-    __slots__ = ("activating_legs", "checking_orientation", "soil_data")
+    __slots__ = (
+        "activating_legs",
+        "checking_orientation",
+        "current_a",
+        "soil_data",
+        "system_message",
+    )
 
     def __init__(self):
         self.soil_data = 0
         self.activating_legs = False
         self.checking_orientation = False
+        self.current_a: float = 0
+        self.system_message: str = "Mock Zombie"
 
     def start(self) -> None:
         pass
@@ -28,7 +36,9 @@ class MockZombie(BaseZombie):
 
     def deploy_legs(self) -> None:
         self.activating_legs = True
-        pass
+
+    def retract_legs(self) -> None:
+        self.activating_legs = True
 
     def start_drilling(self) -> None:
         pass
@@ -52,4 +62,11 @@ class MockZombie(BaseZombie):
 
     def get_data_packet(self):
         """Get the data packet for zombie. This will involve firm data and soil sensor data."""
-        return ZombieDataPacket(soil_info=self.get_soil_data(), activating_legs=self.activating_legs, checking_orientation=self.checking_orientation)
+        return ZombieDataPacket(
+            activating_legs=self.activating_legs,
+            checking_orientation=self.checking_orientation,
+            nitrogen=self.soil_data,
+            pH=self.soil_data,
+            electrical_conductivity=self.soil_data,
+            motor_current_a=self.current_a,
+        )
@@ -0,0 +1,137 @@
+"""
+Module for the replay cache of MockFIRM.
+
+Parsing a flight CSV takes far longer than reading the same columns back from an Arrow IPC file,
+which Polars memory maps. So the first replay of a flight writes its columns, with the dtypes they
+were parsed with, to a cache file next to the CSV, and every later replay reads the cache instead.
+
+The cache is written under a temporary name and only renamed once it is complete, so a write that
+fails or is cut short never leaves a cache that looks valid.
+
+The cache is keyed by the size, modification time and content hash of the CSV, which are all in
+the name of the cache file. A cache whose size and modification time match is used right away. If
+only the modification time changed (e.g. a fresh checkout), the CSV is hashed, and the cache is
+renamed to the new key if the content is the same. Anything else makes a new cache and deletes the
+old one. The cache files can always be deleted by hand.
+"""
+
+import contextlib
+import hashlib
+import re
+from typing import TYPE_CHECKING
+
+from payload.constants import MOCK_REPLAY_CACHE_SUFFIX
+
+if TYPE_CHECKING:
+    import os
+    from pathlib import Path
+
+    import polars as pl
+
+CACHE_KEY_PATTERN = re.compile(r"(\d+)-(\d+)-([0-9a-f]+)")
+"""Matches the key in the name of a cache: the size, modification time and hash of the file."""
+
+TEMPORARY_SUFFIX = ".tmp"
+"""The suffix of a cache while it is being written."""
+
+
+def _content_hash(file_path: Path) -> str:
+    """
+    Hashes the contents of a file.
+
+    :param file_path: The file.
+    :return: The hash, in hex.
+    """
+    with file_path.open("rb") as file:
+        return hashlib.file_digest(file, lambda: hashlib.blake2b(digest_size=8)).hexdigest()
+
+
+def _cache_path(file_path: Path, stat: os.stat_result, content_hash: str) -> Path:
+    """
+    Returns the path of the cache of a file with the given key.
+
+    :param file_path: The cached file.
+    :param stat: The stat of the cached file, for its size and modification time.
+    :param content_hash: The hash of the contents of the cached file.
+    :return: The path of the cache, next to the file.
+    """
+    return file_path.with_name(
+        f"{file_path.name}.{stat.st_size}-{stat.st_mtime_ns}-{content_hash}"
+        f"{MOCK_REPLAY_CACHE_SUFFIX}"
+    )
+
+
+def _existing_caches(file_path: Path) -> list[tuple[Path, int, int, str]]:
+    """
+    Finds the caches of a file, including the stale ones.
+
+    :param file_path: The cached file.
+    :return: The path of every cache, with the size, modification time and hash in its key.
+    """
+    prefix = f"{file_path.name}."
+    caches = []
+    for cache_path in file_path.parent.glob(f"{prefix}*{MOCK_REPLAY_CACHE_SUFFIX}"):
+        key = cache_path.name.removeprefix(prefix).removesuffix(MOCK_REPLAY_CACHE_SUFFIX)
+        if match := CACHE_KEY_PATTERN.fullmatch(key):
+            caches.append((cache_path, int(match[1]), int(match[2]), match[3]))
+    return caches
+
+
+def find_replay_cache(file_path: Path) -> Path | None:
+    """
+    Finds the cache of a file that is still valid.
+
+    :param file_path: The cached file.
+    :return: The path of the cache, or None if the file has no valid cache.
+    """
+    stat = file_path.stat()
+    caches = _existing_caches(file_path)
+    for cache_path, size, mtime_ns, _ in caches:
+        if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+            return cache_path
+
+    # Only hash the file when there is a cache of a file of the same size to compare it with
+    same_size = [cache for cache in caches if cache[1] == stat.st_size]
+    if not same_size:
+        return None
+    content_hash = _content_hash(file_path)
+    for cache_path, _, _, cached_hash in same_size:
+        if cached_hash == content_hash:
+            valid_path = _cache_path(file_path, stat, content_hash)
+            cache_path.replace(valid_path)
+            return valid_path
+    return None
+
+
+def write_replay_cache(file_path: Path, scan: pl.LazyFrame) -> Path:
+    """
+    Writes the cache of a file, and deletes its stale caches.
+
+    :param file_path: The cached file.
+    :param scan: The contents of the file, as they should be read back from the cache.
+    :return: The path of the cache.
+    """
+    stat = file_path.stat()
+    cache_path = _cache_path(file_path, stat, _content_hash(file_path))
+    # A write that was killed (e.g. by a power cut) left its temporary file behind
+    for leftover_path in file_path.parent.glob(
+        f"{file_path.name}.*{MOCK_REPLAY_CACHE_SUFFIX}{TEMPORARY_SUFFIX}"
+    ):
+        with contextlib.suppress(OSError):
+            leftover_path.unlink()
+
+    # Write it under another name first, so a replay that is stopped halfway doesn't leave a
+    # truncated cache that looks valid
+    temporary_path = cache_path.with_name(f"{cache_path.name}{TEMPORARY_SUFFIX}")
+    try:
+        scan.sink_ipc(temporary_path)
+        temporary_path.replace(cache_path)
+    finally:
+        # Only left behind if the write failed, e.g. with a PolarsError or a full disk
+        temporary_path.unlink(missing_ok=True)
+
+    for stale_path, *_ in _existing_caches(file_path):
+        if stale_path != cache_path:
+            with contextlib.suppress(OSError):
+                stale_path.unlink()
+    return cache_path
@@ -0,0 +1,102 @@
+"""Module for pacing a replay by the timestamps of the recorded FIRM data."""
+
+import itertools
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import threading
+    from collections.abc import Iterator
+
+    from firm_client import FIRMDataPacket
+
+    from payload.data_handling.batch_queue import BatchQueue
+
+
+class ReplayPacer:
+    """
+    Works out which packets of a replay are due, from their FIRM timestamps.
+
+    Every deadline is measured from the same starting point (the first packet, and the time it was
+    sent), so the time it takes to send the packets and the oversleeping of time.sleep don't add
+    up over the replay: a late packet only makes the packets after it come sooner.
+    """
+
+    __slots__ = ("_first_timestamp", "_start_time", "speed")
+
+    def __init__(self, speed: float = 1.0) -> None:
+        """
+        Initializes the pacer.
+
+        :param speed: How many times faster than it was recorded to replay the data.
+        """
+        if speed <= 0:
+            raise ValueError("The replay speed must be positive.")
+        self.speed = speed
+        self._first_timestamp: float | None = None
+        self._start_time = 0.0
+
+    @property
+    def is_started(self) -> bool:
+        """Returns whether the first packet was sent."""
+        return self._first_timestamp is not None
+
+    def start(self, first_timestamp: float) -> None:
+        """
+        Starts the replay now, at the timestamp of the first packet.
+
+        :param first_timestamp: The FIRM timestamp of the first packet, in seconds.
+        """
+        self._first_timestamp = first_timestamp
+        self._start_time = time.perf_counter()
+
+    def due_timestamp(self) -> float:
+        """
+        Returns the FIRM timestamp the replay has reached, so every packet up to it is due.
+
+        :return: The timestamp, in seconds.
+        """
+        return self._first_timestamp + (time.perf_counter() - self._start_time) * self.speed
+
+    def wait_until(self, timestamp: float) -> None:
+        """
+        Sleeps until the packet with the timestamp is due.
+
+        :param timestamp: The FIRM timestamp of the packet, in seconds.
+        """
+        deadline = self._start_time + (timestamp - self._first_timestamp) / self.speed
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+
+    def send_when_due(
+        self,
+        packets: Iterator[FIRMDataPacket],
+        timestamps: np.ndarray,
+        packet_queue: BatchQueue[FIRMDataPacket],
+        requested_to_run: threading.Event,
+    ) -> bool:
+        """
+        Puts packets in the queue as they become due, every packet that is due at once. Starts the
+        pacer at the first packet, if it wasn't started yet.
+
+        :param packets: The packets.
+        :param timestamps: The FIRM timestamps of the packets, which must not go back in time.
+        :param packet_queue: The queue to put the packets in.
+        :param requested_to_run: Cleared to stop sending the packets.
+        :return: False if the sending was stopped before every packet was sent.
+        """
+        if not self.is_started and len(timestamps):
+            self.start(float(timestamps[0]))
+
+        sent = 0
+        while sent < len(timestamps):
+            if not requested_to_run.is_set():
+                return False
+            due = int(np.searchsorted(timestamps, self.due_timestamp(), side="right"))
+            if due == sent:
+                self.wait_until(float(timestamps[sent]))
+                continue
+            packet_queue.put_batch(itertools.islice(packets, due - sent))
+            sent = due
+        return True
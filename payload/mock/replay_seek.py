@@ -0,0 +1,122 @@
+"""
+Module for starting a replay partway into a flight.
+
+Testing the logic that runs late in a flight (landing, deployment, drilling) shouldn't mean
+replaying the whole ascent first. A quick pre-scan of the replay file finds the launch and the
+touchdown, so MockFIRM can start at a row, at a FIRM timestamp, or a little before one of those
+phases, and the state machine can be put in the state the payload would be in at that point.
+"""
+
+from typing import TYPE_CHECKING
+
+import msgspec
+import numpy as np
+import polars as pl
+
+from payload.clock import FIRMClock
+from payload.constants import (
+    LANDING_ACCELERATION_BAND_GS,
+    LAUNCH_ACCELERATION_GS,
+    LAUNCH_CONSECUTIVE_SAMPLES,
+    MOCK_SEEK_LEAD_SECONDS,
+    FlightPhase,
+)
+from payload.detectors import ACCELERATION_GS
+from payload.state import Launched
+
+if TYPE_CHECKING:
+    from payload.context import Context
+
+
+class ReplayStart(msgspec.Struct, frozen=True):
+    """Where a replay starts, and what the payload would know about the flight at that point."""
+
+    row: int
+    """The number of rows of the file that are skipped."""
+
+    timestamp_seconds: float
+    """The FIRM timestamp of the first row that is sent."""
+
+    launch_timestamp_seconds: float | None
+    """
+    The FIRM timestamp of launch, if the replay starts after it, in which case the state machine
+    should start in Launched.
+    """
+
+
+def find_replay_start(
+    scan: pl.LazyFrame,
+    *,
+    row: int | None = None,
+    timestamp_seconds: float | None = None,
+    phase: FlightPhase | None = None,
+    lead_seconds: float = MOCK_SEEK_LEAD_SECONDS,
+) -> ReplayStart:
+    """
+    Pre-scans a replay file for where to start it. Only one of `row`, `timestamp_seconds` and
+    `phase` should be given.
+
+    :param scan: The rows of the file, with at least the timestamp and the raw acceleration.
+    :param row: Start at the row with this index.
+    :param timestamp_seconds: Start at the first row at or after this FIRM timestamp.
+    :param phase: Start `lead_seconds` before this phase of the flight.
+    :param lead_seconds: How long before the phase to start.
+    :return: Where the replay starts.
+    """
+    flight = scan.select(
+        timestamp_seconds=pl.col("timestamp_seconds").forward_fill().backward_fill(),
+        # Launch is detected at the last packet of a run of LAUNCH_CONSECUTIVE_SAMPLES packets
+        is_launch_detected=(ACCELERATION_GS > LAUNCH_ACCELERATION_GS)
+        .cast(pl.Int32)
+        .rolling_sum(LAUNCH_CONSECUTIVE_SAMPLES)
+        == LAUNCH_CONSECUTIVE_SAMPLES,
+        is_moving=(ACCELERATION_GS - 1).abs() > LANDING_ACCELERATION_BAND_GS,
+    ).collect()
+    # A timestamp that goes back in time belongs with the rows before it, so they can be searched
+    timestamps = np.maximum.accumulate(flight.get_column("timestamp_seconds").to_numpy())
+
+    launch_detected = np.flatnonzero(flight.get_column("is_launch_detected").fill_null(False))
+    launch_row = (
+        int(launch_detected[0]) - LAUNCH_CONSECUTIVE_SAMPLES + 1 if launch_detected.size else None
+    )
+
+    if phase is not None:
+        if launch_row is None:
+            raise ValueError(f"The replay file has no launch to find the {phase} phase from.")
+        if phase == FlightPhase.LAUNCH:
+            phase_row = launch_row
+        else:
+            # The launch itself is moving, so there is always a last moving row after it
+            phase_row = int(np.flatnonzero(flight.get_column("is_moving").fill_null(False))[-1])
+        timestamp_seconds = float(timestamps[phase_row]) - lead_seconds
+    if timestamp_seconds is not None:
+        row = int(np.searchsorted(timestamps, timestamp_seconds, side="left"))
+    row = row or 0
+    if row >= len(timestamps):
+        raise ValueError(f"The replay would start at row {row}, after the end of the file.")
+
+    return ReplayStart(
+        row=row,
+        timestamp_seconds=float(timestamps[row]),
+        launch_timestamp_seconds=(
+            float(timestamps[launch_row]) if launch_row is not None and launch_row < row else None
+        ),
+    )
+
+
+def seed_state(context: Context, replay_start: ReplayStart) -> None:
+    """
+    Puts the state machine in the state the payload would be in at the start of the replay, with
+    its timers started at the time of the events that came before it.
+
+    :param context: The context, before it is started.
+    :param replay_start: Where the replay starts.
+    :raises ValueError: If the context doesn't run on the FIRM clock, since no packet was received
+        yet to tell the other clocks when launch was.
+    """
+    if replay_start.launch_timestamp_seconds is None:
+        return
+    if not isinstance(context.clock, FIRMClock):
+        raise ValueError("A replay can only start after launch on the FIRM clock.")
+    context.launch_timestamp_seconds = replay_start.launch_timestamp_seconds
+    context.state = Launched(context)
@@ -0,0 +1,348 @@
+"""
+Module for a FIRM that makes up a flight, for stress testing the main loop, the Logger and the
+state machine at rates far beyond what a real flight (or a recorded one) gives us.
+"""
+
+import itertools
+import math
+import threading
+
+import msgspec
+import numpy as np
+from firm_client import FIRMDataPacket
+
+from payload.base_classes.base_firm import BaseFIRM
+from payload.constants import (
+    SERIAL_TIMEOUT_SECONDS,
+    SYNTHETIC_FIRM_CHUNK_PACKETS,
+    SYNTHETIC_FIRM_QUEUE_MAX_PACKETS,
+)
+from payload.data_handling.batch_queue import BatchQueue
+from payload.mock.mock_firm import FIRM_CONSTRUCTOR_FIELDS
+from payload.mock.replay_pacer import ReplayPacer
+
+GRAVITY_METERS_PER_S2 = 9.80665
+
+MAGNETIC_FIELD_MICROTESLAS = (20.0, 0.0, -45.0)
+"""The magnetic field FIRM reads, roughly that of the Earth in North Carolina."""
+
+
+class FlightProfile(msgspec.Struct, frozen=True):
+    """
+    The shape of a synthetic flight. The rocket flies straight up and down, and every phase has a
+    constant acceleration, so the whole flight can be worked out at any timestamp at once.
+    """
+
+    pad_seconds: float = 10.0
+    """How long the rocket waits on the pad before launch."""
+
+    boost_seconds: float = 2.0
+    """How long the motor burns."""
+
+    boost_acceleration_gs: float = 10.0
+    """What the accelerometer reads during the burn."""
+
+    coast_drag_gs: float = 0.3
+    """The deceleration from drag while coasting to apogee, which the accelerometer reads."""
+
+    drogue_descent_meters_per_s: float = 25.0
+    """How fast the rocket falls under the drogue."""
+
+    main_deploy_altitude_meters: float = 150.0
+    """The altitude at which the main parachute opens."""
+
+    main_inflation_seconds: float = 1.0
+    """How long the main parachute takes to slow the rocket down to its descent rate."""
+
+    main_descent_meters_per_s: float = 6.0
+    """How fast the rocket falls under the main parachute."""
+
+    descent_sway_gs: float = 0.05
+    """How much the swinging under a parachute changes the acceleration the accelerometer reads."""
+
+    descent_sway_period_seconds: float = 2.0
+    """How long one swing under a parachute takes."""
+
+    touchdown_seconds: float = 0.05
+    """How long the impact with the ground takes to stop the rocket."""
+
+    landed_seconds: float = 60.0
+    """How long the rocket lies on the ground after touchdown."""
+
+    landing_tilt_degrees: float = 10.0
+    """How far from upright the payload lies on the ground."""
+
+    landing_azimuth_degrees: float = 0.0
+    """Which way the payload is tilted on the ground, from its x axis towards its y axis."""
+
+    acceleration_noise_gs: float = 0.002
+    """The standard deviation of the noise on every acceleration axis."""
+
+    angular_rate_noise_deg_per_s: float = 0.1
+    """The standard deviation of the noise on every angular rate axis."""
+
+    altitude_noise_meters: float = 0.3
+    """The standard deviation of the noise on the estimated altitude."""
+
+
+class SyntheticFIRM(BaseFIRM):
+    """
+    A FIRM that generates a plausible flight: pad wait, boost, coast, apogee, drogue, main and
+    landing, at any sample rate.
+
+    The flight is split into phases of constant acceleration, so the altitude, velocity and
+    acceleration of a chunk of SYNTHETIC_FIRM_CHUNK_PACKETS timestamps are worked out with NumPy
+    in one go, and the noise is added to the whole chunk at once. Like MockFIRM, the packets are
+    generated by a thread, and either sent as fast as possible or paced by their timestamps. A fast
+    flight waits whenever the main loop falls SYNTHETIC_FIRM_QUEUE_MAX_PACKETS behind.
+    """
+
+    __slots__ = (
+        "_acceleration_gs",
+        "_accelerations",
+        "_altitudes",
+        "_data_fetch_thread",
+        "_is_running",
+        "_landed_acceleration_gs",
+        "_landed_quaternion",
+        "_profile",
+        "_queued_packets",
+        "_real_time",
+        "_replay_speed",
+        "_requested_to_run",
+        "_rng",
+        "_segment_starts",
+        "_segment_sways",
+        "_velocities",
+        "duration_seconds",
+        "sample_rate_hz",
+    )
+
+    def __init__(
+        self,
+        sample_rate_hz: float = 1000.0,
+        profile: FlightProfile | None = None,
+        duration_seconds: float | None = None,
+        *,
+        real_time: bool = False,
+        replay_speed: float = 1.0,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Initializes the SyntheticFIRM.
+
+        :param sample_rate_hz: How many packets are generated per second of flight.
+        :param profile: The shape of the flight. Defaults to a 1.4 km flight.
+        :param duration_seconds: How much of the flight to generate. Defaults to the whole flight,
+            up to the end of `landed_seconds`. A longer duration keeps the rocket on the ground.
+        :param real_time: If True, every packet is sent when it is due, at `replay_speed` times the
+            rate of the flight. If False, the packets are sent as fast as they are generated.
+        :param replay_speed: How many times faster than real time a real time flight runs.
+        :param seed: The seed of the noise, so a flight can be generated again exactly.
+        """
+        self.sample_rate_hz = sample_rate_hz
+        self._profile = profile if profile is not None else FlightProfile()
+        self._real_time = real_time
+        self._replay_speed = replay_speed
+        self._rng = np.random.default_rng(seed)
+        self._build_segments()
+        if duration_seconds is None:
+            duration_seconds = float(self._segment_starts[-1]) + self._profile.landed_seconds
+        self.duration_seconds = duration_seconds
+
+        tilt = math.radians(self._profile.landing_tilt_degrees)
+        azimuth = math.radians(self._profile.landing_azimuth_degrees)
+        self._landed_acceleration_gs = np.array(
+            [math.sin(tilt) * math.cos(azimuth), math.sin(tilt) * math.sin(azimuth), math.cos(tilt)]
+        )
+        # Rotated by the tilt, about the horizontal axis at a right angle to the azimuth
+        self._landed_quaternion = np.array(
+            [
+                math.cos(tilt / 2),
+                -math.sin(azimuth) * math.sin(tilt / 2),
+                math.cos(azimuth) * math.sin(tilt / 2),
+                0.0,
+            ]
+        )
+
+        self._queued_packets: BatchQueue[FIRMDataPacket] = BatchQueue(
+            SYNTHETIC_FIRM_QUEUE_MAX_PACKETS
+        )
+        self._data_fetch_thread = threading.Thread(
+            target=self._generate_loop, name="Synthetic FIRM Thread", daemon=True
+        )
+        self._is_running = threading.Event()
+        self._requested_to_run = threading.Event()
+
+        super().__init__()
+
+    @property
+    def is_running(self) -> bool:
+        """Returns True if the Synthetic FIRM thread is generating packets."""
+        return self._is_running.is_set()
+
+    @property
+    def requested_to_run(self) -> bool:
+        """Returns True if the Synthetic FIRM thread has been requested to run."""
+        return self._requested_to_run.is_set()
+
+    def start(self) -> None:
+        """Starts the Synthetic FIRM thread."""
+        self._requested_to_run.set()
+        if not self._data_fetch_thread.is_alive():
+            self._data_fetch_thread.start()
+
+    def stop(self) -> None:
+        """Stops the Synthetic FIRM thread."""
+        self._requested_to_run.clear()
+        self._queued_packets.stop()
+        self._data_fetch_thread.join(timeout=SERIAL_TIMEOUT_SECONDS)
+        if self._data_fetch_thread.is_alive():
+            raise RuntimeError("FIRM data fetch thread did not terminate in time.")
+
+    def get_data_packets(self, block: bool = True) -> list[FIRMDataPacket]:
+        """
+        Returns all available FIRM data packets from the queue, at once.
+
+        Once the flight is over and every packet was returned, this returns an empty list right
+        away, which makes the main update() loop exit early.
+        """
+        packets, _ = self._queued_packets.get_all(block=block)
+        return packets
+
+    # ------------------------ THREAD METHODS -------------------------
+
+    def _build_segments(self) -> None:
+        """
+        Works out the phases of the flight: when each one starts, the altitude and velocity it
+        starts at, the acceleration of the rocket during it (in m/s²) and what the accelerometer
+        reads (in Gs), and whether the rocket swings under a parachute. The last phase is the rocket
+        lying on the ground.
+        """
+        profile = self._profile
+        g = GRAVITY_METERS_PER_S2
+        # (start, altitude, velocity, acceleration, reading, sways) of every phase
+        segments: list[tuple[float, float, float, float, float, bool]] = []
+        start = altitude = velocity = 0.0
+
+        def add_phase(
+            duration: float, acceleration: float, reading: float, sways: bool = False
+        ) -> None:
+            nonlocal start, altitude, velocity
+            segments.append((start, altitude, velocity, acceleration, reading, sways))
+            start += duration
+            altitude += velocity * duration + acceleration * duration**2 / 2
+            velocity += acceleration * duration
+
+        add_phase(profile.pad_seconds, 0.0, 1.0)
+        boost_acceleration = (profile.boost_acceleration_gs - 1) * g
+        add_phase(profile.boost_seconds, boost_acceleration, profile.boost_acceleration_gs)
+        coast_acceleration = -(1 + profile.coast_drag_gs) * g
+        add_phase(velocity / -coast_acceleration, coast_acceleration, -profile.coast_drag_gs)
+        # Free fall after apogee, until the drogue holds the rocket at its descent rate
+        add_phase(profile.drogue_descent_meters_per_s / g, -g, 0.0)
+        add_phase(
+            (altitude - profile.main_deploy_altitude_meters) / -velocity, 0.0, 1.0, sways=True
+        )
+        main_acceleration = (
+            profile.drogue_descent_meters_per_s - profile.main_descent_meters_per_s
+        ) / profile.main_inflation_seconds
+        add_phase(
+            profile.main_inflation_seconds, main_acceleration, 1 + main_acceleration / g, sways=True
+        )
+        # The touchdown stops the rocket over half its descent rate times its length
+        touchdown_meters = profile.main_descent_meters_per_s * profile.touchdown_seconds / 2
+        add_phase((altitude - touchdown_meters) / -velocity, 0.0, 1.0, sways=True)
+        touchdown_acceleration = profile.main_descent_meters_per_s / profile.touchdown_seconds
+        add_phase(profile.touchdown_seconds, touchdown_acceleration, 1 + touchdown_acceleration / g)
+        segments.append((start, altitude, 0.0, 0.0, 1.0, False))
+
+        (
+            self._segment_starts,
+            self._altitudes,
+            self._velocities,
+            self._accelerations,
+            self._acceleration_gs,
+            self._segment_sways,
+        ) = np.array(segments).T
+
+    def _generate_chunk(self, first_index: int, count: int) -> tuple[np.ndarray, list[list]]:
+        """
+        Generates the values of a chunk of packets.
+
+        :param first_index: The index of the first packet of the chunk in the flight.
+        :param count: How many packets to generate.
+        :return: The timestamps of the packets, and the arguments of the FIRMDataPacket
+            constructor of every packet.
+        """
+        profile = self._profile
+        timestamps = np.arange(first_index, first_index + count) / self.sample_rate_hz
+        segments = np.searchsorted(self._segment_starts, timestamps, side="right") - 1
+        elapsed = timestamps - self._segment_starts[segments]
+        accelerations = self._accelerations[segments]
+        altitudes = (
+            self._altitudes[segments]
+            + self._velocities[segments] * elapsed
+            + accelerations * elapsed**2 / 2
+        )
+        velocities = self._velocities[segments] + accelerations * elapsed
+        is_landed = segments == len(self._segment_starts) - 1
+
+        # In the air the rocket points straight up, on the ground it lies at the landing tilt
+        acceleration_gs = np.zeros((count, 3))
+        acceleration_gs[:, 2] = self._acceleration_gs[segments] + (
+            self._segment_sways[segments]
+            * profile.descent_sway_gs
+            * np.sin(2 * np.pi * timestamps / profile.descent_sway_period_seconds)
+        )
+        acceleration_gs[is_landed] = self._landed_acceleration_gs
+        acceleration_gs += self._rng.normal(0.0, profile.acceleration_noise_gs, (count, 3))
+        quaternions = np.tile([1.0, 0.0, 0.0, 0.0], (count, 1))
+        quaternions[is_landed] = self._landed_quaternion
+        angular_rates = self._rng.normal(0.0, profile.angular_rate_noise_deg_per_s, (count, 3))
+        altitudes += self._rng.normal(0.0, profile.altitude_noise_meters, count)
+
+        columns = {
+            "timestamp_seconds": timestamps,
+            "temperature_celsius": 20.0 - 0.0065 * altitudes,
+            "pressure_pascals": 101325.0 * (1 - 2.25577e-5 * altitudes) ** 5.25588,
+            "raw_acceleration_x_gs": acceleration_gs[:, 0],
+            "raw_acceleration_y_gs": acceleration_gs[:, 1],
+            "raw_acceleration_z_gs": acceleration_gs[:, 2],
+            "raw_angular_rate_x_deg_per_s": angular_rates[:, 0],
+            "raw_angular_rate_y_deg_per_s": angular_rates[:, 1],
+            "raw_angular_rate_z_deg_per_s": angular_rates[:, 2],
+            "magnetic_field_x_microteslas": np.full(count, MAGNETIC_FIELD_MICROTESLAS[0]),
+            "magnetic_field_y_microteslas": np.full(count, MAGNETIC_FIELD_MICROTESLAS[1]),
+            "magnetic_field_z_microteslas": np.full(count, MAGNETIC_FIELD_MICROTESLAS[2]),
+            "est_position_z_meters": altitudes,
+            "est_velocity_z_meters_per_s": velocities,
+            "est_quaternion_w": quaternions[:, 0],
+            "est_quaternion_x": quaternions[:, 1],
+            "est_quaternion_y": quaternions[:, 2],
+            "est_quaternion_z": quaternions[:, 3],
+        }
+        rows = np.column_stack([columns[field] for field in FIRM_CONSTRUCTOR_FIELDS]).tolist()
+        return timestamps, rows
+
+    def _generate_loop(self) -> None:
+        """The main thread loop, which generates the flight a chunk at a time."""
+        self._is_running.set()
+        pacer = ReplayPacer(self._replay_speed)
+        total_packets = int(self.duration_seconds * self.sample_rate_hz)
+        for first_index in range(0, total_packets, SYNTHETIC_FIRM_CHUNK_PACKETS):
+            if not self._requested_to_run.is_set():
+                break
+            count = min(SYNTHETIC_FIRM_CHUNK_PACKETS, total_packets - first_index)
+            timestamps, rows = self._generate_chunk(first_index, count)
+            packets = itertools.starmap(FIRMDataPacket, rows)
+            if not self._real_time:
+                self._queued_packets.put_batch(packets)
+            elif not pacer.send_when_due(
+                packets, timestamps, self._queued_packets, self._requested_to_run
+            ):
+                break
+
+        self._is_running.clear()
+        # Otherwise the main thread would wait for packets forever
+        self._queued_packets.stop()
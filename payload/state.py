@@ -2,19 +2,17 @@
 Module for the finite state machine that represents which state of flight the rocket is in.
 """
 
-import time
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
 
-import numpy as np
-
 from payload.constants import (
     GRAVE_DEPLOY_LENGTH_SECONDS,
-    LAUNCH_ACCELERATION_GS,
+    LANDING_MAX_ALTITUDE_METERS,
     LAUNCH_STATE_CHECK_LENGTH_SECONDS,
     LAUNCH_STATE_MAX_LENGTH_SECONDS,
     TOTAL_OPERATION_TIME,
 )
+from payload.detectors import LandingDetector, LaunchDetector
 
 if TYPE_CHECKING:
     from payload.context import Context
@@ -59,25 +57,20 @@ class StandbyState(State):
     When the rocket is on the launch rail on the ground.
     """
 
-    __slots__ = ()
+    __slots__ = ("launch_detector",)
+
+    def __init__(self, context: Context) -> None:
+        super().__init__(context)
+        self.launch_detector = LaunchDetector()
 
     def update(self) -> None:
         """
-        Checks if the rocket has launched, based on our altitude.
+        Checks if the rocket has launched, based on our acceleration.
         """
         # If accelerate above 5Gs, we have launched. This is a very delayed, but very safe check.
-        if (
-            self.context.most_recent_firm_data_packet
-            and (
-                (
-                    (self.context.most_recent_firm_data_packet.raw_acceleration_z_gs**2)
-                    + (self.context.most_recent_firm_data_packet.raw_acceleration_y_gs**2)
-                    + (self.context.most_recent_firm_data_packet.raw_acceleration_x_gs**2)
-                )
-                ** 0.5
-            )
-            > LAUNCH_ACCELERATION_GS
-        ):
+        # Every packet we got this loop is checked, so a spike in the middle of a batch counts.
+        if self.launch_detector.update(self.context.firm_data_packets):
+            self.context.launch_timestamp_seconds = self.launch_detector.launch_timestamp_seconds
             self.next_state()
 
     def next_state(self):
@@ -91,55 +84,45 @@ class Launched(State):
 
     __slots__ = (
         "_start_time",
-        "acceleration_difference",
-        "recent_acceleration",
-        "recent_acceleration_difference",
+        "landing_detector",
     )
 
     def __init__(self, context: Context) -> None:
+        """
+        :param context: The context, whose `launch_timestamp_seconds` is the packet at which launch
+            was detected.
+        """
         super().__init__(context)
-        self._start_time = time.monotonic()
+        # Not now, which is the end of the batch, so the timers don't depend on where in the batch
+        # launch was
+        self._start_time = self.context.clock.from_firm_timestamp(
+            self.context.launch_timestamp_seconds
+        )
         self.context.launch_time_seconds = self._start_time
-        self.recent_acceleration: list[float] = []
-        self.recent_acceleration_difference: list[float] = []
-        self.acceleration_difference: float = 1
+        self.landing_detector = LandingDetector()
 
     def update(self) -> None:
         """
         Check if enough time has elapsed since launch to say we've landed.
         """
         # Check to see if the descent time for main at crapogee has passed
-        elapsed = time.monotonic() - self._start_time
+        elapsed = self.context.clock.now() - self._start_time
         if elapsed >= LAUNCH_STATE_MAX_LENGTH_SECONDS:
             self.next_state()
 
-        # Append the recent acceleration data from firm
-        self.recent_acceleration.extend([(
-            (
-                (item.raw_acceleration_z_gs**2)
-                + (item.raw_acceleration_y_gs**2)
-                + (item.raw_acceleration_x_gs**2)
-            )
-            ** 0.5
-        )
-        for item in self.context.firm_data_packets[-500:]])
-
-        # Trim list to save data and processing power
-        self.recent_acceleration = self.recent_acceleration[-500:]
+        # Add the recent acceleration data from firm to the landing window
+        self.landing_detector.update(self.context.firm_data_packets)
 
         # Check if landed after time for nominal flight
         if (
             (elapsed >= LAUNCH_STATE_CHECK_LENGTH_SECONDS)
-            and (len(self.recent_acceleration) >= 500)
-            and (self.context.most_recent_firm_data_packet.est_position_z_meters < 5)
+            and (
+                self.context.most_recent_firm_data_packet.est_position_z_meters
+                < LANDING_MAX_ALTITUDE_METERS
+            )
+            and self.landing_detector.is_landed
         ):
-            self.recent_acceleration_difference = [
-                abs(item - 1.0) for item in self.recent_acceleration
-            ]
-            if (all(item <= 0.03 for item in self.recent_acceleration_difference)
-                and np.std(self.recent_acceleration_difference) < 0.005):
-                self.next_state()
-
+            self.next_state()
 
     def next_state(self) -> None:
         self.context.state = LandedState(self.context)
@@ -157,7 +140,7 @@ class LandedState(State):
         super().__init__(context)
         # If this is zombie, we're just going to set a timer to move on to the next state
         if self.context.zombie:
-            self._start_time = time.monotonic()
+            self._start_time = self.context.clock.now()
             self.context.landing_time_seconds = self._start_time
 
     def update(self) -> None:
@@ -169,7 +152,7 @@ class LandedState(State):
             self.next_state()
         # If this is Zombie, wait 10 seconds to be deployed
         elif self.context.zombie:
-            elapsed = time.monotonic() - self._start_time
+            elapsed = self.context.clock.now() - self._start_time
             if elapsed >= GRAVE_DEPLOY_LENGTH_SECONDS:
                 self.next_state()
 
@@ -194,10 +177,20 @@ class DeployZombieState(State):
     def update(self) -> None:
         """
         Deploys Zombie from the rocket.
+
+        The deployment runs in the background, so we keep getting called (and logging) while the
+        latch is released and the lead screw pushes Zombie out.
         """
         if not self._deploy_started:
             self.context.deploy_zombie()
             self._deploy_started = True
+        elif self.context.deploy_error is not None:
+            # Don't try again, the lead screw may have stopped partway out, and moving it the whole
+            # distance again would drive it past the end. We stay here, so the mission never
+            # completes and we keep logging.
+            pass
+        elif self.context.is_deploy_complete:
+            self.next_state()
 
     def next_state(self) -> None:
         # Grave has no next state, so we explicitly do nothing
@@ -240,7 +233,7 @@ class ZombieDrillingState(State):
         self._drilling_started = False
 
     def update(self) -> None:
-        elapsed = time.monotonic() - self.context.landing_time_seconds
+        elapsed = self.context.clock.now() - self.context.landing_time_seconds
         if not self._drilling_started:
             self.context.start_zombie_drilling()
             self._drilling_started = True
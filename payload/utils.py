@@ -2,10 +2,11 @@
 File which contains utility functions which can be reused in the project.
 """
 import argparse
-import queue
 from pathlib import Path
 from typing import Any
 
+from payload.constants import FlightPhase
+
 
 def convert_unknown_type_to_float(obj_type: Any) -> float:
     """
@@ -38,30 +39,6 @@ def convert_s_to_ns(seconds: float) -> float:
     return seconds * 1e9
 
 
-def get_all_packets_from_queue(packet_queue: queue.SimpleQueue, block: bool) -> list[Any]:
-    """
-    Empties the queue and returns all the items in a list.
-
-    :param packet_queue: The queue to empty.
-    :param block: Whether to block when getting items from the queue.
-
-    :return: A list of all the items in the queue.
-    """
-    items = []
-
-    if block:
-        # Block until at least one item is available
-        items.append(packet_queue.get(block=True))
-
-    # Drain the rest of the queue, non-blocking
-    while not packet_queue.empty():
-        try:
-            items.append(packet_queue.get(block=False))
-        except queue.Empty:
-            break
-    return items
-
-
 def deadband(input_value: float, threshold: float) -> float:
     """
     Returns 0.0 if input_value is within the deadband threshold.
@@ -76,6 +53,39 @@ def deadband(input_value: float, threshold: float) -> float:
     return input_value
 
 
+def replay_speed(value: str) -> float | None:
+    """
+    Parses the --replay-speed argument.
+
+    :param value: A positive number, or "max".
+    :return: The speed, or None for "max".
+    """
+    if value == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("the replay speed must be positive")
+    return speed
+
+
+def replay_start_point(value: str) -> float | FlightPhase:
+    """
+    Parses the --start-at argument.
+
+    :param value: A FIRM timestamp in seconds, or the name of a FlightPhase.
+    :return: The timestamp, or the phase.
+    """
+    if value in set(FlightPhase):
+        return FlightPhase(value)
+    try:
+        return float(value)
+    except ValueError:
+        phases = ", ".join(FlightPhase)
+        raise argparse.ArgumentTypeError(
+            f"expected a timestamp in seconds or one of {phases}"
+        ) from None
+
+
 def arg_parser() -> argparse.Namespace:
     """Parse CLI arguments for the payload program."""
 
@@ -107,6 +117,17 @@ def arg_parser() -> argparse.Namespace:
         ),
     )
 
+    mode_group.add_argument(
+        "-y",
+        "--synthetic",
+        type=float,
+        metavar="HZ",
+        help=(
+            "Run in synthetic mode, on a generated flight with this many FIRM packets per second. "
+            "If provided, mode will be set to 'synthetic'."
+        ),
+    )
+
     parser.add_argument(
         "-l",
         "--keep-log-file",
@@ -118,9 +139,89 @@ def arg_parser() -> argparse.Namespace:
         "-f",
         "--fast-replay",
         action="store_true",
-        help="Run replay at full speed (mock mode only).",
+        help="Run replay at full speed (mock and synthetic modes). The same as --replay-speed max.",
+    )
+
+    parser.add_argument(
+        "--replay-speed",
+        type=replay_speed,
+        default=1.0,
+        metavar="SPEED",
+        help=(
+            "How many times faster than it was recorded to replay the flight, e.g. 0.5, 1 or 10, "
+            'or "max" to run at full speed (mock and synthetic modes).'
+        ),
     )
     
+    start_group = parser.add_mutually_exclusive_group()
+
+    start_group.add_argument(
+        "--start-at",
+        type=replay_start_point,
+        metavar="SECONDS|PHASE",
+        help=(
+            "Start the replay at this FIRM timestamp, or a few seconds before a phase of the "
+            f"flight ({', '.join(FlightPhase)}), with the state machine in the state it would be "
+            "in (mock mode only)."
+        ),
+    )
+
+    start_group.add_argument(
+        "--start-row",
+        type=int,
+        metavar="ROW",
+        help="Start the replay at this row of the file (mock mode only).",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--binary-log",
+        action="store_true",
+        help="Log to a binary file of MessagePack frames instead of a CSV file.",
+    )
+
+    parser.add_argument(
+        "-s",
+        "--sync-strategy",
+        choices=("rows", "interval", "state"),
+        default="rows",
+        help=(
+            "When to sync the log file to the disk: every 1000 rows, every second, or at an "
+            "interval that depends on the state."
+        ),
+    )
+
+    parser.add_argument(
+        "-g",
+        "--segment-size",
+        type=int,
+        metavar="MB",
+        help=(
+            "Write the log as a directory of segments of up to this many megabytes, with a CRC on "
+            "every block. Salvage it with payload-salvage-log."
+        ),
+    )
+
+    parser.add_argument(
+        "-z",
+        "--compress",
+        choices=("gzip", "xz"),
+        help="Compress the log file. Can't be used with --segment-size.",
+    )
+
+    parser.add_argument(
+        "--logger-process",
+        action="store_true",
+        help="Encode and write the log in a separate process instead of a thread.",
+    )
+
+    parser.add_argument(
+        "--log-profile",
+        choices=("minimal", "standard", "full"),
+        default="standard",
+        help='Which columns to log. "full" logs every field of every FIRM data packet.',
+    )
+
     parser.add_argument(
         "-r",
         "--real-motors",
@@ -134,6 +235,9 @@ def arg_parser() -> argparse.Namespace:
     if args.mock is not None:
         args.mode = "mock"
         args.path = args.mock
+    elif args.synthetic is not None:
+        args.mode = "synthetic"
+        args.path = None
     elif args.pretend is not None:
         args.mode = "pretend"
         args.path = args.pretend
@@ -145,5 +249,8 @@ def arg_parser() -> argparse.Namespace:
         args.path = None
         
     args.motor = args.real_motors
+    args.fast_replay = args.fast_replay or args.replay_speed is None
+    args.start_phase = args.start_at if isinstance(args.start_at, FlightPhase) else None
+    args.start_timestamp_seconds = args.start_at if isinstance(args.start_at, float) else None
 
     return args
@@ -0,0 +1,81 @@
+"""
+Benchmarks the durability policies of the Logger by writing a simulated flight to a log file with
+each of them, and prints how many syncs each one did and its fsync latency histogram.
+
+Run it on the SD card of the Pi to get meaningful numbers:
+    uv run python -m scripts.benchmark_durability_policies [directory]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from payload.data_handling.durability import DurabilityPolicy
+
+ROW = b"12:00:00,Launched,0,0,0,0,0,False,True," + b"0.12345678," * 6 + b"1.00000000\r\n"
+SAMPLE_RATE_HZ = 1000
+BATCH_SIZES = (1, 3, 10, 40)
+"""The main loop gets a varying number of packets each iteration, so the batches are uneven."""
+PHASES = (("StandbyState", 3.0), ("Launched", 4.0), ("LandedState", 3.0))
+"""The states of the simulated flight and how long each lasts, in seconds."""
+
+POLICIES = {
+    "rows": DurabilityPolicy("rows"),
+    "rows + fdatasync": DurabilityPolicy("rows", use_fdatasync=True),
+    "interval": DurabilityPolicy("interval"),
+    "state": DurabilityPolicy("state"),
+    "state + fdatasync + prealloc": DurabilityPolicy("state", use_fdatasync=True, preallocate=True),
+}
+
+
+def write_flight(policy: DurabilityPolicy, path: Path) -> float:
+    """
+    Writes the simulated flight in real time with the policy, the way Logger._logging_loop does.
+
+    :return: The total time spent syncing, in seconds.
+    """
+    path.write_bytes(b"")
+    sync_time = 0.0
+    with path.open("r+b") as file:
+        policy.open(file)
+        batch_index = 0
+        start = time.monotonic()
+        phase_start = 0.0
+        for state_name, duration in PHASES:
+            rows_written = 0
+            while rows_written < duration * SAMPLE_RATE_HZ:
+                batch_size = BATCH_SIZES[batch_index % len(BATCH_SIZES)]
+                batch_index += 1
+                rows_written += batch_size
+                # Wait until these rows would have come in from FIRM
+                due = start + phase_start + rows_written / SAMPLE_RATE_HZ
+                time.sleep(max(0.0, due - time.monotonic()))
+
+                file.write(ROW * batch_size)
+                policy.record_write(file, batch_size, state_name)
+                sync_start = time.perf_counter()
+                policy.sync_if_due(file)
+                sync_time += time.perf_counter() - sync_start
+            phase_start += duration
+        policy.close(file)
+    return sync_time
+
+
+def main() -> None:
+    directory = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(tempfile.gettempdir())
+    for name, policy in POLICIES.items():
+        sync_time = write_flight(policy, directory / "durability_benchmark.csv")
+        histogram = {
+            bucket: count for bucket, count in policy.fsync_latency_histogram.items() if count
+        }
+        print(
+            f"{name:<30} syncs: {sum(policy.fsync_latency_counts):>4}  "
+            f"total: {sync_time * 1e3:>8.1f} ms  max: {policy.max_fsync_latency_ms:>6.2f} ms"
+        )
+        print(f"{'':<30} {histogram}")
+    (directory / "durability_benchmark.csv").unlink()
+
+
+if __name__ == "__main__":
+    main()
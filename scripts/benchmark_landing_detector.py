@@ -0,0 +1,107 @@
+"""
+Benchmarks the ring buffer LandingDetector against the list based landing check that Launched used
+to run every loop.
+
+Run with: uv run python -m scripts.benchmark_landing_detector
+"""
+
+import time
+
+import numpy as np
+from firm_client import FIRMDataPacket
+
+from payload.detectors import LandingDetector
+
+WINDOW = 500
+BATCH_SIZE = 20
+ITERATIONS = 20_000
+
+
+def make_packet(timestamp: float, acceleration_z: float) -> FIRMDataPacket:
+    return FIRMDataPacket(
+        timestamp_seconds=timestamp,
+        temperature_celsius=20.0,
+        pressure_pascals=101_325.0,
+        raw_acceleration_x_gs=0.001,
+        raw_acceleration_y_gs=-0.002,
+        raw_acceleration_z_gs=acceleration_z,
+        raw_angular_rate_x_deg_per_s=0.0,
+        raw_angular_rate_y_deg_per_s=0.0,
+        raw_angular_rate_z_deg_per_s=0.0,
+        magnetic_field_x_microteslas=0.0,
+        magnetic_field_y_microteslas=0.0,
+        magnetic_field_z_microteslas=0.0,
+        est_position_z_meters=0.0,
+        est_velocity_z_meters_per_s=0.0,
+        est_quaternion_w=1.0,
+        est_quaternion_x=0.0,
+        est_quaternion_y=0.0,
+        est_quaternion_z=0.0,
+    )
+
+
+class ListLandingCheck:
+    """The landing check as it was written in Launched.update."""
+
+    def __init__(self):
+        self.recent_acceleration = []
+
+    def update(self, firm_data_packets) -> bool:
+        self.recent_acceleration.extend(
+            [
+                (
+                    (item.raw_acceleration_z_gs**2)
+                    + (item.raw_acceleration_y_gs**2)
+                    + (item.raw_acceleration_x_gs**2)
+                )
+                ** 0.5
+                for item in firm_data_packets[-500:]
+            ]
+        )
+        self.recent_acceleration = self.recent_acceleration[-500:]
+        if len(self.recent_acceleration) >= 500:
+            difference = [abs(item - 1.0) for item in self.recent_acceleration]
+            return all(item <= 0.03 for item in difference) and np.std(difference) < 0.005
+        return False
+
+
+class RingBufferLandingCheck:
+    def __init__(self):
+        self.detector = LandingDetector(window_size=WINDOW)
+
+    def update(self, firm_data_packets) -> bool:
+        self.detector.update(firm_data_packets)
+        return self.detector.is_landed
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    # A bumpy descent followed by sitting on the ground
+    accelerations = np.concatenate(
+        [
+            1.0 + rng.normal(0, 0.5, ITERATIONS * BATCH_SIZE // 2),
+            1.0 + rng.normal(0, 0.002, ITERATIONS * BATCH_SIZE // 2),
+        ]
+    )
+    packets = [make_packet(i / 1000, float(a)) for i, a in enumerate(accelerations)]
+    batches = [packets[i : i + BATCH_SIZE] for i in range(0, len(packets), BATCH_SIZE)]
+
+    results = {}
+    for name, check in (("list", ListLandingCheck()), ("ring buffer", RingBufferLandingCheck())):
+        decisions = []
+        start = time.perf_counter()
+        for batch in batches:
+            decisions.append(check.update(batch))
+        elapsed = time.perf_counter() - start
+        results[name] = decisions
+        print(
+            f"{name:>12}: {elapsed / len(batches) * 1e6:8.2f} us per update "
+            f"({len(batches)} updates of {BATCH_SIZE} packets)"
+        )
+
+    mismatches = sum(a != b for a, b in zip(results["list"], results["ring buffer"], strict=True))
+    print(f"Decisions that differ between the two checks: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
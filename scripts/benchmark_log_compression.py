@@ -0,0 +1,158 @@
+"""
+Benchmarks the compressed logs: for every log format, codec and sync interval, it writes a flight
+the way the logger thread does, and reports the compression ratio, the CPU time spent encoding and
+compressing, and the time spent in fsync, both per second of flight.
+
+Pass a FIRM flight CSV (e.g. one from launch_data) to use real data, otherwise a synthetic flight is
+used. Run it on the Pi for meaningful numbers:
+    uv run python -m scripts.benchmark_log_compression [flight.csv] [directory]
+"""
+
+import math
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from payload.constants import LOG_PROFILE_COLUMNS
+from payload.data_handling.durability import DurabilityPolicy
+from payload.data_handling.log_schema import LogRow
+from payload.data_handling.logger import CompressedLogFile, Logger, decompress_log
+
+SAMPLE_RATE_HZ = 1000
+SYNTHETIC_FLIGHT_SECONDS = 60
+BATCH_SIZE = 10
+ROWS_PER_SYNC = (1000, 100)
+"""Sync every second (the default policy), and every 0.1 s (like the "state" policy in flight)."""
+FIRM_COLUMNS = (
+    "est_position_z_meters",
+    "est_velocity_z_meters_per_s",
+    "temperature_celsius",
+    "timestamp_seconds",
+    "raw_acceleration_x_gs",
+    "raw_acceleration_y_gs",
+    "raw_acceleration_z_gs",
+)
+
+
+def make_row(**values: object) -> LogRow:
+    """Makes a row of the "standard" log profile."""
+    return tuple(values[name] for name in LOG_PROFILE_COLUMNS["standard"])
+
+
+def make_synthetic_flight() -> list[LogRow]:
+    """
+    Makes a flight that compresses like a real one: smooth values with sensor noise, quantized to
+    the resolution of the sensors.
+    """
+    rng = random.Random(0)
+    packets = []
+    for i in range(SYNTHETIC_FLIGHT_SECONDS * SAMPLE_RATE_HZ):
+        t = i / SAMPLE_RATE_HZ
+        state = "StandbyState" if t < 10 else ("Launched" if t < 50 else "LandedState")
+        altitude = max(0.0, 900 * math.sin(math.pi * (t - 10) / 40)) if state == "Launched" else 0
+        packets.append(
+            make_row(
+                timestamp_epoch=time.strftime("%H:%M:%S", time.gmtime(43200 + int(t))),
+                state_letter=state,
+                nitrogen=0,
+                pH=0,
+                electrical_conductivity=0,
+                activating_legs=False,
+                checking_orientation=False,
+                ejecting_zombie=False,
+                latch=True,
+                est_position_z_meters=round(altitude + rng.gauss(0, 0.05), 3),
+                est_velocity_z_meters_per_s=round(rng.gauss(0, 0.02), 3),
+                temperature_celsius=round(20 + t / 100, 2),
+                timestamp_seconds=round(t, 3),
+                raw_acceleration_x_gs=round(rng.gauss(0, 0.01) * 2048) / 2048,
+                raw_acceleration_y_gs=round(rng.gauss(0, 0.01) * 2048) / 2048,
+                raw_acceleration_z_gs=round(rng.gauss(1, 0.01) * 2048) / 2048,
+            )
+        )
+    return packets
+
+
+def read_flight(flight_path: Path) -> list[LogRow]:
+    """Turns the FIRM data of a flight CSV into the rows the logger would write for it."""
+    flight = pl.read_csv(flight_path, columns=list(FIRM_COLUMNS))
+    return [
+        make_row(
+            timestamp_epoch="12:00:00",
+            state_letter="Launched",
+            nitrogen=0,
+            pH=0,
+            electrical_conductivity=0,
+            activating_legs=False,
+            checking_orientation=False,
+            ejecting_zombie=False,
+            latch=True,
+            **row,
+        )
+        for row in flight.iter_rows(named=True)
+    ]
+
+
+def write_log(
+    logger: Logger, packets: list[LogRow], path: Path, compression: str | None, rows: int
+) -> tuple[float, float]:
+    """
+    Writes the packets in batches, syncing every `rows` rows.
+
+    :return: The CPU time spent encoding and compressing, and the time spent syncing, in seconds.
+    """
+    policy = DurabilityPolicy("rows", rows_per_sync=rows)
+    cpu_time = 0.0
+    sync_time = 0.0
+    with path.open("wb") as raw_file:
+        file = raw_file if compression is None else CompressedLogFile(raw_file, compression)
+        for start in range(0, len(packets), BATCH_SIZE):
+            batch = packets[start : start + BATCH_SIZE]
+            cpu_start = time.thread_time()
+            file.write(logger._encode_batch(batch))
+            cpu_time += time.thread_time() - cpu_start
+            policy.record_write(file, len(batch), "Launched")
+
+            sync_start = time.perf_counter()
+            policy.sync_if_due(file)
+            sync_time += time.perf_counter() - sync_start
+        policy.close(file)
+    return cpu_time, sync_time
+
+
+def main() -> None:
+    packets = read_flight(Path(sys.argv[1])) if len(sys.argv) > 1 else make_synthetic_flight()
+    directory = Path(sys.argv[2]) if len(sys.argv) > 2 else Path(tempfile.mkdtemp())
+    flight_seconds = len(packets) / SAMPLE_RATE_HZ
+    path = directory / "compression_benchmark"
+
+    print(f"{len(packets)} rows ({flight_seconds:.0f} s of flight)")
+    print(
+        f"{'format':<7}{'codec':<6}{'rows/sync':>10}{'ratio':>8}{'CPU ms/s':>10}{'fsync ms/s':>12}"
+    )
+    for log_format in ("csv", "binary"):
+        logger = Logger(directory, log_format=log_format)
+        raw_size = None
+        for compression in (None, "gzip", "xz"):
+            for rows in ROWS_PER_SYNC:
+                cpu_time, sync_time = write_log(logger, packets, path, compression, rows)
+                size = path.stat().st_size
+                if compression is None:
+                    raw_size = size
+                else:
+                    assert len(decompress_log(path.read_bytes(), compression)) == raw_size
+                print(
+                    f"{log_format:<7}{compression or '-':<6}{rows:>10}{raw_size / size:>8.2f}"
+                    f"{cpu_time * 1e3 / flight_seconds:>10.2f}"
+                    f"{sync_time * 1e3 / flight_seconds:>12.2f}"
+                )
+        logger.log_path.unlink()
+    path.unlink()
+
+
+if __name__ == "__main__":
+    main()
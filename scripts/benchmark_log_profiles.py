@@ -0,0 +1,146 @@
+"""
+Benchmarks the cost of building the rows of each log profile on the logger thread, and of encoding
+them, next to the hand-written LoggerDataPacket the Logger used to build (7 FIRM fields).
+
+Run it on the Pi for meaningful numbers:
+    uv run python -m scripts.benchmark_log_profiles
+"""
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import msgspec
+from firm_client import FIRMDataPacket
+
+from payload.data_handling.log_schema import LogSchema
+from payload.data_handling.logger import LogBatch, Logger
+from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.grave_data_packet import GraveDataPacket
+from payload.data_handling.packets.zombie_data_packet import ZombieDataPacket
+from payload.state import Launched
+
+BATCHES = 2000
+PACKETS_PER_BATCH = 10
+REPEATS = 5
+
+
+class LoggerDataPacket(msgspec.Struct, array_like=True, kw_only=True):
+    """The row the Logger used to build, with the FIRM fields picked by hand."""
+
+    timestamp_epoch: str | None
+    state_letter: str | None
+    nitrogen: float | None = None
+    pH: float | None = None
+    electrical_conductivity: float | None = None
+    activating_legs: bool | None = None
+    checking_orientation: bool | None = None
+    ejecting_zombie: bool | None = None
+    latch: bool | None = None
+    est_position_z_meters: float | None = None
+    est_velocity_z_meters_per_s: float | None = None
+    temperature_celsius: float | None = None
+    timestamp_seconds: float | None = None
+    raw_acceleration_x_gs: float | None = None
+    raw_acceleration_y_gs: float | None = None
+    raw_acceleration_z_gs: float | None = None
+
+
+def build_hand_written_rows(log_batches: list[LogBatch]) -> list[LoggerDataPacket]:
+    """What Logger._prepare_logger_packets used to do."""
+    rows = []
+    for log_batch in log_batches:
+        context_data_packet = log_batch.context_data_packet
+        zombie_data_packet = log_batch.zombie_data_packet
+        grave_data_packet = log_batch.grave_data_packet
+        rows.extend(
+            LoggerDataPacket(
+                timestamp_epoch=context_data_packet.epoch_time,
+                state_letter=context_data_packet.state.__name__,
+                nitrogen=zombie_data_packet.nitrogen,
+                pH=zombie_data_packet.pH,
+                electrical_conductivity=zombie_data_packet.electrical_conductivity,
+                activating_legs=zombie_data_packet.activating_legs,
+                checking_orientation=zombie_data_packet.checking_orientation,
+                ejecting_zombie=grave_data_packet.ejecting_zombie,
+                latch=grave_data_packet.latch,
+                est_position_z_meters=firm_data_packet.est_position_z_meters,
+                est_velocity_z_meters_per_s=firm_data_packet.est_velocity_z_meters_per_s,
+                temperature_celsius=firm_data_packet.temperature_celsius,
+                timestamp_seconds=firm_data_packet.timestamp_seconds,
+                raw_acceleration_x_gs=firm_data_packet.raw_acceleration_x_gs,
+                raw_acceleration_y_gs=firm_data_packet.raw_acceleration_y_gs,
+                raw_acceleration_z_gs=firm_data_packet.raw_acceleration_z_gs,
+            )
+            for firm_data_packet in log_batch.firm_data_packets
+        )
+    return rows
+
+
+def make_log_batches() -> list[LogBatch]:
+    rng = random.Random(0)
+    grave_data_packet = GraveDataPacket(ejecting_zombie=False, latch=True)
+    zombie_data_packet = ZombieDataPacket(
+        activating_legs=False,
+        checking_orientation=False,
+        nitrogen=0.0,
+        pH=0.0,
+        electrical_conductivity=0.0,
+    )
+    log_batches = []
+    for batch in range(BATCHES):
+        firm_data_packets = [
+            FIRMDataPacket(
+                (batch * PACKETS_PER_BATCH + i) / 1000,
+                *(rng.uniform(-1, 1) for _ in range(13)),
+                1.0,
+                0.0,
+                0.0,
+                0.0,
+            )
+            for i in range(PACKETS_PER_BATCH)
+        ]
+        context_data_packet = ContextDataPacket(Launched, PACKETS_PER_BATCH, 0, "12:00:00")
+        log_batches.append(
+            LogBatch(context_data_packet, firm_data_packets, grave_data_packet, zombie_data_packet)
+        )
+    return log_batches
+
+
+def best_time_us_per_row(function, argument, rows: int) -> float:
+    """Runs the function REPEATS times, and returns the fastest run in microseconds per row."""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6 / rows
+
+
+def main() -> None:
+    log_batches = make_log_batches()
+    rows = BATCHES * PACKETS_PER_BATCH
+    log_dir = Path(tempfile.mkdtemp())
+
+    print(f"{'profile':<14}{'columns':>8}{'build us/row':>14}{'csv us/row':>12}{'bin us/row':>12}")
+    print(
+        f"{'hand-written':<14}{len(LoggerDataPacket.__struct_fields__):>8}"
+        f"{best_time_us_per_row(build_hand_written_rows, log_batches, rows):>14.3f}"
+    )
+    for profile in ("minimal", "standard", "full"):
+        schema = LogSchema(profile)
+        built_rows = schema.build_rows(log_batches)
+        timings = [best_time_us_per_row(schema.build_rows, log_batches, rows)]
+        for log_format in ("csv", "binary"):
+            logger = Logger(log_dir, log_format, log_profile=profile)
+            timings.append(best_time_us_per_row(logger._encode_batch, built_rows, rows))
+            logger.log_path.unlink()
+        print(
+            f"{profile:<14}{len(schema.columns):>8}{timings[0]:>14.3f}{timings[1]:>12.3f}"
+            f"{timings[2]:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmarks how much the logger slows down the main loop, with the thread backend and with the
+process backend. It runs a loop like Context.update at the rate FIRM sends data (with the landing
+detector as the work that has to stay fast) and reports how long each iteration took.
+
+Run it on the Pi for meaningful numbers:
+    uv run python -m scripts.benchmark_logger_backends
+"""
+
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from firm_client import FIRMDataPacket
+
+from payload.data_handling.logger import Logger
+from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.grave_data_packet import GraveDataPacket
+from payload.data_handling.packets.zombie_data_packet import ZombieDataPacket
+from payload.detectors import LandingDetector
+from payload.state import Launched
+
+ITERATIONS = 3000
+PACKETS_PER_ITERATION = 10
+SAMPLE_RATE_HZ = 1000
+
+
+def make_batches() -> list[list[FIRMDataPacket]]:
+    """Makes the FIRM packets up front, so making them isn't part of the measured loop."""
+    rng = random.Random(0)
+    batches = []
+    for iteration in range(ITERATIONS):
+        batch = []
+        for i in range(PACKETS_PER_ITERATION):
+            timestamp = (iteration * PACKETS_PER_ITERATION + i) / SAMPLE_RATE_HZ
+            batch.append(
+                FIRMDataPacket(
+                    timestamp,
+                    20.0,
+                    101325.0,
+                    rng.gauss(0, 0.01),
+                    rng.gauss(0, 0.01),
+                    rng.gauss(1, 0.01),
+                    0.0,
+                    0.0,
+                    0.0,
+                    0.0,
+                    0.0,
+                    0.0,
+                    rng.uniform(0, 1000),
+                    rng.uniform(-50, 300),
+                    1.0,
+                    0.0,
+                    0.0,
+                    0.0,
+                )
+            )
+        batches.append(batch)
+    return batches
+
+
+def run_main_loop(backend: str, batches: list[list[FIRMDataPacket]]) -> tuple[list[float], Path]:
+    """
+    Runs the simulated main loop with a logger of the given backend.
+
+    :return: The latency of every iteration in microseconds, and the path of the log.
+    """
+    logger = Logger(Path(tempfile.mkdtemp()), backend=backend)
+    logger.start()
+    landing_detector = LandingDetector()
+    grave_data_packet = GraveDataPacket(ejecting_zombie=False, latch=True)
+    zombie_data_packet = ZombieDataPacket(
+        activating_legs=False,
+        checking_orientation=False,
+        nitrogen=0.0,
+        pH=0.0,
+        electrical_conductivity=0.0,
+    )
+    period = PACKETS_PER_ITERATION / SAMPLE_RATE_HZ
+
+    latencies = []
+    next_iteration = time.perf_counter()
+    for batch in batches:
+        # Wait for FIRM to "send" the next batch
+        next_iteration += period
+        time.sleep(max(0.0, next_iteration - time.perf_counter()))
+
+        start = time.perf_counter()
+        landing_detector.update(batch)
+        context_data_packet = ContextDataPacket(
+            Launched, len(batch), time.time_ns(), time.strftime("%H:%M:%S")
+        )
+        logger.log(context_data_packet, batch, grave_data_packet, zombie_data_packet)
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+    logger.stop()
+    return latencies, logger.log_path
+
+
+def main() -> None:
+    batches = make_batches()
+    print(f"{'backend':<8}{'mean us':>9}{'p50 us':>9}{'p99 us':>9}{'p99.9 us':>10}{'max us':>9}")
+    for backend in ("thread", "process"):
+        latencies, log_path = run_main_loop(backend, batches)
+        quantiles = statistics.quantiles(latencies, n=1000, method="inclusive")
+        print(
+            f"{backend:<8}{statistics.fmean(latencies):>9.1f}{quantiles[499]:>9.1f}"
+            f"{quantiles[989]:>9.1f}{quantiles[998]:>10.1f}{max(latencies):>9.1f}"
+        )
+        log_path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmarks how fast the Logger thread turns batches of rows into CSV text, comparing
+the old per-row csv.writer path with the columnar batch path, and checks that both produce the
+exact same bytes.
+
+Run with: uv run python -m scripts.benchmark_logger_encoding
+"""
+
+import csv
+import io
+import random
+import time
+
+import msgspec
+
+from payload.constants import LOG_PROFILE_COLUMNS
+from payload.data_handling.log_schema import LogRow
+from payload.data_handling.logger import Logger
+
+TOTAL_ROWS = 100_000
+BATCH_SIZES = (1, 10, 50, 200, 1000)
+
+
+def make_packets(count: int) -> list[LogRow]:
+    rng = random.Random(0)
+    packets = []
+    for i in range(count):
+        state = "StandbyState" if i < count // 2 else "Launched"
+        packets.append(
+            dict(
+                timestamp_epoch=f"12:{i // 60_000 % 60:02d}:{i // 1000 % 60:02d}",
+                state_letter=state,
+                nitrogen=0,
+                pH=0,
+                electrical_conductivity=0,
+                activating_legs=0,
+                checking_orientation=False,
+                ejecting_zombie=False,
+                latch=i > count * 3 // 4,
+                est_position_z_meters=rng.uniform(-1, 1500),
+                est_velocity_z_meters_per_s=rng.uniform(-50, 300),
+                temperature_celsius=rng.uniform(15, 30),
+                timestamp_seconds=i / 1000,
+                raw_acceleration_x_gs=rng.gauss(0, 0.5),
+                raw_acceleration_y_gs=rng.gauss(0, 0.5),
+                raw_acceleration_z_gs=rng.gauss(1, 2),
+            )
+        )
+    return [tuple(packet[name] for name in LOG_PROFILE_COLUMNS["standard"]) for packet in packets]
+
+
+def encode_with_csv_writer(packets: list[LogRow]) -> str:
+    """What Logger._logging_loop used to do for every drained batch."""
+    buffer = io.StringIO(newline="")
+    writer = csv.writer(buffer)
+    for fields in msgspec.to_builtins(packets, enc_hook=Logger._convert_unknown_type_to_str):
+        writer.writerow(Logger._truncate_floats(fields))
+    return buffer.getvalue()
+
+
+def encode_columnar(packets: list[LogRow]) -> str:
+    fields = msgspec.to_builtins(packets, enc_hook=Logger._convert_unknown_type_to_str)
+    return Logger._encode_csv_batch(fields)
+
+
+def main() -> None:
+    packets = make_packets(TOTAL_ROWS)
+    print(f"{'batch size':>10} | {'csv.writer rows/s':>18} | {'columnar rows/s':>16} | identical")
+    for batch_size in BATCH_SIZES:
+        batches = [packets[i : i + batch_size] for i in range(0, len(packets), batch_size)]
+        results = {}
+        rates = {}
+        for name, encode in (("csv", encode_with_csv_writer), ("columnar", encode_columnar)):
+            start = time.perf_counter()
+            results[name] = "".join(encode(batch) for batch in batches)
+            rates[name] = TOTAL_ROWS / (time.perf_counter() - start)
+        print(
+            f"{batch_size:>10} | {rates['csv']:>18,.0f} | {rates['columnar']:>16,.0f} | "
+            f"{results['csv'] == results['columnar']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
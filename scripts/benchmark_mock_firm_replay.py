@@ -0,0 +1,93 @@
+"""
+Benchmarks how fast MockFIRM can replay a flight: building the FIRMDataPackets from the rows of the
+file (the old per-row dict path next to the batch path), and a whole fast replay drained by a
+consumer that does nothing with the packets.
+
+Run it with a launch file:
+    uv run python -m scripts.benchmark_mock_firm_replay launch_data/<flight>.csv
+"""
+
+import queue
+import sys
+import time
+from pathlib import Path
+
+import polars as pl
+from firm_client import FIRMDataPacket
+
+from payload.constants import MOCK_READ_BATCH_ROWS
+from payload.mock.mock_firm import MockFIRM
+
+REPEATS = 3
+
+
+def build_packets_from_dicts(batch: pl.DataFrame) -> list[FIRMDataPacket]:
+    """What MockFIRM._read_file used to do for every row."""
+    packets = []
+    for row in batch.iter_rows(named=True):
+        row_dict = row.copy()
+        for k in list(row_dict.keys()):
+            if row_dict[k] is None:
+                del row_dict[k]
+        packets.append(FIRMDataPacket(**row_dict))
+    return packets
+
+
+def best_packets_per_second(function, batches: list[pl.DataFrame], rows: int) -> float:
+    """Runs the function on every batch REPEATS times, and returns the fastest run."""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for batch in batches:
+            for _packet in function(batch):
+                pass
+        best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def replay_packets_per_second(log_file_path: Path) -> tuple[float, int]:
+    """Runs a fast replay, and drains it like the main loop does."""
+    mock_firm = MockFIRM(log_file_path=log_file_path)
+    start = time.perf_counter()
+    mock_firm.start()
+    packets = 0
+    while batch := mock_firm.get_data_packets():
+        packets += len(batch)
+    elapsed = time.perf_counter() - start
+    mock_firm.stop()
+    return packets / elapsed, packets
+
+
+def drain_packets_per_second(packets: list[FIRMDataPacket]) -> float:
+    """How fast the consumer alone can take packets out of a queue, with nothing producing them."""
+    packet_queue: queue.SimpleQueue[FIRMDataPacket] = queue.SimpleQueue()
+    for packet in packets:
+        packet_queue.put(packet)
+    start = time.perf_counter()
+    while not packet_queue.empty():
+        packet_queue.get()
+    return len(packets) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    log_file_path = Path(sys.argv[1])
+    mock_firm = MockFIRM(log_file_path=log_file_path)
+    data = mock_firm._scan_csv().collect()
+    batches = list(data.iter_slices(MOCK_READ_BATCH_ROWS))
+    rows = data.height
+
+    dict_rate = best_packets_per_second(build_packets_from_dicts, batches, rows)
+    batch_rate = best_packets_per_second(mock_firm._build_packets, batches, rows)
+    print(f"{rows} rows, in batches of {MOCK_READ_BATCH_ROWS}")
+    print(f"{'per-row dicts':<28}{dict_rate / 1e3:>10.0f} k packets/s")
+    print(f"{'batch (positional)':<28}{batch_rate / 1e3:>10.0f} k packets/s")
+    print(f"{'speedup':<28}{batch_rate / dict_rate:>10.2f}x")
+
+    drain_rate = drain_packets_per_second(list(mock_firm._build_packets(data)))
+    replay_rate, packets = replay_packets_per_second(log_file_path)
+    print(f"{'queue drain only':<28}{drain_rate / 1e3:>10.0f} k packets/s")
+    print(f"{'fast replay, end to end':<28}{replay_rate / 1e3:>10.0f} k packets/s ({packets} packets)")
+
+
+if __name__ == "__main__":
+    main()
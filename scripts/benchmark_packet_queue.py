@@ -0,0 +1,94 @@
+"""
+Benchmarks what it costs the consumer (the main loop) to take the packets out of the queue, per
+packet: the old queue.SimpleQueue drained with empty() and get() one item at a time, next to the
+BatchQueue that the producer fills a batch at a time and the consumer swaps out at once.
+
+A producer thread publishes bursts of packets, like MockFIRM does, while the consumer drains the
+queue as fast as it can. Only the CPU time of the consumer thread is counted.
+
+Run it with:
+    uv run python -m scripts.benchmark_packet_queue
+"""
+
+import queue
+import threading
+import time
+
+from payload.data_handling.batch_queue import BatchQueue
+
+PACKETS = 300_000
+BURST_SIZES = (1, 10, 100, 1000)
+STOP = "STOP"
+
+
+def drain_simple_queue(packet_queue: queue.SimpleQueue) -> list:
+    """What MockFIRM.get_data_packets used to do."""
+    packets = []
+    item = packet_queue.get(block=True)
+    if item == STOP:
+        return packets
+    packets.append(item)
+    while not packet_queue.empty():
+        item = packet_queue.get(block=True)
+        if item == STOP:
+            packet_queue.put(STOP)
+            break
+        packets.append(item)
+    return packets
+
+
+def simple_queue_consumer_seconds(burst_size: int) -> float:
+    """Runs the SimpleQueue producer and consumer, and returns the CPU time of the consumer."""
+    packet_queue: queue.SimpleQueue = queue.SimpleQueue()
+    burst = [object()] * burst_size
+
+    def produce() -> None:
+        for _ in range(PACKETS // burst_size):
+            for packet in burst:
+                packet_queue.put(packet)
+        packet_queue.put(STOP)
+
+    producer = threading.Thread(target=produce)
+    start = time.thread_time()
+    producer.start()
+    while drain_simple_queue(packet_queue):
+        pass
+    elapsed = time.thread_time() - start
+    producer.join()
+    return elapsed
+
+
+def batch_queue_consumer_seconds(burst_size: int) -> float:
+    """Runs the BatchQueue producer and consumer, and returns the CPU time of the consumer."""
+    packet_queue: BatchQueue = BatchQueue()
+    burst = [object()] * burst_size
+
+    def produce() -> None:
+        for _ in range(PACKETS // burst_size):
+            packet_queue.put_batch(burst)
+        packet_queue.stop()
+
+    producer = threading.Thread(target=produce)
+    start = time.thread_time()
+    producer.start()
+    while packet_queue.get_all()[0]:
+        pass
+    elapsed = time.thread_time() - start
+    producer.join()
+    return elapsed
+
+
+def main() -> None:
+    print(f"{PACKETS} packets, consumer CPU time per packet")
+    print(f"{'burst size':>12}{'SimpleQueue':>16}{'BatchQueue':>16}{'speedup':>10}")
+    for burst_size in BURST_SIZES:
+        simple_ns = simple_queue_consumer_seconds(burst_size) / PACKETS * 1e9
+        batch_ns = batch_queue_consumer_seconds(burst_size) / PACKETS * 1e9
+        print(
+            f"{burst_size:>12}{simple_ns:>13.0f} ns{batch_ns:>13.0f} ns"
+            f"{simple_ns / batch_ns:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Tests for reading logs back after a flight."""
+
+import os
+
+import pytest
+from firm_client import FIRMDataPacket
+
+from payload.analysis import scan_log
+from payload.constants import LOG_PREALLOCATION_CHUNK_BYTES
+from payload.data_handling.durability import DurabilityPolicy
+from payload.data_handling.logger import LogBatch, Logger
+from payload.data_handling.packets.context_data_packet import ContextDataPacket
+from payload.data_handling.packets.grave_data_packet import GraveDataPacket
+from payload.data_handling.packets.zombie_data_packet import ZombieDataPacket
+from payload.mock.mock_firm import FIRM_CONSTRUCTOR_FIELDS
+from payload.state import StandbyState
+
+ROWS = 250
+
+
+def make_log_batch(first_timestamp: float) -> LogBatch:
+    packets = [
+        FIRMDataPacket(
+            **dict.fromkeys(FIRM_CONSTRUCTOR_FIELDS, 0.0)
+            | {"timestamp_seconds": first_timestamp + index * 0.001, "raw_acceleration_z_gs": 1.0}
+        )
+        for index in range(ROWS)
+    ]
+    return LogBatch(
+        ContextDataPacket(StandbyState, len(packets), 0, "12:00:00"),
+        packets,
+        GraveDataPacket(ejecting_zombie=False, latch=False),
+        ZombieDataPacket(False, False, 0.0, 0.0, 0.0),
+    )
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="Preallocation needs Linux")
+def test_scan_log_reads_a_preallocated_log_that_was_not_closed(tmp_path) -> None:
+    """The power was cut, so the log still ends in the zeros of the space reserved for it."""
+    logger = Logger(tmp_path, durability_policy=DurabilityPolicy(preallocate=True))
+    rows = logger.log_schema.build_rows([make_log_batch(10.0)])
+    with logger._open_log_file() as file_writer:
+        logger.durability_policy.open(file_writer)
+        file_writer.write(logger._encode_batch(rows))
+        logger.durability_policy.record_write(file_writer, len(rows), "StandbyState")
+        logger.durability_policy.sync(file_writer)
+        # The policy is never closed, so the unused space is never given back
+    assert logger.log_path.stat().st_size > LOG_PREALLOCATION_CHUNK_BYTES
+
+    log = scan_log(logger.log_path).collect()
+
+    assert log.height == ROWS
+    assert log["timestamp_seconds"].to_list() == pytest.approx(
+        [10.0 + index * 0.001 for index in range(ROWS)]
+    )
@@ -0,0 +1,112 @@
+"""Tests for the state machine timers."""
+
+import pytest
+from firm_client import FIRMDataPacket
+
+from payload.clock import FIRMClock, MonotonicClock
+from payload.constants import LAUNCH_STATE_MAX_LENGTH_SECONDS
+from payload.context import Context
+from payload.mock.mock_grave import MockGrave
+from payload.state import LandedState, Launched
+
+SAMPLE_PERIOD_SECONDS = 0.001
+BATCH_SIZE = 100
+
+
+def make_packet(timestamp: float, acceleration_z: float = 1.0) -> FIRMDataPacket:
+    return FIRMDataPacket(
+        timestamp_seconds=timestamp,
+        temperature_celsius=20.0,
+        pressure_pascals=101_325.0,
+        raw_acceleration_x_gs=0.0,
+        raw_acceleration_y_gs=0.0,
+        raw_acceleration_z_gs=acceleration_z,
+        raw_angular_rate_x_deg_per_s=0.0,
+        raw_angular_rate_y_deg_per_s=0.0,
+        raw_angular_rate_z_deg_per_s=0.0,
+        magnetic_field_x_microteslas=0.0,
+        magnetic_field_y_microteslas=0.0,
+        magnetic_field_z_microteslas=0.0,
+        est_position_z_meters=1000.0,
+        est_velocity_z_meters_per_s=0.0,
+        est_quaternion_w=1.0,
+        est_quaternion_x=0.0,
+        est_quaternion_y=0.0,
+        est_quaternion_z=0.0,
+    )
+
+
+def make_batch(start_timestamp: float, launch_index: int | None = None) -> list[FIRMDataPacket]:
+    """Makes a batch of packets, which boost from `launch_index` to the end of the batch."""
+    return [
+        make_packet(
+            start_timestamp + index * SAMPLE_PERIOD_SECONDS,
+            10.0 if launch_index is not None and index >= launch_index else 1.0,
+        )
+        for index in range(BATCH_SIZE)
+    ]
+
+
+class BatchFIRM:
+    """Hands the Context one queued batch per update."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[FIRMDataPacket]] = []
+
+    def get_data_packets(self) -> list[FIRMDataPacket]:
+        return self.batches.pop(0) if self.batches else []
+
+
+class NullLogger:
+    """Throws away everything that is logged."""
+
+    def log(self, *_: object) -> None:
+        pass
+
+
+@pytest.fixture
+def firm() -> BatchFIRM:
+    return BatchFIRM()
+
+
+@pytest.fixture
+def context(firm: BatchFIRM) -> Context:
+    return Context(MockGrave(), None, firm, NullLogger(), FIRMClock())
+
+
+@pytest.mark.parametrize("launch_index", [0, 10, BATCH_SIZE - 1])
+def test_launch_timers_start_at_the_launch_packet(
+    context: Context, firm: BatchFIRM, launch_index: int
+) -> None:
+    """Launch in the middle of a batch starts the timers at its packet, not the end of the batch."""
+    launch_timestamp = 10.0 + launch_index * SAMPLE_PERIOD_SECONDS
+    firm.batches.append(make_batch(10.0, launch_index))
+    context.update()
+
+    assert isinstance(context.state, Launched)
+    assert context.launch_timestamp_seconds == pytest.approx(launch_timestamp)
+    assert context.launch_time_seconds == pytest.approx(launch_timestamp)
+
+    # The last packet of this batch is just before the 345 s timer runs out
+    last_before_timeout = launch_timestamp + LAUNCH_STATE_MAX_LENGTH_SECONDS - SAMPLE_PERIOD_SECONDS
+    firm.batches.append(make_batch(last_before_timeout - (BATCH_SIZE - 1) * SAMPLE_PERIOD_SECONDS))
+    context.update()
+    assert isinstance(context.state, Launched)
+
+    firm.batches.append([make_packet(launch_timestamp + LAUNCH_STATE_MAX_LENGTH_SECONDS)])
+    context.update()
+    assert isinstance(context.state, LandedState)
+
+
+def test_monotonic_clock_converts_firm_timestamps() -> None:
+    """The newest packet of a batch is taken as read when the batch was received."""
+    clock = MonotonicClock()
+    with pytest.raises(RuntimeError):
+        clock.from_firm_timestamp(1.0)
+
+    clock.update(make_batch(10.0))
+    received_time = clock.now()
+    newest_timestamp = 10.0 + (BATCH_SIZE - 1) * SAMPLE_PERIOD_SECONDS
+    assert clock.from_firm_timestamp(10.0) == pytest.approx(
+        received_time - (newest_timestamp - 10.0), abs=0.01
+    )